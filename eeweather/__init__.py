@@ -31,6 +31,11 @@ from .exceptions import (
     UnrecognizedZCTAError,
     ISDDataNotAvailableError,
     GSODDataNotAvailableError,
+    GSODArchiveNotAvailableError,
+    FetchError,
+    FetchNotFoundError,
+    FetchTransientError,
+    CircuitOpenError,
 )
 from .summaries import get_zcta_ids, get_isd_station_usaf_ids
 from .ranking import rank_stations, combine_ranked_stations, select_station
@@ -38,23 +43,32 @@ from .stations import (
     ISDStation,
     get_isd_filenames,
     get_gsod_filenames,
+    get_gsod_archive_filename,
     get_isd_station_metadata,
     get_isd_file_metadata,
     fetch_isd_raw_temp_data,
+    fetch_isd_resampled_temp_data,
     fetch_isd_hourly_temp_data,
     fetch_isd_daily_temp_data,
     fetch_gsod_raw_temp_data,
+    fetch_gsod_raw_temp_fields,
     fetch_gsod_daily_temp_data,
+    ingest_gsod_archive,
+    build_normals_archive,
+    build_weather_cube,
     fetch_tmy3_hourly_temp_data,
     fetch_cz2010_hourly_temp_data,
+    get_isd_raw_temp_data_cache_key,
     get_isd_hourly_temp_data_cache_key,
     get_isd_daily_temp_data_cache_key,
     get_gsod_daily_temp_data_cache_key,
     get_tmy3_hourly_temp_data_cache_key,
     get_cz2010_hourly_temp_data_cache_key,
+    cached_isd_raw_temp_data_is_expired,
     cached_isd_hourly_temp_data_is_expired,
     cached_isd_daily_temp_data_is_expired,
     cached_gsod_daily_temp_data_is_expired,
+    validate_isd_raw_temp_data_cache,
     validate_isd_hourly_temp_data_cache,
     validate_isd_daily_temp_data_cache,
     validate_gsod_daily_temp_data_cache,
@@ -70,21 +84,26 @@ from .stations import (
     deserialize_gsod_daily_temp_data,
     deserialize_tmy3_hourly_temp_data,
     deserialize_cz2010_hourly_temp_data,
+    read_isd_raw_temp_data_from_cache,
     read_isd_hourly_temp_data_from_cache,
     read_isd_daily_temp_data_from_cache,
     read_gsod_daily_temp_data_from_cache,
     read_tmy3_hourly_temp_data_from_cache,
     read_cz2010_hourly_temp_data_from_cache,
+    read_tmy3_hourly_temp_data_from_normals_archive,
+    read_cz2010_hourly_temp_data_from_normals_archive,
     write_isd_hourly_temp_data_to_cache,
     write_isd_daily_temp_data_to_cache,
     write_gsod_daily_temp_data_to_cache,
     write_tmy3_hourly_temp_data_to_cache,
     write_cz2010_hourly_temp_data_to_cache,
+    destroy_cached_isd_raw_temp_data,
     destroy_cached_isd_hourly_temp_data,
     destroy_cached_isd_daily_temp_data,
     destroy_cached_gsod_daily_temp_data,
     destroy_cached_tmy3_hourly_temp_data,
     destroy_cached_cz2010_hourly_temp_data,
+    load_isd_raw_temp_data_cached_proxy,
     load_isd_hourly_temp_data_cached_proxy,
     load_isd_daily_temp_data_cached_proxy,
     load_gsod_daily_temp_data_cached_proxy,
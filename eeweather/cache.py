@@ -17,8 +17,21 @@
    limitations under the License.
 
 """
+import atexit
+from collections import OrderedDict
+from datetime import datetime
+import fnmatch
+import io
+import logging
+import math
 import os
 import json
+import random
+import sqlite3
+import sys
+import threading
+import time
+import weakref
 
 try:
     from sqlalchemy import (
@@ -26,18 +39,131 @@ try:
         MetaData,
         Table,
         Column,
+        Index,
         String,
         DateTime,
+        BigInteger,
+        Float,
+        Integer,
+        LargeBinary,
+        and_,
+        bindparam,
+        case,
+        event,
+        inspect,
+        or_,
+        text,
     )
+    from sqlalchemy.engine import make_url
     from sqlalchemy.orm import Session
     from sqlalchemy.sql import select, func
-    from sqlalchemy.exc import IntegrityError
+    from sqlalchemy.dialects import postgresql, sqlite
+    from sqlalchemy.exc import DBAPIError, OperationalError
 except ImportError:  # pragma: no cover
     has_sqlalchemy = False
 else:
     has_sqlalchemy = True
+
+    # dialects with native INSERT ... ON CONFLICT DO UPDATE
+    _DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+import numpy as np
+import pandas as pd
 import pytz
 
+from .serialization import decode_series_values, is_encoded
+
+logger = logging.getLogger(__name__)
+
+# applied to every new SQLite connection: wait for locks rather than failing
+# immediately, let readers proceed during writes, and only fsync at checkpoints
+SQLITE_PRAGMAS = (
+    "PRAGMA busy_timeout=30000",
+    "PRAGMA auto_vacuum=INCREMENTAL",  # only takes effect in new databases
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+)
+
+# bounded retries of writes which still fail with a lock error
+WRITE_ATTEMPTS = 5
+WRITE_RETRY_DELAY = 0.05  # seconds, doubled on each attempt
+
+# access times and hit/miss counts are buffered and written after this many
+# lookups, or once this many seconds have passed since the last write
+ACCESS_FLUSH_SIZE = 1000
+ACCESS_FLUSH_INTERVAL = 60
+
+# on PostgreSQL, batches of at least this many rows are saved with COPY
+POSTGRES_COPY_ROWS = 100
+
+# observation rows are inserted this many at a time
+OBSERVATION_BATCH_ROWS = 10000
+
+# all stores, so pooled connections and buffered access logs are not shared
+# with forked child processes
+_stores = weakref.WeakSet()
+
+
+def _reset_stores_after_fork():  # pragma: no cover (runs in child processes)
+    for store in list(_stores):
+        # drop the parent's pooled connections without closing them under it
+        store.eng.dispose(close=False)
+        # the parent will write its own buffered accesses
+        store._reset_access_log()
+
+
+def _flush_stores_at_exit():  # pragma: no cover (runs at interpreter exit)
+    for store in list(_stores):
+        try:
+            store.flush_accesses()
+        except DBAPIError as e:
+            logger.warning("Could not write cache access log: {}".format(e))
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_stores_after_fork)
+atexit.register(_flush_stores_at_exit)
+
+
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        try:
+            cursor.execute(pragma)
+        except sqlite3.OperationalError as e:
+            # e.g. "PRAGMA journal_mode=WAL" on a database opened with
+            # ?mode=ro, which is read as it is
+            if "readonly" not in str(e):
+                raise
+    cursor.close()
+
+
+def _get_engine_options(url):
+    # connection pool settings for database servers, which may be shared by
+    # many workers and drop idle connections
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    options = {"pool_pre_ping": True}
+    for option, variable in (
+        ("pool_size", "EEWEATHER_CACHE_POOL_SIZE"),
+        ("max_overflow", "EEWEATHER_CACHE_POOL_MAX_OVERFLOW"),
+    ):
+        value = os.environ.get(variable)
+        if value:
+            options[option] = int(value)
+    return options
+
+
+def _create_engine(url, **options):
+    eng = create_engine(url, **options)
+    if eng.dialect.name == "sqlite" and eng.url.database not in (None, "", ":memory:"):
+        event.listen(eng, "connect", _configure_sqlite_connection)
+    return eng
+
+
+def _is_lock_error(e):
+    message = str(e.orig).lower()
+    return "locked" in message or "busy" in message
+
 
 def get_datetime_if_exists(data):
     if data is None:
@@ -50,15 +176,384 @@ def get_datetime_if_exists(data):
         return dt
 
 
+def _decode_row(row):
+    # a row of (data, blob) holds either json text or bytes
+    if row is None:
+        return None
+    data, blob = row
+    if blob is not None:
+        return bytes(blob)
+    if data is not None:
+        return json.loads(data)
+    return None
+
+
+def _encode_row(key, value):
+    if isinstance(value, (bytes, bytearray)):
+        return {
+            "key": key,
+            "data": None,
+            "blob": bytes(value),
+            "size": len(value),
+            "n_observations": None,
+        }
+    data = json.dumps(value, separators=(",", ":"))
+    return {
+        "key": key,
+        "data": data,
+        "blob": None,
+        "size": len(data),
+        "n_observations": None,
+    }
+
+
+def _observation_series(key):
+    # (source, freq, usaf_id, year) of station year keys such as
+    # "isd-hourly-722874-2007", else None
+    parts = key.split("-")
+    if len(parts) != 4 or not parts[3].isdigit():
+        return None
+    return parts[0], parts[1], parts[2], int(parts[3])
+
+
+def _year_seconds(year):
+    # [start, end) of a year in epoch seconds
+    return (
+        int(datetime(year, 1, 1, tzinfo=pytz.UTC).timestamp()),
+        int(datetime(year + 1, 1, 1, tzinfo=pytz.UTC).timestamp()),
+    )
+
+
+def _observation_rows(key, blob):
+    # rows of the observations table for an encoded station year series,
+    # leaving out missing values, or None for any other value
+    series = _observation_series(key)
+    if series is None or blob is None or not is_encoded(blob):
+        return None
+    try:
+        seconds, values = decode_series_values(blob)
+    except ValueError:  # e.g. raw observations
+        return None
+    source, freq, usaf_id, _ = series
+    valid = ~np.isnan(values)
+    return [
+        {
+            "source": source,
+            "freq": freq,
+            "usaf_id": usaf_id,
+            "timestamp": timestamp,
+            "value": value,
+        }
+        for timestamp, value in zip(seconds[valid].tolist(), values[valid].tolist())
+    ]
+
+
+def _key_prefix(key):
+    # e.g. "isd-hourly" for "isd-hourly-722874-2007"
+    return "-".join(key.split("-")[:2])
+
+
+def _as_utc(dt):
+    return None if dt is None else get_datetime_if_exists([dt])
+
+
+def _over_quota(entries, max_bytes):
+    # keys of (key, size) entries, most recently used first, beyond max_bytes
+    total = 0
+    for key, size in entries:
+        total += size
+        if total > max_bytes:
+            yield key
+
+
+def _is_stale(updated, stale_range):
+    return stale_range is not None and stale_range[0] <= updated < stale_range[1]
+
+
+def _copy_text(value):
+    # a field of PostgreSQL's COPY text format
+    if value is None:
+        return "\\N"
+    if isinstance(value, bytes):
+        return "\\\\x" + value.hex()
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _chunks(keys, size=500):
+    # keeps IN clauses under database parameter limits
+    for i in range(0, len(keys), size):
+        yield keys[i : i + size]
+
+
 def is_tz_naive(dt):
     return dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None
 
 
+def _sizeof(value):
+    # approximate memory held by a cached value
+    if isinstance(value, tuple):
+        return sum(_sizeof(item) for item in value)
+    if hasattr(value, "memory_usage"):  # pandas objects
+        usage = value.memory_usage(index=True)
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+    if hasattr(value, "nbytes"):  # numpy arrays
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+def get_key_value_store(url=None, memory_cache=None):
+    """Open the cache at ``url``.
+
+    Parameters
+    ----------
+    url : str, optional
+        ``file://`` URLs open a :any:`eeweather.filestore.FileKeyValueStore`,
+        ``redis://`` and ``rediss://`` URLs a
+        :any:`eeweather.redisstore.RedisKeyValueStore` and any other URL a
+        :any:`KeyValueStore`. Defaults to
+        ``EEWEATHER_CACHE_URL`` or a SQLite database in ``~/.eeweather``.
+    memory_cache : :any:`MemoryCache`, optional
+        In-process tier for decoded values.
+    """
+    if url is None:
+        url = os.environ.get("EEWEATHER_CACHE_URL")
+    if url is not None and url.startswith("file:"):
+        from .filestore import FileKeyValueStore
+
+        return FileKeyValueStore(url, memory_cache=memory_cache)
+    if url is not None and url.startswith(("redis:", "rediss:")):
+        from .redisstore import RedisKeyValueStore
+
+        return RedisKeyValueStore(url, memory_cache=memory_cache)
+    return KeyValueStore(url, memory_cache=memory_cache)
+
+
+def _get_memory_cache():
+    max_bytes = os.environ.get("EEWEATHER_MEMORY_CACHE_BYTES")
+    if not max_bytes or int(max_bytes) <= 0:
+        return None
+    return MemoryCache(int(max_bytes))
+
+
+class MemoryCache(object):
+    """In-process LRU cache of decoded values, bounded by their approximate
+    size in bytes.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Entries are evicted, least recently used first, to keep the total
+        size of cached values under this limit. Values larger than the limit
+        are not cached.
+
+    Attributes
+    ----------
+    hits : int
+        Number of :any:`get` calls which found their key.
+    misses : int
+        Number of :any:`get` calls which did not.
+    nbytes : int
+        Approximate size of all cached values.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "MemoryCache(max_bytes={})".format(self.max_bytes)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Get the value cached under ``key`` and mark it as recently used, or
+        None if there is none."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """Cache ``value`` under ``key``, evicting least recently used entries
+        as needed."""
+        nbytes = _sizeof(value)
+        with self._lock:
+            self._pop(key)
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def invalidate(self, key=None):
+        """Drop the value cached under ``key``, or all values if ``key`` is
+        None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self.nbytes = 0
+            else:
+                self._pop(key)
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[1]
+
+
+def _select_for_removal(entries, policy):
+    """Keys of cache entries to remove under a :any:`RetentionPolicy`, and
+    their total size.
+
+    ``entries`` are ``(key, size, updated, accessed)`` tuples.
+    """
+    oldest = pytz.UTC.localize(datetime.min)
+    # most recently used first; writes count as use
+    entries = sorted(
+        entries,
+        key=lambda entry: max(entry[2] or oldest, entry[3] or oldest),
+        reverse=True,
+    )
+    sizes = {key: size for key, size, _, _ in entries}
+
+    removed = set()
+    if policy.max_age is not None:
+        cutoff = datetime.now(pytz.UTC) - policy.max_age
+        removed.update(
+            key
+            for key, _, updated, _ in entries
+            if updated is not None and updated < cutoff
+        )
+    for pattern, max_bytes in sorted(policy.prefix_max_bytes.items()):
+        removed.update(
+            _over_quota(
+                (
+                    (key, size)
+                    for key, size, _, _ in entries
+                    if key not in removed and fnmatch.fnmatchcase(key, pattern)
+                ),
+                max_bytes,
+            )
+        )
+    if policy.max_bytes is not None:
+        removed.update(
+            _over_quota(
+                ((key, size) for key, size, _, _ in entries if key not in removed),
+                policy.max_bytes,
+            )
+        )
+
+    keys = sorted(removed)
+    return keys, sum(sizes[key] for key in keys)
+
+
+class RetentionPolicy(object):
+    """Limits on what :any:`KeyValueStore.gc` keeps in the cache.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Total size of cached values to keep. Least recently used entries are
+        removed first.
+    max_age : datetime.timedelta, optional
+        Remove entries last updated longer ago than this.
+    prefix_max_bytes : dict, optional
+        Size quotas for groups of keys, keyed by glob pattern, e.g.
+        ``{"isd-hourly-*": 5 * 10**9}``. Least recently used entries are
+        removed first.
+    """
+
+    def __init__(self, max_bytes=None, max_age=None, prefix_max_bytes=None):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.prefix_max_bytes = prefix_max_bytes or {}
+
+    def __repr__(self):
+        return "RetentionPolicy(max_bytes={}, max_age={}, prefix_max_bytes={})".format(
+            self.max_bytes, self.max_age, self.prefix_max_bytes
+        )
+
+
 class KeyValueStore(object):
-    def __init__(self, url=None):
+    """Persistent key value store backed by any database supported by
+    SQLAlchemy.
+
+    Parameters
+    ----------
+    url : str, optional
+        Database URL. Defaults to ``EEWEATHER_CACHE_URL`` or a SQLite database
+        in ``~/.eeweather``.
+    memory_cache : :any:`MemoryCache`, optional
+        In-process tier for decoded values which is invalidated whenever this
+        store saves or clears a key. Defaults to one of
+        ``EEWEATHER_MEMORY_CACHE_BYTES`` bytes if that variable is set.
+    engine_options : dict, optional
+        Keyword arguments of :any:`sqlalchemy.create_engine`, e.g.
+        ``pool_size``. For databases other than SQLite, connections are
+        checked before use and ``EEWEATHER_CACHE_POOL_SIZE`` and
+        ``EEWEATHER_CACHE_POOL_MAX_OVERFLOW`` set the size of the connection
+        pool unless given here.
+    store_observations : bool, optional
+        Also store the values of station year series (e.g.
+        ``isd-hourly-722874-2007``) as rows of an ``observations`` table, so
+        that :any:`retrieve_observations` can read any time range of them.
+        Defaults to whether ``EEWEATHER_CACHE_OBSERVATIONS`` is set to a
+        non-empty value other than ``0``.
+    record_accesses : bool, optional
+        Record when each value was last read and how many lookups of each key
+        prefix found a value, for least recently used retention in :any:`gc`
+        and hit ratios in :any:`stats`. This writes to the database now and
+        then while reading and at exit, so leave it off for read-only or
+        shared caches. Defaults to whether ``EEWEATHER_CACHE_RECORD_ACCESSES``
+        is set to a non-empty value other than ``0``.
+    """
+
+    def __init__(
+        self,
+        url=None,
+        memory_cache=None,
+        engine_options=None,
+        store_observations=None,
+        record_accesses=None,
+    ):
         if not has_sqlalchemy:  # pragma: no cover
             raise ImportError("KeyValueStore requires sqlalchemy.")
-        self._prepare_db(url)
+        self._prepare_db(url, engine_options)
+        if store_observations is None:
+            store_observations = os.environ.get(
+                "EEWEATHER_CACHE_OBSERVATIONS", ""
+            ) not in ("", "0")
+        self.store_observations = store_observations
+        if record_accesses is None:
+            record_accesses = os.environ.get(
+                "EEWEATHER_CACHE_RECORD_ACCESSES", ""
+            ) not in ("", "0")
+        self.record_accesses = record_accesses
+        if memory_cache is None:
+            memory_cache = _get_memory_cache()
+        self.memory_cache = memory_cache
+        self._access_lock = threading.Lock()
+        self._reset_access_log()
+        _stores.add(self)
 
     def __repr__(self):
         return 'KeyValueStore("{}")'.format(self.url)
@@ -72,13 +567,15 @@ class KeyValueStore(object):
             url = "sqlite:///{}/cache.db".format(directory)
         return url
 
-    def _prepare_db(self, url=None):
+    def _prepare_db(self, url=None, engine_options=None):
         # set url
         if url is None:  # pragma: no cover (tests always provide url)
             url = self._get_url()
         self.url = url
 
-        self.eng = create_engine(url)
+        options = _get_engine_options(url)
+        options.update(engine_options or {})
+        self.eng = _create_engine(url, **options)
         metadata = MetaData()
 
         tbl_items = Table(
@@ -87,12 +584,89 @@ class KeyValueStore(object):
             Column("key", String, unique=True, index=True),  # arbitrary unique key
             Column("data", String),  # arbitrary json
             Column("updated", DateTime(timezone=True)),  # time of last transaction
+            Column("blob", LargeBinary),  # arbitrary bytes
+            Column("size", Integer),  # bytes of data or blob
+            Column("accessed", DateTime(timezone=True)),  # time of last read
+            # number of rows of the value in observations, NULL if not stored
+            Column("n_observations", Integer),
+        )
+
+        tbl_lookups = Table(
+            "lookups",
+            metadata,
+            Column("prefix", String, unique=True, index=True),  # see _key_prefix
+            Column("hits", Integer),
+            Column("misses", Integer),
+        )
+
+        tbl_observations = Table(
+            "observations",
+            metadata,
+            Column("source", String),  # e.g. "isd"
+            Column("freq", String),  # e.g. "hourly"
+            Column("usaf_id", String),
+            Column("timestamp", BigInteger),  # seconds since 1970-01-01 UTC
+            Column("value", Float),
+            Index(
+                "ix_observations_series_timestamp",
+                "source",
+                "freq",
+                "usaf_id",
+                "timestamp",
+                unique=True,
+            ),
         )
 
-        # only create if not already created
-        tbl_items.create(checkfirst=True, bind=self.eng)
+        for table in (tbl_items, tbl_lookups, tbl_observations):
+            # only create if not already created
+            try:
+                table.create(checkfirst=True, bind=self.eng)
+            except DBAPIError:
+                # another process created it between the check and the create
+                if not inspect(self.eng).has_table(table.name):
+                    raise
+        self._add_missing_columns(tbl_items)
 
         self.items = tbl_items
+        self.lookups = tbl_lookups
+        self.observations = tbl_observations
+
+    def _add_missing_columns(self, table):
+        # stores created by earlier versions lack newer nullable columns
+        existing = {c["name"] for c in inspect(self.eng).get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            try:
+                with self.eng.begin() as conn:
+                    conn.execute(
+                        text(
+                            "ALTER TABLE {} ADD COLUMN {} {}".format(
+                                table.name,
+                                column.name,
+                                column.type.compile(dialect=self.eng.dialect),
+                            )
+                        )
+                    )
+            except DBAPIError:
+                # another process may have added it first
+                columns = inspect(self.eng).get_columns(table.name)
+                if column.name not in {c["name"] for c in columns}:
+                    raise
+
+    def _write(self, write):
+        # run write(session) in a transaction, retrying with jittered
+        # exponential backoff if the database stays locked past its timeout
+        for attempt in range(WRITE_ATTEMPTS):
+            try:
+                with Session(self.eng) as session:
+                    write(session)
+                    session.commit()
+                return
+            except OperationalError as e:
+                if attempt == WRITE_ATTEMPTS - 1 or not _is_lock_error(e):
+                    raise
+            time.sleep(WRITE_RETRY_DELAY * 2**attempt * (1 + random.random()))
 
     def key_exists(self, key):
         s = select(self.items.c.key).where(self.items.c.key == key)
@@ -100,33 +674,312 @@ class KeyValueStore(object):
             result = session.execute(s)
             return result.fetchone() is not None
 
-    def save_json(self, key, data):
-        data = json.dumps(data, separators=(",", ":"))
-        updated = func.now()
+    def _upsert(self, rows):
+        if len(rows) == 0:
+            return
+        insert = _DIALECT_INSERTS.get(self.eng.dialect.name)
+        copy = self.eng.dialect.name == "postgresql" and len(rows) >= POSTGRES_COPY_ROWS
+        observations = {}
+        if self.store_observations:
+            for row in rows:
+                observation_rows = _observation_rows(row["key"], row["blob"])
+                if observation_rows is not None:
+                    observations[row["key"]] = observation_rows
+                    row["n_observations"] = len(observation_rows)
+
+        def write(session):
+            if copy:
+                self._copy_upsert(session, rows)
+            elif insert is None:
+                # no native upsert: replace existing keys, in chunks to stay
+                # under parameter limits
+                keys = [row["key"] for row in rows]
+                for chunk in _chunks(keys):
+                    session.execute(
+                        self.items.delete().where(self.items.c.key.in_(chunk))
+                    )
+                session.execute(self.items.insert().values(updated=func.now()), rows)
+            else:
+                s = insert(self.items).values(updated=func.now())
+                s = s.on_conflict_do_update(
+                    index_elements=[self.items.c.key],
+                    set_={
+                        "data": s.excluded.data,
+                        "blob": s.excluded.blob,
+                        "size": s.excluded.size,
+                        "updated": s.excluded.updated,
+                        "n_observations": s.excluded.n_observations,
+                    },
+                )
+                session.execute(s, rows)
+            if len(observations) > 0:
+                self._delete_observations(session, list(observations))
+                observation_rows = [
+                    row for key_rows in observations.values() for row in key_rows
+                ]
+                for i in range(0, len(observation_rows), OBSERVATION_BATCH_ROWS):
+                    session.execute(
+                        self.observations.insert(),
+                        observation_rows[i : i + OBSERVATION_BATCH_ROWS],
+                    )
+
+        self._write(write)
+        if self.memory_cache is not None:
+            for row in rows:
+                self.memory_cache.invalidate(row["key"])
+
+    def _copy_upsert(self, session, rows):
+        # bulk load rows into a temporary table with COPY, which is much
+        # faster than binding each row, then upsert them all at once
+        session.execute(
+            text(
+                "CREATE TEMPORARY TABLE items_load "
+                "(key VARCHAR, data VARCHAR, blob BYTEA, size INTEGER, "
+                "n_observations INTEGER) ON COMMIT DROP"
+            )
+        )
+        columns = ("key", "data", "blob", "size", "n_observations")
+        copy_sql = "COPY items_load ({}) FROM STDIN".format(", ".join(columns))
+        buf = "".join(
+            "\t".join(_copy_text(row[column]) for column in columns) + "\n"
+            for row in rows
+        )
+        cursor = session.connection().connection.cursor()
         try:
-            s = self.items.insert().values(key=key, data=data, updated=updated)
-            with Session(self.eng) as session:
-                session.execute(s)
-                session.commit()
-        except IntegrityError:
-            s = (
-                self.items.update()
-                .where(self.items.c.key == key)
-                .values(key=key, data=data, updated=updated)
+            if hasattr(cursor, "copy_expert"):  # psycopg2
+                cursor.copy_expert(copy_sql, io.StringIO(buf))
+            else:  # psycopg
+                with cursor.copy(copy_sql) as copy:
+                    copy.write(buf)
+        finally:
+            cursor.close()
+        session.execute(
+            text(
+                "INSERT INTO items (key, data, blob, size, n_observations, updated) "
+                "SELECT key, data, blob, size, n_observations, now() "
+                "FROM items_load ON CONFLICT (key) DO UPDATE SET "
+                "data = excluded.data, blob = excluded.blob, size = excluded.size, "
+                "n_observations = excluded.n_observations, "
+                "updated = excluded.updated"
             )
-            with Session(self.eng) as session:
-                session.execute(s)
-                session.commit()
+        )
+
+    def _delete_observations(self, session, keys):
+        # observation rows of station year keys
+        for key in keys:
+            series = _observation_series(key)
+            if series is None:
+                continue
+            source, freq, usaf_id, year = series
+            start, end = _year_seconds(year)
+            session.execute(
+                self.observations.delete().where(
+                    self.observations.c.source == source,
+                    self.observations.c.freq == freq,
+                    self.observations.c.usaf_id == usaf_id,
+                    self.observations.c.timestamp >= start,
+                    self.observations.c.timestamp < end,
+                )
+            )
+
+    def save_json(self, key, data):
+        self._upsert([_encode_row(key, data)])
+
+    def save_bytes(self, key, data):
+        self._upsert([_encode_row(key, bytes(data))])
+
+    def save_many(self, items):
+        """Save several keys in a single transaction.
+
+        Uses ``INSERT ... ON CONFLICT DO UPDATE`` on SQLite and PostgreSQL,
+        loading batches of at least ``POSTGRES_COPY_ROWS`` rows with ``COPY``
+        on PostgreSQL.
+
+        Parameters
+        ----------
+        items : dict
+            Values keyed by cache key. Bytes values are stored as with
+            :any:`save_bytes`, anything else as with :any:`save_json`.
+        """
+        self._upsert([_encode_row(key, value) for key, value in items.items()])
 
     def retrieve_json(self, key):
         s = select(self.items.c.data).where(self.items.c.key == key)
         with Session(self.eng) as session:
             result = session.execute(s)
             data = result.fetchone()
-            if data is None:
+        found = data is not None and data[0] is not None
+        self._record_lookup(key, found)
+        return json.loads(data[0]) if found else None
+
+    def retrieve_bytes(self, key):
+        s = select(self.items.c.blob).where(self.items.c.key == key)
+        with Session(self.eng) as session:
+            result = session.execute(s)
+            data = result.fetchone()
+        found = data is not None and data[0] is not None
+        self._record_lookup(key, found)
+        return bytes(data[0]) if found else None
+
+    def retrieve(self, key):
+        """Retrieve a value saved with either :any:`save_bytes` (returned as
+        bytes) or :any:`save_json` (returned decoded), or None."""
+        s = select(self.items.c.data, self.items.c.blob).where(self.items.c.key == key)
+        with Session(self.eng) as session:
+            result = session.execute(s)
+            value = _decode_row(result.fetchone())
+        self._record_lookup(key, value is not None)
+        return value
+
+    def retrieve_with_updated(self, key):
+        """Retrieve a value as in :any:`retrieve` along with the time it was
+        last updated, in a single query.
+
+        Returns
+        -------
+        tuple
+            ``(value, updated)``, or ``(None, None)`` if the key does not
+            exist.
+        """
+        s = select(self.items.c.data, self.items.c.blob, self.items.c.updated).where(
+            self.items.c.key == key
+        )
+        with Session(self.eng) as session:
+            result = session.execute(s)
+            row = result.fetchone()
+        if row is None:
+            self._record_lookup(key, False)
+            return None, None
+        value = _decode_row(row[:2])
+        self._record_lookup(key, value is not None)
+        return value, get_datetime_if_exists(row[2:])
+
+    def retrieve_many(self, keys):
+        """Retrieve several values as in :any:`retrieve` with one query.
+
+        Returns
+        -------
+        dict
+            Values keyed by cache key. Keys that do not exist are omitted.
+        """
+        return {
+            key: value
+            for key, (value, _) in self.retrieve_many_with_updated(keys).items()
+        }
+
+    def retrieve_many_with_updated(self, keys, stale=None):
+        """Retrieve several values as in :any:`retrieve_with_updated` with one
+        query.
+
+        Parameters
+        ----------
+        keys : iterable of str
+            Cache keys.
+        stale : dict, optional
+            ``(start, end)`` ranges of update times keyed by cache key within
+            which the value of the key is stale. Whether values are stale is
+            decided by the database, which does not send them.
+
+        Returns
+        -------
+        dict
+            ``(value, updated)`` tuples keyed by cache key, with None values
+            for stale keys. Keys that do not exist are omitted.
+        """
+        keys = list(keys)
+        stale = stale or {}
+        results = {}
+        with Session(self.eng) as session:
+            for chunk in _chunks(keys):
+                data, blob = self.items.c.data, self.items.c.blob
+                keys_by_range = {}
+                for key in chunk:
+                    if stale.get(key) is not None:
+                        keys_by_range.setdefault(stale[key], []).append(key)
+                if len(keys_by_range) > 0:
+                    is_stale = or_(
+                        *[
+                            and_(
+                                self.items.c.key.in_(range_keys),
+                                self.items.c.updated >= start,
+                                self.items.c.updated < end,
+                            )
+                            for (start, end), range_keys in keys_by_range.items()
+                        ]
+                    )
+                    data = case((is_stale, None), else_=data)
+                    blob = case((is_stale, None), else_=blob)
+                s = select(self.items.c.key, data, blob, self.items.c.updated).where(
+                    self.items.c.key.in_(chunk)
+                )
+                for row in session.execute(s):
+                    results[row[0]] = (
+                        _decode_row(row[1:3]),
+                        get_datetime_if_exists(row[3:]),
+                    )
+        self._record_lookups(
+            {key: key in results and results[key][0] is not None for key in keys}
+        )
+        return results
+
+    def retrieve_observations(self, keys, start, end, stale=None):
+        """Retrieve the values of station year series between two times
+        (inclusive) from the ``observations`` table, reading only the rows of
+        that range rather than whole values.
+
+        Parameters
+        ----------
+        keys : list of str
+            Keys of the station years of one series covering ``start`` to
+            ``end``, e.g. ``isd-hourly-722874-2006`` and
+            ``isd-hourly-722874-2007``.
+        start, end : datetime.datetime
+            UTC times of the range.
+        stale : dict, optional
+            As for :any:`retrieve_many_with_updated`.
+
+        Returns
+        -------
+        pandas.Series or None
+            Values indexed by their UTC times, leaving out missing values, or
+            None if any of the keys does not exist, is stale or was saved
+            without observations.
+        """
+        keys = list(keys)
+        series = {_observation_series(key) for key in keys}
+        stale = stale or {}
+        if len(keys) == 0 or None in series or len({s[:3] for s in series}) > 1:
+            return None
+        source, freq, usaf_id, _ = series.pop()
+        with Session(self.eng) as session:
+            s = select(
+                self.items.c.key, self.items.c.updated, self.items.c.n_observations
+            ).where(self.items.c.key.in_(keys))
+            found = {
+                key: get_datetime_if_exists([updated])
+                for key, updated, n_observations in session.execute(s)
+                if n_observations is not None
+            }
+            if len(found) < len(keys) or any(
+                _is_stale(found[key], stale.get(key)) for key in keys
+            ):
                 return None
-            else:
-                return json.loads(data[0])
+            s = (
+                select(self.observations.c.timestamp, self.observations.c.value)
+                .where(
+                    self.observations.c.source == source,
+                    self.observations.c.freq == freq,
+                    self.observations.c.usaf_id == usaf_id,
+                    self.observations.c.timestamp >= math.ceil(start.timestamp()),
+                    self.observations.c.timestamp <= math.floor(end.timestamp()),
+                )
+                .order_by(self.observations.c.timestamp)
+            )
+            rows = session.execute(s).all()
+        self._record_lookups({key: True for key in keys})
+        timestamps = np.array([row[0] for row in rows], dtype=np.int64)
+        values = np.array([row[1] for row in rows], dtype=float)
+        return pd.Series(values, index=pd.to_datetime(timestamps, unit="s", utc=True))
 
     def key_updated(self, key):
         s = select(self.items.c.updated).where(self.items.c.key == key)
@@ -136,10 +989,238 @@ class KeyValueStore(object):
             return get_datetime_if_exists(data)
 
     def clear(self, key=None):
-        if key is None:
-            s = self.items.delete()
+        def write(session):
+            if key is None:
+                session.execute(self.items.delete())
+                session.execute(self.observations.delete())
+            else:
+                session.execute(self.items.delete().where(self.items.c.key == key))
+                self._delete_observations(session, [key])
+
+        self._write(write)
+        if self.memory_cache is not None:
+            self.memory_cache.invalidate(key)
+
+    def _reset_access_log(self):
+        self._accessed = {}  # key -> time of last read
+        self._lookup_counts = {}  # prefix -> [hits, misses]
+        self._n_pending = 0
+        self._last_flush = time.monotonic()
+
+    def _record_lookup(self, key, found):
+        self._record_lookups({key: found})
+
+    def _record_lookups(self, found):
+        # buffer access times and hit/miss counts for LRU retention and stats
+        if not self.record_accesses:
+            return
+        now = datetime.now(pytz.UTC)
+        with self._access_lock:
+            for key, hit in found.items():
+                if hit:
+                    self._accessed[key] = now
+                counts = self._lookup_counts.setdefault(_key_prefix(key), [0, 0])
+                counts[0 if hit else 1] += 1
+            self._n_pending += len(found)
+            flush = (
+                self._n_pending >= ACCESS_FLUSH_SIZE
+                or time.monotonic() - self._last_flush > ACCESS_FLUSH_INTERVAL
+            )
+        if flush:
+            try:
+                self.flush_accesses()
+            except OperationalError as e:
+                # losing some access statistics is better than failing a read
+                logger.warning("Could not write cache access log: {}".format(e))
+
+    def flush_accesses(self):
+        """Write buffered access times and hit/miss counts.
+
+        With ``record_accesses``, lookups are buffered in memory and written
+        every ``ACCESS_FLUSH_SIZE`` lookups or ``ACCESS_FLUSH_INTERVAL``
+        seconds, and at exit.
+        """
+        with self._access_lock:
+            accessed, lookup_counts = self._accessed, self._lookup_counts
+            self._reset_access_log()
+        if len(accessed) == 0 and len(lookup_counts) == 0:
+            return
+
+        def write(session):
+            if len(accessed) > 0:
+                session.execute(
+                    self.items.update()
+                    .where(self.items.c.key == bindparam("_key"))
+                    .values(accessed=bindparam("_accessed")),
+                    [{"_key": key, "_accessed": dt} for key, dt in accessed.items()],
+                )
+            for prefix, (hits, misses) in sorted(lookup_counts.items()):
+                self._add_lookup_counts(session, prefix, hits, misses)
+
+        self._write(write)
+
+    def _add_lookup_counts(self, session, prefix, hits, misses):
+        insert = _DIALECT_INSERTS.get(self.eng.dialect.name)
+        if insert is None:
+            result = session.execute(
+                self.lookups.update()
+                .where(self.lookups.c.prefix == prefix)
+                .values(
+                    hits=self.lookups.c.hits + hits,
+                    misses=self.lookups.c.misses + misses,
+                )
+            )
+            if result.rowcount == 0:
+                session.execute(
+                    self.lookups.insert().values(
+                        prefix=prefix, hits=hits, misses=misses
+                    )
+                )
         else:
-            s = self.items.delete().where(self.items.c.key == key)
-        with Session(self.eng) as session:
+            s = insert(self.lookups).values(prefix=prefix, hits=hits, misses=misses)
+            s = s.on_conflict_do_update(
+                index_elements=[self.lookups.c.prefix],
+                set_={
+                    "hits": self.lookups.c.hits + s.excluded.hits,
+                    "misses": self.lookups.c.misses + s.excluded.misses,
+                },
+            )
             session.execute(s)
-            session.commit()
+
+    def _size_column(self):
+        # rows written before sizes were recorded
+        return func.coalesce(
+            self.items.c.size,
+            func.length(self.items.c.data),
+            func.length(self.items.c.blob),
+            0,
+        )
+
+    def stats(self):
+        """Summarize cached values by key prefix, the first two dash separated
+        parts of the key (e.g. ``isd-hourly``).
+
+        Returns
+        -------
+        list of dict
+            One dict per prefix, sorted by prefix, with the number of
+            ``rows``, their total size in ``bytes``, and the number of lookups
+            which found (``hits``) or did not find (``misses``) a value along
+            with the ``hit_ratio`` (None if there were no lookups, e.g.
+            because they are not recorded).
+        """
+        self.flush_accesses()
+        stats = {}
+
+        def prefix_stats(prefix):
+            return stats.setdefault(
+                prefix,
+                {"prefix": prefix, "rows": 0, "bytes": 0, "hits": 0, "misses": 0},
+            )
+
+        with Session(self.eng) as session:
+            for key, size in session.execute(
+                select(self.items.c.key, self._size_column())
+            ):
+                entry = prefix_stats(_key_prefix(key))
+                entry["rows"] += 1
+                entry["bytes"] += size
+            for prefix, hits, misses in session.execute(select(self.lookups)):
+                entry = prefix_stats(prefix)
+                entry["hits"] += hits
+                entry["misses"] += misses
+
+        for entry in stats.values():
+            n_lookups = entry["hits"] + entry["misses"]
+            entry["hit_ratio"] = entry["hits"] / n_lookups if n_lookups else None
+        return [stats[prefix] for prefix in sorted(stats)]
+
+    def gc(self, policy):
+        """Remove entries beyond the limits of a :any:`RetentionPolicy`.
+
+        Entries count as used when they were last written, or read if
+        ``record_accesses`` is set. Space is returned to the filesystem by
+        :any:`compact`.
+
+        Returns
+        -------
+        dict
+            Number of ``rows`` removed and their total size in ``bytes``.
+        """
+        self.flush_accesses()
+        s = select(
+            self.items.c.key,
+            self._size_column(),
+            self.items.c.updated,
+            self.items.c.accessed,
+        )
+        with Session(self.eng) as session:
+            entries = [
+                (key, size, _as_utc(updated), _as_utc(accessed))
+                for key, size, updated, accessed in session.execute(s)
+            ]
+        keys, n_bytes = _select_for_removal(entries, policy)
+
+        def write(session):
+            for chunk in _chunks(keys):
+                session.execute(self.items.delete().where(self.items.c.key.in_(chunk)))
+            self._delete_observations(session, keys)
+
+        if len(keys) > 0:
+            self._write(write)
+        if self.memory_cache is not None:
+            for key in keys:
+                self.memory_cache.invalidate(key)
+        return {"rows": len(keys), "bytes": n_bytes}
+
+    def compact(self, pages=None):
+        """Return space freed by removed entries to the filesystem.
+
+        On SQLite, runs an incremental vacuum of up to ``pages`` free pages
+        (all of them by default) and truncates the write-ahead log. Databases
+        created before incremental vacuuming was enabled are converted with a
+        full ``VACUUM`` the first time. On PostgreSQL, runs ``VACUUM`` on the
+        cache tables. Other databases are left alone.
+
+        Returns
+        -------
+        tuple
+            Size of the database in bytes before and after compaction, or
+            ``(None, None)`` if unknown.
+        """
+        dialect = self.eng.dialect.name
+        with self.eng.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            if dialect == "sqlite":
+
+                def size():
+                    page_count = conn.exec_driver_sql("PRAGMA page_count").scalar()
+                    page_size = conn.exec_driver_sql("PRAGMA page_size").scalar()
+                    return page_count * page_size
+
+                before = size()
+                if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+                    conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+                    conn.exec_driver_sql("VACUUM")
+                else:
+                    # pysqlite only steps a statement once, which frees a
+                    # single page; executescript runs it to completion
+                    conn.connection.dbapi_connection.executescript(
+                        "PRAGMA incremental_vacuum{};".format(
+                            "" if pages is None else "({:d})".format(pages)
+                        )
+                    )
+                conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+                return before, size()
+            elif dialect == "postgresql":  # pragma: no cover
+
+                def size():
+                    return conn.exec_driver_sql(
+                        "SELECT pg_total_relation_size('items')"
+                        " + pg_total_relation_size('lookups')"
+                        " + pg_total_relation_size('observations')"
+                    ).scalar()
+
+                before = size()
+                conn.exec_driver_sql("VACUUM items, lookups, observations")
+                return before, size()
+        return None, None  # pragma: no cover
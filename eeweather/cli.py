@@ -17,6 +17,7 @@
    limitations under the License.
 
 """
+from datetime import timedelta
 import json
 import subprocess
 
@@ -27,8 +28,13 @@ from . import (
     get_isd_file_metadata as _get_isd_file_metadata,
     get_isd_filenames as _get_isd_filenames,
     get_gsod_filenames as _get_gsod_filenames,
+    ingest_gsod_archive as _ingest_gsod_archive,
+    build_normals_archive as _build_normals_archive,
+    build_weather_cube as _build_weather_cube,
 )
+from .cache import RetentionPolicy
 from .exceptions import UnrecognizedUSAFIDError
+import eeweather.connections
 
 from .database import build_metadata_db, inspect_metadata_db
 
@@ -69,6 +75,35 @@ def cli():
         $ eeweather inspect-gsod-filenames 722880 2017
         ftp://ftp.ncei.noaa.gov/pub/data/gsod/2017/722880-23152-2017.op.gz
 
+    Fill the GSOD cache for many stations from the yearly archive:
+
+    \b
+        $ eeweather ingest-gsod-archive 2017 --usaf-id 722880 --usaf-id 722874
+        Ingested GSOD data for 2 stations.
+
+    Pack TMY3 and CZ2010 normals from a directory of CSVs into an offline
+    archive (set EEWEATHER_NORMALS_ARCHIVE to use it):
+
+    \b
+        $ eeweather build-normals-archive normals.npy --csv-directory csv/
+        Wrote 1020 normal-year series to normals.npy.
+
+    Pack hourly temperatures of many stations and years into a memory-mapped
+    weather cube, or add the missing ones to an existing cube:
+
+    \b
+        $ eeweather build-weather-cube cube/ --start-year 2014 --end-year 2023
+        Wrote 28734 station years to cube/.
+
+    Summarize the weather data cache, trim it and return the space to the
+    filesystem:
+
+    \b
+        $ eeweather cache stats
+        $ eeweather cache gc --max-bytes 20G --prefix-max-bytes "isd-hourly-*=5G"
+        Removed 1532 entries (5368709120 bytes).
+        $ eeweather cache compact
+
     Rebuild metadata db from primary source files:
 
     \b
@@ -116,6 +151,157 @@ def inspect_gsod_filenames(usaf_id, year):
         click.echo(f)
 
 
+@cli.command()
+@click.argument("year", type=int)
+@click.option("--source", help="Local path or URL of the archive. Default: NOAA FTP.")
+@click.option("--usaf-id", "usaf_ids", multiple=True, help="Station(s) to ingest.")
+def ingest_gsod_archive(year, source, usaf_ids):
+    data = _ingest_gsod_archive(year, source=source, usaf_ids=usaf_ids or None)
+    click.echo("Ingested GSOD data for {} stations.".format(len(data)))
+
+
+@cli.command()
+@click.argument("path")
+@click.option(
+    "--source",
+    "sources",
+    multiple=True,
+    type=click.Choice(["TMY3", "CZ2010"]),
+    default=["TMY3", "CZ2010"],
+)
+@click.option(
+    "--csv-directory", help="Directory of original CSV files. Default: the cache."
+)
+@click.option("--usaf-id", "usaf_ids", multiple=True, help="Station(s) to include.")
+def build_normals_archive(path, sources, csv_directory, usaf_ids):
+    n = _build_normals_archive(
+        path, sources=sources, csv_directory=csv_directory, usaf_ids=usaf_ids or None
+    )
+    click.echo("Wrote {} normal-year series to {}.".format(n, path))
+
+
+@cli.command()
+@click.argument("path")
+@click.option("--start-year", type=int, help="First year of a new cube.")
+@click.option("--end-year", type=int, help="Last year of a new cube.")
+@click.option("--usaf-id", "usaf_ids", multiple=True, help="Station(s) to include.")
+@click.option(
+    "--no-fetch", is_flag=True, help="Only use data which is already in the cache."
+)
+def build_weather_cube(path, start_year, end_year, usaf_ids, no_fetch):
+    try:
+        n = _build_weather_cube(
+            path,
+            start_year=start_year,
+            end_year=end_year,
+            usaf_ids=usaf_ids or None,
+            fetch_from_web=not no_fetch,
+        )
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    click.echo("Wrote {} station years to {}.".format(n, path))
+
+
+_SIZE_UNITS = {"K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+_AGE_UNITS = {"d": "days", "h": "hours", "m": "minutes"}
+
+
+def _parse_size(value):
+    # e.g. "5G" or "1048576"
+    value = value.strip().upper().rstrip("B")
+    if value[-1:] in _SIZE_UNITS:
+        return int(float(value[:-1]) * _SIZE_UNITS[value[-1]])
+    return int(value)
+
+
+def _parse_age(value):
+    # e.g. "365d", "12h", or a number of days
+    value = value.strip()
+    if value[-1:] in _AGE_UNITS:
+        return timedelta(**{_AGE_UNITS[value[-1]]: float(value[:-1])})
+    return timedelta(days=float(value))
+
+
+def _parse_prefix_max_bytes(values):
+    prefix_max_bytes = {}
+    for value in values:
+        pattern, _, size = value.rpartition("=")
+        if not pattern:
+            raise click.BadParameter("Expected PATTERN=SIZE, got {}.".format(value))
+        prefix_max_bytes[pattern] = _parse_size(size)
+    return prefix_max_bytes
+
+
+@cli.group()
+def cache():
+    """Manage the weather data cache (see EEWEATHER_CACHE_URL)."""
+
+
+@cache.command()
+def stats():
+    store = eeweather.connections.key_value_store_proxy.get_store()
+    rows = store.stats()
+    line = "{:<16} {:>10} {:>16} {:>10}"
+    click.echo(line.format("prefix", "rows", "bytes", "hit ratio"))
+    for row in rows:
+        hit_ratio = row["hit_ratio"]
+        click.echo(
+            line.format(
+                row["prefix"],
+                row["rows"],
+                row["bytes"],
+                "-" if hit_ratio is None else "{:.1%}".format(hit_ratio),
+            )
+        )
+    click.echo(
+        line.format(
+            "total",
+            sum(row["rows"] for row in rows),
+            sum(row["bytes"] for row in rows),
+            "",
+        ).rstrip()
+    )
+
+
+@cache.command()
+@click.option("--max-bytes", type=_parse_size, help="Total size to keep, e.g. 20G.")
+@click.option(
+    "--max-age", type=_parse_age, help="Remove entries older than this, e.g. 365d."
+)
+@click.option(
+    "--prefix-max-bytes",
+    multiple=True,
+    help='Size to keep for keys matching a pattern, e.g. "isd-hourly-*=5G".',
+)
+@click.option("--compact/--no-compact", default=False, help="Compact afterwards.")
+def gc(max_bytes, max_age, prefix_max_bytes, compact):
+    store = eeweather.connections.key_value_store_proxy.get_store()
+    policy = RetentionPolicy(
+        max_bytes=max_bytes,
+        max_age=max_age,
+        prefix_max_bytes=_parse_prefix_max_bytes(prefix_max_bytes),
+    )
+    result = store.gc(policy)
+    click.echo("Removed {rows} entries ({bytes} bytes).".format(**result))
+    if compact:
+        _compact(store, None)
+
+
+def _compact(store, pages):
+    before, after = store.compact(pages=pages)
+    if before is None:
+        click.echo("Compacted cache.")
+    else:
+        click.echo("Compacted cache from {} to {} bytes.".format(before, after))
+
+
+@cache.command()
+@click.option("--pages", type=int, help="Free at most this many pages.")
+def compact(pages):
+    store = eeweather.connections.key_value_store_proxy.get_store()
+    _compact(store, pages)
+
+
 @cli.command()
 @click.option("--zcta-geometry/--no-zcta-geometry", default=False)
 @click.option(
@@ -17,78 +17,638 @@
    limitations under the License.
 
 """
+from contextlib import contextmanager
 import ftplib
 from io import BytesIO
 import logging
 import os
 import requests
 import sqlite3
+import tempfile
+import threading
+import time
+from urllib.parse import unquote, urlparse
+import weakref
 
-from .cache import KeyValueStore
+import urllib3
+
+from .cache import get_key_value_store
+from .exceptions import FetchError, FetchNotFoundError, FetchTransientError
+from .normals import NormalsArchive
+from .retry import get_retry_policy
 
 logger = logging.getLogger(__name__)
 
-__all__ = ("noaa_ftp_connection_proxy", "metadata_db_connection_proxy")
+__all__ = (
+    "get_noaa_connection_proxy",
+    "noaa_ftp_connection_proxy",
+    "metadata_db_connection_proxy",
+    "normals_archive_proxy",
+)
+
+
+NOAA_FTP_HOST = "ftp.ncei.noaa.gov"
+NOAA_HTTPS_URL = "https://www.ncei.noaa.gov"
+
+
+def _get_noaa_pool_size():
+    return int(os.environ.get("EEWEATHER_NOAA_POOL_SIZE", 4))
+
+
+def _get_noaa_ftp_connection(timeout=60, host=NOAA_FTP_HOST):  # pragma: no cover
+    # attempt anonymous connection; retried by the retry policy
+    try:
+        ftp = ftplib.FTP(host, timeout=timeout)
+        ftp.login()  # default u='anonymous' p='anonymous@'
+    except ftplib.all_errors as e:
+        raise FetchTransientError("ftp://{}".format(host), e)
+    logger.info("Connected to {}.".format(host))
+    return ftp
 
 
-def _get_noaa_ftp_connection(n_tries=5, timeout=60):  # pragma: no cover
-    host = "ftp.ncei.noaa.gov"
-    for i in range(n_tries):
-        # attempt anonymous connection
+def _check_response(url, response):
+    # raise the error matching the status of an HTTP response
+    if response.status_code in (404, 410):
+        raise FetchNotFoundError(url, "HTTP {}".format(response.status_code))
+    if response.status_code in (408, 429) or response.status_code >= 500:
+        raise FetchTransientError(url, "HTTP {}".format(response.status_code))
+    if response.status_code >= 400:
+        raise FetchError(url, "HTTP {}".format(response.status_code))
+
+
+def _request_text(url, session=requests, policy=None):
+    policy = policy or get_retry_policy()
+    host = urlparse(url).netloc
+
+    def fetch():
         try:
-            ftp = ftplib.FTP(host, timeout=timeout)
-            ftp.login()  # default u='anonymous' p='anonymous@'
-            logger.info("Connected to {}.".format(host))
-            return ftp
-        except ftplib.all_errors as e:
-            logger.warn(
-                "Failed attempt ({} of {}) to connect to {}:\n{}".format(
-                    i + 1, n_tries, host, e
-                )
-            )
+            response = session.get(url, timeout=policy.timeout(host))
+        except IOError as e:  # e.g. requests.ConnectionError
+            raise FetchTransientError(url, e)
+        _check_response(url, response)
+        return response.text
+
+    return policy.call(host, url, fetch)
+
 
-    raise RuntimeError("Could not connect to {}.".format(host))
+def _close_quietly(ftp):
+    try:
+        ftp.quit()
+    except ftplib.all_errors:
+        ftp.close()
+
+
+# all FTP connection proxies, so forked child processes do not share the
+# control connections of their parent
+_ftp_connection_proxies = weakref.WeakSet()
+
+
+def _reset_ftp_connection_proxies_after_fork():  # pragma: no cover
+    for proxy in list(_ftp_connection_proxies):
+        proxy._reset_pool()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_ftp_connection_proxies_after_fork)
 
 
 class NOAAFTPConnectionProxy(object):
-    def __init__(self):
-        self._connection = None
+    """Bounded pool of logged-in connections to the NOAA FTP server, safe to
+    use from many threads at once.
 
-    def get_connection(self):  # pragma: no cover
-        if self._connection is None:
-            self._connection = _get_noaa_ftp_connection()
-        return self._connection
+    Each download checks a connection out of the pool for its duration, so
+    up to ``pool_size`` files are retrieved in parallel and further callers
+    wait for a connection to be returned. Idle connections are reused, most
+    recently used first; those idle for longer than ``idle_timeout`` seconds
+    are closed instead, and those idle for longer than
+    ``health_check_interval`` seconds are checked with a ``NOOP`` first and
+    replaced if it fails.
 
-    def reconnect(self):  # pragma: no cover
-        if self._connection is not None:
-            self._connection.close()
-            self._connection = None
-        return self.get_connection()
+    Connecting and downloading are retried following a
+    :any:`eeweather.retry.RetryPolicy`, which also sets the timeout of new
+    connections. Files which do not exist (``550`` replies) are not retried.
 
-    def read_file_as_bytes(self, filename):  # pragma: no cover
-        ftp = self.get_connection()
+    Parameters
+    ----------
+    pool_size : int, optional
+        Maximum number of open connections. Defaults to
+        ``EEWEATHER_NOAA_POOL_SIZE`` if set, else 4.
+    idle_timeout : float, optional
+        Seconds after which an idle connection is closed rather than reused.
+    health_check_interval : float, optional
+        Seconds after which an idle connection is checked before reuse.
+    host : str, optional
+        FTP server to connect to.
+    connect : callable, optional
+        Function returning a new logged-in :any:`ftplib.FTP`, instead of
+        connecting to ``host``.
+    policy : :any:`eeweather.retry.RetryPolicy`, optional
+        Defaults to :any:`eeweather.retry.get_retry_policy`.
+    """
 
-        bytes_string = BytesIO()
+    def __init__(
+        self,
+        pool_size=None,
+        idle_timeout=60,
+        health_check_interval=10,
+        host=NOAA_FTP_HOST,
+        connect=None,
+        policy=None,
+    ):
+        if pool_size is None:
+            pool_size = _get_noaa_pool_size()
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1, got {}".format(pool_size))
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.host = host
+        self._connect = connect or self._connect_to_host
+        self._policy = policy
+        self._reset_pool()
+        _ftp_connection_proxies.add(self)
+
+    @property
+    def policy(self):
+        return self._policy or get_retry_policy()
+
+    def _connect_to_host(self):  # pragma: no cover
+        return _get_noaa_ftp_connection(
+            timeout=self.policy.timeout(self.host), host=self.host
+        )
+
+    def _reset_pool(self):
+        # forgets connections without closing them, e.g. those of a parent
+        # process after a fork
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._idle = []  # (connection, time returned), oldest first
+
+    def _checkout(self):
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    if len(self._idle) == 0:
+                        break
+                    ftp, returned = self._idle.pop()
+                idle = time.monotonic() - returned
+                if idle > self.idle_timeout:
+                    _close_quietly(ftp)
+                    continue
+                if idle > self.health_check_interval:
+                    try:
+                        ftp.voidcmd("NOOP")
+                    except ftplib.all_errors as e:
+                        logger.info("Replacing broken FTP connection: {}".format(e))
+                        ftp.close()
+                        continue
+                return ftp
+            return self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _checkin(self, ftp):
+        with self._lock:
+            self._idle.append((ftp, time.monotonic()))
+        self._slots.release()
+
+    def _discard(self, ftp):
+        ftp.close()
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Check a connection out of the pool for the duration of a ``with``
+        block. It is closed rather than returned if the block raises."""
+        ftp = self._checkout()
         try:
+            yield ftp
+        except BaseException:
+            self._discard(ftp)
+            raise
+        self._checkin(ftp)
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for ftp, _ in idle:
+            _close_quietly(ftp)
+
+    def _retrieve(self, filename, write, reset):
+        # RETR filename with a pooled connection, following the retry policy
+        url = "ftp://{}{}".format(self.host, filename)
+
+        def fetch():
+            ftp = self._checkout()
             try:
-                ftp.retrbinary("RETR {}".format(filename), bytes_string.write)
-            except (ftplib.error_temp, ftplib.error_perm, EOFError, IOError) as e:
+                ftp.retrbinary("RETR {}".format(filename), write)
+            except ftplib.error_perm as e:
+                if str(e).startswith("530"):
+                    # logged out, e.g. after a server restart; log in again
+                    self._discard(ftp)
+                    reset()
+                    raise FetchTransientError(url, e)
+                # the server answered, so the connection is fine
+                self._checkin(ftp)
+                if str(e).startswith("550"):
+                    # no such file
+                    raise FetchNotFoundError(url, e)
+                # e.g. 501 or 553, which retrying won't change
+                raise FetchError(url, e)
+            except (ftplib.Error, EOFError, IOError) as e:
                 # Bad connection. attempt to reconnect.
-                logger.warn(
-                    "Failed RETR {}:\n{}\n" "Attempting reconnect.".format(filename, e)
-                )
-                ftp = self.reconnect()
-                ftp.retrbinary("RETR {}".format(filename), bytes_string.write)
-        except Exception as e:
-            logger.warn(
-                "Failed RETR {}:\n{}\n" "Not attempting reconnect.".format(filename, e)
+                self._discard(ftp)
+                reset()
+                raise FetchTransientError(url, e)
+            except BaseException:
+                self._discard(ftp)
+                raise
+            self._checkin(ftp)
+
+        try:
+            self.policy.call(self.host, url, fetch)
+        except FetchNotFoundError:
+            logger.info("{} does not exist.".format(url))
+            return False
+        logger.info("Successfully retrieved {}".format(url))
+        return True
+
+    def read_file_as_bytes(self, filename):
+        bytes_string = BytesIO()
+
+        def reset():
+            bytes_string.seek(0)
+            bytes_string.truncate()
+
+        if not self._retrieve(filename, bytes_string.write, reset):
+            return None
+        bytes_string.seek(0)
+        return bytes_string
+
+    def read_file_into(self, filename, stream):
+        """Stream a file into ``stream`` block by block as it is downloaded.
+
+        ``stream`` must provide ``write(chunk)`` and ``reset()``; ``reset`` is
+        called before a download is retried so partial data is discarded.
+        Returns True if the whole file was retrieved and False if it does not
+        exist. Raises :any:`eeweather.FetchTransientError` if it could not be
+        retrieved within the retry policy, and :any:`eeweather.FetchError`
+        without retrying if the server refuses it for another reason.
+        """
+        return self._retrieve(filename, stream.write, stream.reset)
+
+    def request_text(self, url):  # pragma: no cover
+        """Get the text of a web resource, e.g. TMY3 data. Raises
+        :any:`eeweather.FetchNotFoundError` if it does not exist."""
+        return _request_text(url, policy=self.policy)
+
+
+def _if_range(headers):
+    # validator of a response for resuming it with If-Range; weak ETags
+    # can't be used for range requests
+    etag = headers.get("ETag")
+    if etag is not None and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+
+class NOAAHTTPConnectionProxy(object):
+    """Access to the NOAA ISD and GSOD files over HTTPS, as an alternative to
+    :any:`NOAAFTPConnectionProxy` for networks which block FTP. Selected with
+    an ``https://`` ``EEWEATHER_NOAA_URL``.
+
+    Files are read from the same ``/pub/data/...`` paths as over FTP with
+    one :any:`requests.Session` keeping up to ``pool_size`` connections
+    alive, so it is safe to use from many threads at once and each file only
+    costs one request. Gzipped files are passed through as sent rather than
+    decompressed, and a download which breaks off is resumed where it
+    stopped with a range request, conditional on the file not having changed
+    since (``If-Range``). Requests are retried, and time out, following a
+    :any:`eeweather.retry.RetryPolicy`.
+
+    Parameters
+    ----------
+    url : str, optional
+        Base URL of the server.
+    pool_size : int, optional
+        Maximum number of open connections. Defaults to
+        ``EEWEATHER_NOAA_POOL_SIZE`` if set, else 4.
+    block_size : int, optional
+        Bytes read at a time.
+    session : :any:`requests.Session`, optional
+        Session to use instead of a new one.
+    policy : :any:`eeweather.retry.RetryPolicy`, optional
+        Defaults to :any:`eeweather.retry.get_retry_policy`.
+    """
+
+    def __init__(
+        self,
+        url=NOAA_HTTPS_URL,
+        pool_size=None,
+        block_size=65536,
+        session=None,
+        policy=None,
+    ):
+        if pool_size is None:
+            pool_size = _get_noaa_pool_size()
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1, got {}".format(pool_size))
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=1, pool_maxsize=pool_size, pool_block=True
             )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.url = url.rstrip("/")
+        self.host = urlparse(url).netloc
+        self.pool_size = pool_size
+        self.block_size = block_size
+        self.session = session
+        self._policy = policy
+
+    @property
+    def policy(self):
+        return self._policy or get_retry_policy()
+
+    def close(self):
+        """Close all idle connections."""
+        self.session.close()
+
+    def _retrieve(self, filename, write, reset):
+        # GET filename following the retry policy, resuming the download
+        # where a failed attempt stopped
+        url = self.url + filename
+        # bytes written and validator of the file they are from
+        progress = {"received": 0, "validator": None}
+
+        def fetch():
+            # the files are gzipped already
+            headers = {"Accept-Encoding": "identity"}
+            if progress["received"] > 0 and progress["validator"] is not None:
+                headers["Range"] = "bytes={}-".format(progress["received"])
+                headers["If-Range"] = progress["validator"]
+            try:
+                with self.session.get(
+                    url,
+                    headers=headers,
+                    stream=True,
+                    timeout=self.policy.timeout(self.host),
+                ) as response:
+                    _check_response(url, response)
+                    content_range = response.headers.get("Content-Range", "")
+                    if response.status_code != 206 or not content_range.startswith(
+                        "bytes {}-".format(progress["received"])
+                    ):
+                        # the whole file, e.g. because it has changed
+                        if progress["received"] > 0:
+                            reset()
+                        progress["received"] = 0
+                    progress["validator"] = _if_range(response.headers)
+                    for chunk in response.raw.stream(
+                        self.block_size, decode_content=False
+                    ):
+                        write(chunk)
+                        progress["received"] += len(chunk)
+            except (IOError, urllib3.exceptions.HTTPError) as e:
+                raise FetchTransientError(url, e)
+
+        try:
+            self.policy.call(self.host, url, fetch)
+        except FetchNotFoundError:
+            logger.info("{} does not exist.".format(url))
+            return False
+        logger.info("Successfully retrieved {}".format(url))
+        return True
+
+    def read_file_as_bytes(self, filename):
+        bytes_string = BytesIO()
+
+        def reset():
+            bytes_string.seek(0)
+            bytes_string.truncate()
+
+        if not self._retrieve(filename, bytes_string.write, reset):
             return None
+        bytes_string.seek(0)
+        return bytes_string
+
+    def read_file_into(self, filename, stream):
+        """Stream a file into ``stream`` block by block as it is downloaded.
+        See :any:`NOAAFTPConnectionProxy.read_file_into`."""
+        return self._retrieve(filename, stream.write, stream.reset)
+
+    def request_text(self, url):
+        """Get the text of a web resource, e.g. TMY3 data, with the same
+        session. Raises :any:`eeweather.FetchNotFoundError` if it does not
+        exist."""
+        return _request_text(url, self.session, self.policy)
+
+
+def _mirror_path(root, *parts):
+    # path of a file under root, never escaping it
+    parts = [part for path in parts for part in path.split("/") if part != ""]
+    if any(part in (".", "..") for part in parts):
+        raise ValueError("Invalid mirror path: {}".format("/".join(parts)))
+    return os.path.join(root, *parts)
+
+
+class _FileDownload(object):
+    # download target for read_file_into writing to an open file
+    def __init__(self, f):
+        self.file = f
+
+    def write(self, chunk):
+        self.file.write(chunk)
+
+    def reset(self):
+        self.file.seek(0)
+        self.file.truncate()
+
+
+def _write_atomically(path, write):
+    # write to a temporary file which is then renamed into place, so readers
+    # never see partial files; returns whether write succeeded
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            ok = write(f)
+        if ok:
+            os.replace(tmp_path, path)
+            return True
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.remove(tmp_path)
+    return False
+
+
+class NOAAMirrorConnectionProxy(object):
+    """Access to NOAA files and web resources in a local directory tree, e.g.
+    for machines without internet access. Selected with
+    ``EEWEATHER_MIRROR`` or a ``file://`` ``EEWEATHER_NOAA_URL``.
+
+    NOAA files are read from their paths under ``root``, e.g.
+    ``/pub/data/noaa/2007/722874-93134-2007.gz`` from
+    ``<root>/pub/data/noaa/2007/722874-93134-2007.gz``, and web resources
+    such as TMY3 and CZ2010 data from ``<root>/<host>/<path>`` of their URL.
+
+    Given an ``upstream`` connection proxy, files which are not in the mirror
+    yet are fetched from it and saved into the tree first (record-through),
+    so running once with network access fills the mirror for later offline
+    runs. Files are written to a temporary file which is then renamed into
+    place, so concurrent readers never see partial files.
+
+    Parameters
+    ----------
+    root : str
+        Root directory of the mirror.
+    upstream : optional
+        Connection proxy, e.g. a :any:`NOAAFTPConnectionProxy`, to fetch and
+        save missing files from. Without it, missing files are not found.
+    block_size : int, optional
+        Bytes read at a time.
+    """
+
+    def __init__(self, root, upstream=None, block_size=65536):
+        self.root = root
+        self.upstream = upstream
+        self.block_size = block_size
+
+    def __repr__(self):
+        return 'NOAAMirrorConnectionProxy("{}")'.format(self.root)
 
+    def _record(self, filename, path):
+        return _write_atomically(
+            path, lambda f: self.upstream.read_file_into(filename, _FileDownload(f))
+        )
+
+    def _retrieve(self, filename, write):
+        path = _mirror_path(self.root, filename)
+        if not os.path.exists(path):
+            if self.upstream is None or not self._record(filename, path):
+                logger.warning(
+                    "{} is not in the mirror at {}".format(filename, self.root)
+                )
+                return False
+            logger.info("Saved {} to the mirror at {}".format(filename, self.root))
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.block_size), b""):
+                write(chunk)
+        return True
+
+    def read_file_as_bytes(self, filename):
+        bytes_string = BytesIO()
+        if not self._retrieve(filename, bytes_string.write):
+            return None
         bytes_string.seek(0)
-        logger.info("Successfully retrieved ftp://ftp.ncei.noaa.gov{}".format(filename))
         return bytes_string
 
+    def read_file_into(self, filename, stream):
+        """Stream a file into ``stream`` block by block. See
+        :any:`NOAAFTPConnectionProxy.read_file_into`."""
+        return self._retrieve(filename, stream.write)
+
+    def request_text(self, url):
+        """Get the text of a web resource, e.g. TMY3 data, from
+        ``<root>/<host>/<path>``."""
+        parsed = urlparse(url)
+        path = _mirror_path(self.root, parsed.netloc, parsed.path)
+        if not os.path.exists(path):
+            if self.upstream is None:
+                raise FetchNotFoundError(url, "not in the mirror at " + self.root)
+            data = self.upstream.request_text(url).encode("utf-8")
+
+            def write(f):
+                f.write(data)
+                return True
+
+            _write_atomically(path, write)
+            logger.info("Saved {} to the mirror at {}".format(url, self.root))
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+
+def get_noaa_connection_proxy(url=None):
+    """Get access to the NOAA ISD and GSOD files for a URL.
+
+    Parameters
+    ----------
+    url : str, optional
+        ``ftp://`` URL of an FTP server (see :any:`NOAAFTPConnectionProxy`),
+        ``https://`` URL of a web server (see
+        :any:`NOAAHTTPConnectionProxy`) serving the ``/pub/data/...`` paths
+        or ``file://`` URL of a local mirror of them (see
+        :any:`NOAAMirrorConnectionProxy`). Defaults to
+        ``EEWEATHER_NOAA_URL`` if set, else ``ftp://ftp.ncei.noaa.gov``, read
+        through the mirror at ``EEWEATHER_MIRROR`` if that is set. Files
+        missing from that mirror are fetched from the URL and saved into it
+        if ``EEWEATHER_MIRROR_RECORD`` is set to a non-empty value other than
+        ``0``. The path of an ``ftp://`` URL must be empty, as the files
+        are always looked up at their ``/pub/data/...`` paths.
+    """
+    if url is None:
+        url = os.environ.get("EEWEATHER_NOAA_URL", "ftp://" + NOAA_FTP_HOST)
+        mirror = os.environ.get("EEWEATHER_MIRROR")
+        if mirror:
+            upstream = None
+            if os.environ.get("EEWEATHER_MIRROR_RECORD", "") not in ("", "0"):
+                upstream = get_noaa_connection_proxy(url)
+            return NOAAMirrorConnectionProxy(mirror, upstream=upstream)
+    parsed = urlparse(url)
+    if parsed.scheme == "ftp":
+        if parsed.path not in ("", "/"):
+            raise ValueError(
+                "Unsupported NOAA URL: {} (FTP URLs can't have a path)".format(url)
+            )
+        return NOAAFTPConnectionProxy(host=parsed.netloc)
+    if parsed.scheme in ("http", "https"):
+        return NOAAHTTPConnectionProxy(url)
+    if parsed.scheme == "file":
+        return NOAAMirrorConnectionProxy(unquote(parsed.netloc + parsed.path))
+    raise ValueError("Unsupported NOAA URL: {}".format(url))
+
+
+class NOAAConnectionProxy(object):
+    """Access to the NOAA ISD and GSOD files through the transport which
+    :any:`get_noaa_connection_proxy` selects from the environment. It is
+    created on first use, and again whenever ``EEWEATHER_NOAA_URL``,
+    ``EEWEATHER_MIRROR`` or ``EEWEATHER_MIRROR_RECORD`` have changed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._environment = None
+        self._proxy = None
+
+    def get_proxy(self):
+        environment = tuple(
+            os.environ.get(variable)
+            for variable in (
+                "EEWEATHER_NOAA_URL",
+                "EEWEATHER_MIRROR",
+                "EEWEATHER_MIRROR_RECORD",
+            )
+        )
+        with self._lock:
+            if self._proxy is None or self._environment != environment:
+                self._proxy = get_noaa_connection_proxy()
+                self._environment = environment
+            return self._proxy
+
+    def read_file_as_bytes(self, filename):
+        return self.get_proxy().read_file_as_bytes(filename)
+
+    def read_file_into(self, filename, stream):
+        return self.get_proxy().read_file_into(filename, stream)
+
+    def request_text(self, url):
+        return self.get_proxy().request_text(url)
+
 
 class MetadataDBConnectionProxy(object):
     def __init__(self):
@@ -110,11 +670,27 @@ class KeyValueStoreProxy(object):
 
     def get_store(self):  # pragma: no cover
         if self._store is None:
-            self._store = KeyValueStore()
+            self._store = get_key_value_store()
         return self._store
 
 
+class NormalsArchiveProxy(object):
+    def __init__(self):
+        self._archive = None
+
+    def get_archive(self):
+        """Get the normals archive at ``EEWEATHER_NORMALS_ARCHIVE``, or None if
+        that variable is not set."""
+        path = os.environ.get("EEWEATHER_NORMALS_ARCHIVE")
+        if path is None:
+            return None
+        if self._archive is None or self._archive.path != path:
+            self._archive = NormalsArchive(path)
+        return self._archive
+
+
 # Use proxies for lazy loading, abstraction
-noaa_ftp_connection_proxy = NOAAFTPConnectionProxy()
+noaa_ftp_connection_proxy = NOAAConnectionProxy()
 metadata_db_connection_proxy = MetadataDBConnectionProxy()
 key_value_store_proxy = KeyValueStoreProxy()
+normals_archive_proxy = NormalsArchiveProxy()
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+   Copyright 2018-2023 OpenEEmeter contributors
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+from datetime import datetime
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from .exceptions import NonUTCTimezoneInfoError, UnrecognizedUSAFIDError
+
+__all__ = ("WeatherCube",)
+
+DATA_FILENAME = "temps.npy"
+INDEX_FILENAME = "index.json"
+NS_PER_HOUR = 3600 * 10**9
+
+# rows are filled with NaN this many at a time when a cube is created
+_FILL_ROWS = 64
+
+
+def _to_utc_timestamp(dt):
+    ts = pd.Timestamp(dt)
+    if ts.tzinfo is None or ts.utcoffset().total_seconds() != 0:
+        raise NonUTCTimezoneInfoError(dt)
+    return ts
+
+
+class WeatherCube(object):
+    """Hourly temperatures of many stations over many years, kept in a
+    single memory-mapped ``float32`` array with one row per station and one
+    column per hour.
+
+    A cube is a directory holding the array (``temps.npy``) and an index
+    (``index.json``) of its stations, years and which station years have been
+    loaded. Create one with :any:`create` and fill it with
+    :any:`eeweather.build_weather_cube`.
+
+    Parameters
+    ----------
+    path : str
+        Directory of the cube.
+    mode : str, optional
+        ``"r"`` to read, ``"r+"`` to also write.
+    """
+
+    def __init__(self, path, mode="r"):
+        if mode not in ("r", "r+"):
+            raise ValueError('Expected mode "r" or "r+", got "{}"'.format(mode))
+        self.path = path
+        self.mode = mode
+        with open(os.path.join(path, INDEX_FILENAME)) as f:
+            index = json.load(f)
+        self.usaf_ids = index["usaf_ids"]
+        self.start_year = index["start_year"]
+        self.end_year = index["end_year"]
+        self._loaded = {
+            usaf_id: set(years) for usaf_id, years in index["loaded"].items()
+        }
+        self._rows = {usaf_id: i for i, usaf_id in enumerate(self.usaf_ids)}
+        self.index = pd.date_range(
+            datetime(self.start_year, 1, 1),
+            datetime(self.end_year, 12, 31, 23),
+            freq="H",
+            tz=pytz.UTC,
+        )
+        self.data = np.load(os.path.join(path, DATA_FILENAME), mmap_mode=mode)
+
+    @classmethod
+    def create(cls, path, usaf_ids, start_year, end_year):
+        """Create an empty (all NaN) cube.
+
+        Parameters
+        ----------
+        path : str
+            Directory of the cube, created if needed.
+        usaf_ids : list of str
+            Stations of the cube, in row order.
+        start_year, end_year : int
+            First and last year of the cube.
+
+        Returns
+        -------
+        WeatherCube
+            The cube, open for writing.
+        """
+        usaf_ids = list(usaf_ids)
+        if len(set(usaf_ids)) != len(usaf_ids):
+            raise ValueError("Duplicate USAF IDs")
+        os.makedirs(path, exist_ok=True)
+        n_hours = (datetime(end_year + 1, 1, 1) - datetime(start_year, 1, 1)).days * 24
+        data = np.lib.format.open_memmap(
+            os.path.join(path, DATA_FILENAME),
+            mode="w+",
+            dtype=np.float32,
+            shape=(len(usaf_ids), n_hours),
+        )
+        for i in range(0, len(usaf_ids), _FILL_ROWS):
+            data[i : i + _FILL_ROWS] = np.nan
+        data.flush()
+        del data
+        cls._write_index(
+            path,
+            {
+                "usaf_ids": usaf_ids,
+                "start_year": start_year,
+                "end_year": end_year,
+                "loaded": {},
+            },
+        )
+        return cls(path, mode="r+")
+
+    @staticmethod
+    def _write_index(path, index):
+        # written next to the index first and moved into place
+        fd, tmp_path = tempfile.mkstemp(dir=path, suffix=".json")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp_path, os.path.join(path, INDEX_FILENAME))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def __repr__(self):
+        return 'WeatherCube("{}")'.format(self.path)
+
+    def __len__(self):
+        return len(self.usaf_ids)
+
+    def __contains__(self, usaf_id):
+        return usaf_id in self._rows
+
+    def _row(self, usaf_id):
+        try:
+            return self._rows[usaf_id]
+        except KeyError:
+            raise UnrecognizedUSAFIDError(usaf_id)
+
+    def _rows_for(self, usaf_ids):
+        # a slice, so that indexing returns a view, when the rows are adjacent
+        if usaf_ids is None:
+            return slice(None)
+        rows = [self._row(usaf_id) for usaf_id in usaf_ids]
+        if len(rows) > 0 and rows == list(range(rows[0], rows[0] + len(rows))):
+            return slice(rows[0], rows[0] + len(rows))
+        return np.array(rows, dtype=np.intp)
+
+    def _columns_for(self, start, end):
+        first, last = 0, len(self.index)
+        if start is not None:
+            first = max(first, int(np.ceil(self._hours(_to_utc_timestamp(start)))))
+        if end is not None:
+            last = min(last, int(np.floor(self._hours(_to_utc_timestamp(end)))) + 1)
+        return slice(first, max(first, last))
+
+    def _hours(self, ts):
+        return (ts.value - self.index[0].value) / NS_PER_HOUR
+
+    def has_year(self, usaf_id, year):
+        """Whether a year of a station has been loaded."""
+        return year in self._loaded.get(usaf_id, ())
+
+    def write(self, usaf_id, year, ts, complete=True):
+        """Write one year of hourly temperatures of a station.
+
+        Parameters
+        ----------
+        usaf_id : str
+            USAF ID of the station.
+        year : int
+            Year of the data; values outside it are ignored.
+        ts : pandas.Series or None
+            Hourly temperatures with a UTC ``DatetimeIndex``, or None if
+            there are none.
+        complete : bool, optional
+            Whether the year is final and should be recorded as loaded, so it
+            is not loaded again.
+        """
+        if self.mode != "r+":
+            raise ValueError("{} is read-only".format(self))
+        row = self._row(usaf_id)
+        columns = self._columns_for(
+            datetime(year, 1, 1, tzinfo=pytz.UTC),
+            datetime(year, 12, 31, 23, tzinfo=pytz.UTC),
+        )
+        self.data[row, columns] = np.nan
+        if ts is not None and len(ts) > 0:
+            hours = (ts.index.asi8 - self.index[0].value) // NS_PER_HOUR
+            keep = (hours >= columns.start) & (hours < columns.stop)
+            self.data[row, hours[keep]] = ts.values[keep]
+        if complete:
+            self._loaded.setdefault(usaf_id, set()).add(year)
+
+    def flush(self):
+        """Write changes to disk, including which station years are loaded."""
+        if self.mode != "r+":
+            return
+        self.data.flush()
+        self._write_index(
+            self.path,
+            {
+                "usaf_ids": self.usaf_ids,
+                "start_year": self.start_year,
+                "end_year": self.end_year,
+                "loaded": {
+                    usaf_id: sorted(years)
+                    for usaf_id, years in sorted(self._loaded.items())
+                },
+            },
+        )
+
+    def values(self, usaf_ids=None, start=None, end=None):
+        """Temperatures of stations between two times (inclusive) as an array
+        with one row per station.
+
+        The array is a view of the memory-mapped cube, so nothing is read or
+        copied until it is used, if all stations are requested or the
+        requested stations are adjacent and in the order of the cube.
+        Otherwise only the requested rows are copied.
+
+        Parameters
+        ----------
+        usaf_ids : list of str, optional
+            Stations, all by default.
+        start, end : datetime.datetime, optional
+            UTC times, by default those of the first and last hour of the
+            cube.
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        return self.data[self._rows_for(usaf_ids), self._columns_for(start, end)]
+
+    def query(self, usaf_ids=None, start=None, end=None):
+        """Temperatures of stations between two times (inclusive) as a
+        DataFrame with one column per station, backed by :any:`values`.
+
+        Returns
+        -------
+        pandas.DataFrame
+        """
+        columns = self._columns_for(start, end)
+        return pd.DataFrame(
+            self.values(usaf_ids, start, end).T,
+            index=self.index[columns],
+            columns=self.usaf_ids if usaf_ids is None else list(usaf_ids),
+            copy=False,
+        )
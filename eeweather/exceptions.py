@@ -102,6 +102,22 @@ class GSODDataNotAvailableError(EEWeatherError):
         )
 
 
+class GSODArchiveNotAvailableError(EEWeatherError):
+    """Raised when the yearly GSOD archive cannot be retrieved.
+
+    Attributes
+    ----------
+    year : int
+        the year for which the GSOD archive could not be retrieved.
+    message : str
+        a message describing the error
+    """
+
+    def __init__(self, year):
+        self.year = year
+        self.message = "GSOD archive could not be retrieved for year {}.".format(year)
+
+
 class TMY3DataNotAvailableError(EEWeatherError):
     """Raised when TMY3 data is not available for a particular station.
 
@@ -151,3 +167,65 @@ class NonUTCTimezoneInfoError(EEWeatherError):
             '"{}" does not have a UTC timezone. If using the datetime package, it should be'
             " in the format datetime(1,1,1,tzinfo=pytz.UTC).".format(this_date)
         )
+
+
+class FetchError(EEWeatherError):
+    """Raised when a file or web resource cannot be fetched.
+
+    Attributes
+    ----------
+    url : str
+        the URL of the file or web resource.
+    reason : str
+        what went wrong.
+    message : str
+        a message describing the error
+    """
+
+    def __init__(self, url, reason):
+        self.url = url
+        self.reason = str(reason)
+        self.message = "Could not fetch {}: {}".format(url, self.reason)
+
+
+class FetchNotFoundError(FetchError):
+    """Raised when a file or web resource does not exist. Fetches which fail
+    with this error are not retried."""
+
+    pass
+
+
+class FetchTransientError(FetchError):
+    """Raised when fetching a file or web resource failed in a way which may
+    not happen again, e.g. a timeout, a broken connection or a server error.
+    Fetches which fail with this error are retried as far as the
+    :any:`eeweather.retry.RetryPolicy` allows."""
+
+    pass
+
+
+class CircuitOpenError(FetchTransientError):
+    """Raised instead of fetching from a host which has failed repeatedly,
+    until the :any:`eeweather.retry.RetryPolicy` tries it again.
+
+    Attributes
+    ----------
+    url : str
+        the URL which was not fetched.
+    host : str
+        the host which has failed.
+    retry_after : float
+        seconds until the host is tried again.
+    message : str
+        a message describing the error
+    """
+
+    def __init__(self, url, host, retry_after):
+        self.host = host
+        self.retry_after = retry_after
+        super(CircuitOpenError, self).__init__(
+            url,
+            "{} failed repeatedly, not trying again for {:.0f} seconds".format(
+                host, retry_after
+            ),
+        )
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+   Copyright 2018-2023 OpenEEmeter contributors
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+from datetime import datetime
+import json
+import math
+import os
+import tempfile
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from .cache import _get_memory_cache, _is_stale, _key_prefix, _select_for_removal
+from .serialization import decode_series_values, is_encoded, uncompress
+
+__all__ = ("FileKeyValueStore",)
+
+BYTES_EXTENSION = ".npy"
+JSON_EXTENSION = ".json"
+_EXTENSIONS = (BYTES_EXTENSION, JSON_EXTENSION)
+
+
+def _path_part(part):
+    # keep key parts readable but never let them escape the root directory
+    part = quote(part, safe="")
+    if part.startswith("."):
+        part = "%2E" + part[1:]
+    return part or "%00"
+
+
+def _key_from_path(path):
+    return "-".join(
+        "" if part == "%00" else unquote(part) for part in path.split(os.sep)
+    )
+
+
+def _mtime(path):
+    return datetime.fromtimestamp(os.stat(path).st_mtime, pytz.UTC)
+
+
+def _load_bytes(path):
+    try:
+        array = np.load(path, mmap_mode="r")
+    except ValueError:
+        # empty arrays can't be memory-mapped
+        array = np.load(path)
+    return memoryview(array)
+
+
+def _load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+class FileKeyValueStore(object):
+    """Key value store which keeps each value in its own file under a root
+    directory, as an alternative to :any:`eeweather.cache.KeyValueStore`
+    selected with a ``file://`` URL.
+
+    Keys are split on dashes into directories, so e.g.
+    ``isd-hourly-722874-2007`` is stored at ``isd/hourly/722874/2007.npy``.
+    Bytes values are stored as ``.npy`` files and read back memory-mapped
+    (as a ``memoryview``), with encoded series stored uncompressed. Decoding a
+    whole value still converts all of its values, but
+    :any:`retrieve_observations` only reads and converts those of the
+    requested range. JSON values are stored as ``.json`` files. Every write
+    goes to a temporary file which is then renamed into place, so readers
+    never see partial values and no locking is needed, e.g. to share a cache
+    over NFS.
+
+    Parameters
+    ----------
+    url : str
+        ``file://`` URL of the root directory, e.g.
+        ``file:///data/eeweather``. Add ``?mode=ro`` to open the cache
+        read-only, in which case saves and clears are ignored.
+    memory_cache : :any:`eeweather.cache.MemoryCache`, optional
+        As for :any:`eeweather.cache.KeyValueStore`.
+    """
+
+    # station years are read by range, see retrieve_observations
+    store_observations = True
+
+    def __init__(self, url, memory_cache=None):
+        parsed = urlparse(url)
+        if parsed.scheme != "file":
+            raise ValueError("Expected a file:// URL, got {}".format(url))
+        self.url = url
+        self.root = unquote(parsed.netloc + parsed.path)
+        self.read_only = parse_qs(parsed.query).get("mode") == ["ro"]
+        if not self.read_only:
+            os.makedirs(self.root, exist_ok=True)
+        if memory_cache is None:
+            memory_cache = _get_memory_cache()
+        self.memory_cache = memory_cache
+
+    def __repr__(self):
+        return 'FileKeyValueStore("{}")'.format(self.url)
+
+    def _path(self, key):
+        return os.path.join(self.root, *[_path_part(part) for part in key.split("-")])
+
+    def _find(self, key):
+        # path of the file holding key, or None
+        path = self._path(key)
+        for extension in _EXTENSIONS:
+            if os.path.exists(path + extension):
+                return path + extension
+        return None
+
+    def _load(self, path):
+        if path.endswith(BYTES_EXTENSION):
+            return _load_bytes(path)
+        return _load_json(path)
+
+    def _invalidate(self, key=None):
+        if self.memory_cache is not None:
+            self.memory_cache.invalidate(key)
+
+    def _write_file(self, key, extension, write):
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path + extension)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        # a value saved as the other type
+        for other in _EXTENSIONS:
+            if other != extension and os.path.exists(path + other):
+                os.remove(path + other)
+        self._invalidate(key)
+
+    def _save(self, key, value):
+        if self.read_only:
+            return
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            if is_encoded(value):
+                value = uncompress(value)
+            array = np.frombuffer(value, dtype=np.uint8)
+            self._write_file(
+                key, BYTES_EXTENSION, lambda f: np.save(f, array, allow_pickle=False)
+            )
+        else:
+            data = json.dumps(value, separators=(",", ":")).encode("utf-8")
+            self._write_file(key, JSON_EXTENSION, lambda f: f.write(data))
+
+    def key_exists(self, key):
+        return self._find(key) is not None
+
+    def save_json(self, key, data):
+        self._save(key, data)
+
+    def save_bytes(self, key, data):
+        self._save(key, bytes(data))
+
+    def save_many(self, items):
+        """Save several keys. Each value is replaced atomically, but unlike
+        :any:`eeweather.cache.KeyValueStore.save_many` not all of them at
+        once."""
+        for key, value in items.items():
+            self._save(key, value)
+
+    def retrieve_json(self, key):
+        path = self._path(key) + JSON_EXTENSION
+        return _load_json(path) if os.path.exists(path) else None
+
+    def retrieve_bytes(self, key):
+        path = self._path(key) + BYTES_EXTENSION
+        return _load_bytes(path) if os.path.exists(path) else None
+
+    def retrieve(self, key):
+        path = self._find(key)
+        return None if path is None else self._load(path)
+
+    def retrieve_with_updated(self, key):
+        path = self._find(key)
+        if path is None:
+            return None, None
+        try:
+            return self._load(path), _mtime(path)
+        except FileNotFoundError:  # removed since it was found
+            return None, None
+
+    def retrieve_many(self, keys):
+        return {
+            key: value
+            for key, (value, _) in self.retrieve_many_with_updated(keys).items()
+        }
+
+    def retrieve_many_with_updated(self, keys, stale=None):
+        stale = stale or {}
+        results = {}
+        for key in keys:
+            path = self._find(key)
+            if path is None:
+                continue
+            try:
+                updated = _mtime(path)
+                value = None if _is_stale(updated, stale.get(key)) else self._load(path)
+            except FileNotFoundError:  # removed since it was found
+                continue
+            results[key] = (value, updated)
+        return results
+
+    def retrieve_observations(self, keys, start, end, stale=None):
+        """Retrieve the values of station year series between two times
+        (inclusive) as :any:`eeweather.cache.KeyValueStore.retrieve_observations`
+        does, but from the memory-mapped files, reading and converting only
+        the values of that range."""
+        keys = list(keys)
+        stale = stale or {}
+        if len(keys) == 0:
+            return None
+        start, end = math.ceil(start.timestamp()), math.floor(end.timestamp())
+        seconds, values = [], []
+        for key in keys:
+            path = self._path(key) + BYTES_EXTENSION
+            try:
+                if _is_stale(_mtime(path), stale.get(key)):
+                    return None
+                data = _load_bytes(path)
+            except FileNotFoundError:
+                return None
+            if not is_encoded(data):
+                return None
+            try:
+                key_seconds, key_values = decode_series_values(data, start, end)
+            except ValueError:  # e.g. raw observations
+                return None
+            valid = ~np.isnan(key_values)
+            seconds.append(key_seconds[valid])
+            values.append(key_values[valid])
+        return pd.Series(
+            np.concatenate(values),
+            index=pd.to_datetime(np.concatenate(seconds), unit="s", utc=True),
+        )
+
+    def key_updated(self, key):
+        path = self._find(key)
+        return None if path is None else _mtime(path)
+
+    def _walk(self):
+        # (key, path) of every stored value
+        for directory, _, filenames in os.walk(self.root):
+            for filename in sorted(filenames):
+                name, extension = os.path.splitext(filename)
+                if extension not in _EXTENSIONS:
+                    continue
+                relative = os.path.relpath(os.path.join(directory, name), self.root)
+                yield _key_from_path(relative), os.path.join(directory, filename)
+
+    def _remove_empty_directories(self):
+        for directory, subdirectories, filenames in os.walk(self.root, topdown=False):
+            if directory != self.root and not os.listdir(directory):
+                os.rmdir(directory)
+
+    def clear(self, key=None):
+        if self.read_only:
+            return
+        if key is None:
+            for _, path in list(self._walk()):
+                os.remove(path)
+            self._remove_empty_directories()
+        else:
+            path = self._find(key)
+            if path is not None:
+                os.remove(path)
+        self._invalidate(key)
+
+    def flush_accesses(self):
+        """Lookups are not recorded by this store."""
+
+    def stats(self):
+        """Summarize stored values by key prefix as in
+        :any:`eeweather.cache.KeyValueStore.stats`. Lookups are not recorded,
+        so hit ratios are None."""
+        stats = {}
+        for key, path in self._walk():
+            prefix = _key_prefix(key)
+            entry = stats.setdefault(
+                prefix,
+                {
+                    "prefix": prefix,
+                    "rows": 0,
+                    "bytes": 0,
+                    "hits": 0,
+                    "misses": 0,
+                    "hit_ratio": None,
+                },
+            )
+            entry["rows"] += 1
+            entry["bytes"] += os.stat(path).st_size
+        return [stats[prefix] for prefix in sorted(stats)]
+
+    def gc(self, policy):
+        """Remove values beyond the limits of a
+        :any:`eeweather.cache.RetentionPolicy`, using file modification times
+        as last use."""
+        if self.read_only:
+            return {"rows": 0, "bytes": 0}
+        paths = {}
+        entries = []
+        for key, path in self._walk():
+            paths[key] = path
+            entries.append((key, os.stat(path).st_size, _mtime(path), None))
+        keys, n_bytes = _select_for_removal(entries, policy)
+        for key in keys:
+            os.remove(paths[key])
+            self._invalidate(key)
+        return {"rows": len(keys), "bytes": n_bytes}
+
+    def compact(self, pages=None):
+        """Remove directories left empty by removed values. Space is freed by
+        the filesystem as soon as values are removed, so sizes are not
+        reported."""
+        if not self.read_only:
+            self._remove_empty_directories()
+        return None, None
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+   Copyright 2018-2023 OpenEEmeter contributors
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytz
+
+__all__ = ("NormalsArchive", "write_normals_archive")
+
+HOURS_PER_NORMAL_YEAR = 8760
+
+# one record per station and source; the file is a plain .npy so it can be
+# memory-mapped and read without any parsing
+NORMALS_ARCHIVE_DTYPE = np.dtype(
+    [
+        ("source", "U8"),
+        ("usaf_id", "U6"),
+        ("temps", "<f4", (HOURS_PER_NORMAL_YEAR,)),
+    ]
+)
+
+# normals are published with one decimal, and cached normals carry at most 4
+# (as in eeweather.serialization); float32 keeps enough precision to recover
+# either exactly by rounding to 4 decimals
+DECIMALS = 4
+
+
+def _normal_year_index():
+    return pd.date_range("1900-01-01 00:00", "1900-12-31 23:00", freq="H", tz=pytz.UTC)
+
+
+def write_normals_archive(path, data):
+    """Write normal-year hourly temperature series to a normals archive.
+
+    The file is written next to ``path`` first and then moved into place, so
+    readers never see a partially written archive.
+
+    Parameters
+    ----------
+    path : str
+        Path of the archive.
+    data : iterable of (str, str, pandas.Series)
+        Source name (e.g. ``"TMY3"``), USAF ID and hourly 1900 temperature
+        series of each station.
+
+    Returns
+    -------
+    int
+        Number of series written.
+    """
+    index = _normal_year_index()
+    records = [
+        (source, usaf_id, ts.reindex(index).values.astype(np.float32))
+        for source, usaf_id, ts in data
+    ]
+    array = np.array(records, dtype=NORMALS_ARCHIVE_DTYPE)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npy")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return len(records)
+
+
+class NormalsArchive(object):
+    """Read-only, memory-mapped archive of normal-year hourly temperatures
+    written with :any:`write_normals_archive`.
+
+    Parameters
+    ----------
+    path : str
+        Path of the archive.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._records = np.load(path, mmap_mode="r")
+        self._positions = {
+            (source, usaf_id): i
+            for i, (source, usaf_id) in enumerate(
+                zip(self._records["source"], self._records["usaf_id"])
+            )
+        }
+        self._index = _normal_year_index()
+
+    def __repr__(self):
+        return 'NormalsArchive("{}")'.format(self.path)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def keys(self):
+        """List the ``(source, usaf_id)`` pairs in the archive."""
+        return list(self._positions)
+
+    def get_temp_data(self, source, usaf_id):
+        """Get the hourly 1900 temperature series of a station, or ``None`` if
+        it is not in the archive.
+        """
+        position = self._positions.get((source, usaf_id))
+        if position is None:
+            return None
+        temps = self._records[position]["temps"].astype(float).round(DECIMALS)
+        return pd.Series(temps, index=self._index)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+   Copyright 2018-2023 OpenEEmeter contributors
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+from datetime import datetime
+import json
+import time
+
+import pytz
+
+from .cache import (
+    _chunks,
+    _get_memory_cache,
+    _is_stale,
+    _key_prefix,
+    _select_for_removal,
+)
+
+__all__ = ("RedisKeyValueStore",)
+
+
+def _decode_fields(fields):
+    # (data, blob, updated) as stored to (value, updated)
+    data, blob, updated = fields
+    if updated is None:
+        return None, None
+    updated = datetime.fromtimestamp(float(updated), pytz.UTC)
+    if blob is not None:
+        return bytes(blob), updated
+    return json.loads(data), updated
+
+
+class RedisKeyValueStore(object):
+    """Key value store on a Redis server (or anything speaking its protocol),
+    as an alternative to :any:`eeweather.cache.KeyValueStore` which lets
+    every machine of a cluster share one cache. Selected with a ``redis://``
+    or ``rediss://`` URL.
+
+    Each value is kept in a hash at ``<namespace><key>``. Batch reads and
+    writes are pipelined into a single round trip, and values of the current
+    year are given a time to live matching the expiration rules of
+    :any:`eeweather.stations`, so the server drops them when they would have
+    been refreshed anyway. Configure ``maxmemory`` and an LRU
+    ``maxmemory-policy`` on the server to bound the size of the cache.
+
+    Parameters
+    ----------
+    url : str
+        ``redis://`` or ``rediss://`` URL, e.g. ``redis://cache:6379/0``.
+    memory_cache : :any:`eeweather.cache.MemoryCache`, optional
+        As for :any:`eeweather.cache.KeyValueStore`. It is only invalidated by
+        writes of this process.
+    namespace : str, optional
+        Prefix of the Redis keys used by this store.
+    ttl : callable, optional
+        Function of a cache key returning the time to live in seconds of a
+        value saved under it, or None to keep it. Defaults to the expiration
+        rules of :any:`eeweather.stations`.
+    client : :any:`redis.Redis`, optional
+        Client to use instead of connecting to ``url``, e.g. one from
+        ``fakeredis``.
+    """
+
+    def __init__(
+        self, url, memory_cache=None, namespace="eeweather:", ttl=None, client=None
+    ):
+        if client is None:
+            try:
+                import redis
+            except ImportError:  # pragma: no cover
+                raise ImportError("RedisKeyValueStore requires redis.")
+            client = redis.Redis.from_url(url)
+        if ttl is None:
+            from .stations import _cache_ttl as ttl
+        self.url = url
+        self.client = client
+        self.namespace = namespace
+        self.ttl = ttl
+        if memory_cache is None:
+            memory_cache = _get_memory_cache()
+        self.memory_cache = memory_cache
+
+    def __repr__(self):
+        return 'RedisKeyValueStore("{}")'.format(self.url)
+
+    def _redis_key(self, key):
+        return (self.namespace + key).encode("utf-8")
+
+    def _key(self, redis_key):
+        return redis_key.decode("utf-8")[len(self.namespace) :]
+
+    def _scan(self):
+        # redis keys of every stored value
+        pattern = "".join(
+            "\\" + char if char in "\\*?[]" else char for char in self.namespace
+        )
+        return self.client.scan_iter(match=pattern + "*", count=1000)
+
+    def _invalidate(self, key=None):
+        if self.memory_cache is not None:
+            self.memory_cache.invalidate(key)
+
+    def key_exists(self, key):
+        return self.client.exists(self._redis_key(key)) > 0
+
+    def save_json(self, key, data):
+        self.save_many({key: data})
+
+    def save_bytes(self, key, data):
+        self.save_many({key: bytes(data)})
+
+    def save_many(self, items):
+        """Save several keys in one round trip, atomically.
+
+        Parameters
+        ----------
+        items : dict
+            Values keyed by cache key. ``bytes`` values are stored as bytes,
+            anything else as JSON.
+        """
+        if len(items) == 0:
+            return
+        updated = repr(time.time())
+        pipe = self.client.pipeline(transaction=True)
+        for key, value in items.items():
+            redis_key = self._redis_key(key)
+            if isinstance(value, (bytes, bytearray, memoryview)):
+                value = bytes(value)
+                fields = {"blob": value, "size": len(value)}
+            else:
+                data = json.dumps(value, separators=(",", ":"))
+                fields = {"data": data, "size": len(data)}
+            fields["updated"] = updated
+            pipe.delete(redis_key)
+            pipe.hset(redis_key, mapping=fields)
+            ttl = self.ttl(key)
+            if ttl is not None:
+                pipe.expire(redis_key, ttl)
+        pipe.execute()
+        for key in items:
+            self._invalidate(key)
+
+    def retrieve_json(self, key):
+        data = self.client.hget(self._redis_key(key), "data")
+        return None if data is None else json.loads(data)
+
+    def retrieve_bytes(self, key):
+        blob = self.client.hget(self._redis_key(key), "blob")
+        return None if blob is None else bytes(blob)
+
+    def retrieve(self, key):
+        return self.retrieve_with_updated(key)[0]
+
+    def retrieve_with_updated(self, key):
+        return _decode_fields(
+            self.client.hmget(self._redis_key(key), "data", "blob", "updated")
+        )
+
+    def retrieve_many(self, keys):
+        return {
+            key: value
+            for key, (value, _) in self.retrieve_many_with_updated(keys).items()
+        }
+
+    def retrieve_many_with_updated(self, keys, stale=None):
+        """Retrieve several values as in :any:`retrieve_with_updated` in one
+        round trip. See
+        :any:`eeweather.cache.KeyValueStore.retrieve_many_with_updated`.
+
+        Returns
+        -------
+        dict
+            ``(value, updated)`` tuples keyed by cache key. Keys that do not
+            exist are omitted.
+        """
+        keys = list(keys)
+        stale = stale or {}
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hmget(self._redis_key(key), "data", "blob", "updated")
+        results = {}
+        for key, fields in zip(keys, pipe.execute()):
+            value, updated = _decode_fields(fields)
+            if updated is not None:
+                if _is_stale(updated, stale.get(key)):
+                    value = None
+                results[key] = (value, updated)
+        return results
+
+    def key_updated(self, key):
+        return self.retrieve_with_updated(key)[1]
+
+    def clear(self, key=None):
+        if key is None:
+            for chunk in _chunks(list(self._scan())):
+                self.client.delete(*chunk)
+        else:
+            self.client.delete(self._redis_key(key))
+        self._invalidate(key)
+
+    def flush_accesses(self):
+        """Lookups are not recorded by this store; see the ``keyspace_hits``
+        and ``keyspace_misses`` statistics of the server instead."""
+
+    def _entries(self):
+        # (key, size, updated, accessed) of every stored value
+        redis_keys = list(self._scan())
+        pipe = self.client.pipeline(transaction=False)
+        for redis_key in redis_keys:
+            pipe.hmget(redis_key, "size", "updated")
+        entries = []
+        for redis_key, (size, updated) in zip(redis_keys, pipe.execute()):
+            if updated is None:  # expired or removed since the scan
+                continue
+            updated = datetime.fromtimestamp(float(updated), pytz.UTC)
+            entries.append((self._key(redis_key), int(size), updated, None))
+        return entries
+
+    def stats(self):
+        """Summarize stored values by key prefix as in
+        :any:`eeweather.cache.KeyValueStore.stats`. Lookups are not recorded,
+        so hit ratios are None."""
+        stats = {}
+        for key, size, _, _ in self._entries():
+            prefix = _key_prefix(key)
+            entry = stats.setdefault(
+                prefix,
+                {
+                    "prefix": prefix,
+                    "rows": 0,
+                    "bytes": 0,
+                    "hits": 0,
+                    "misses": 0,
+                    "hit_ratio": None,
+                },
+            )
+            entry["rows"] += 1
+            entry["bytes"] += size
+        return [stats[prefix] for prefix in sorted(stats)]
+
+    def gc(self, policy):
+        """Remove values beyond the limits of a
+        :any:`eeweather.cache.RetentionPolicy`, using the time they were saved
+        as last use."""
+        keys, n_bytes = _select_for_removal(self._entries(), policy)
+        for chunk in _chunks(keys):
+            self.client.delete(*[self._redis_key(key) for key in chunk])
+        for key in keys:
+            self._invalidate(key)
+        return {"rows": len(keys), "bytes": n_bytes}
+
+    def compact(self, pages=None):
+        """Memory of removed values is freed by the server, so this does
+        nothing and sizes are not reported."""
+        return None, None
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+   Copyright 2018-2023 OpenEEmeter contributors
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+import numpy as np
+import pandas as pd
+
+__all__ = ("resample_interpolated_mean", "resample_interpolated_means")
+
+NS_PER_MINUTE = 60 * 10**9
+
+
+def _minute_means(ts):
+    # equivalent of ts.resample("Min").mean() restricted to occupied minutes
+    minutes = ts.index.asi8 // NS_PER_MINUTE
+    values = ts.values.astype(float)
+    if len(minutes) > 1 and not np.all(np.diff(minutes) > 0):
+        order = np.argsort(minutes, kind="stable")
+        minutes, values = minutes[order], values[order]
+        minutes, group_starts = np.unique(minutes, return_index=True)
+        valid = ~np.isnan(values)
+        sums = np.add.reduceat(np.where(valid, values, 0.0), group_starts)
+        counts = np.add.reduceat(valid.astype(np.int64), group_starts)
+        values = np.full(len(sums), np.nan)
+        np.divide(sums, counts, out=values, where=counts > 0)
+    return minutes, values
+
+
+def _interpolant_pieces(minutes, values, limit):
+    """Describe the gap-limited linear interpolant on the minute grid as a set
+    of non-overlapping pieces.
+
+    Each piece covers the minutes ``[start, end)`` and takes the value
+    ``anchor_value + slope * (minute - anchor)`` on them. Minutes not covered
+    by any piece are left unfilled, exactly as in
+    ``interpolate(method="linear", limit=limit, limit_direction="both")``.
+    """
+    valid = ~np.isnan(values)
+    points, point_values = minutes[valid], values[valid]
+    if len(points) == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty, np.array([]), np.array([])
+
+    grid_start, grid_end = minutes[0], minutes[-1]
+
+    # between consecutive observations: interpolate linearly up to `limit`
+    # minutes from either side, which fills the whole gap if it is short.
+    left, right = points[:-1], points[1:]
+    left_values, right_values = point_values[:-1], point_values[1:]
+    gaps = right - left
+    slopes = (right_values - left_values) / gaps
+    split = gaps > 2 * limit + 1
+    gap_starts = np.concatenate((left, right[split] - limit))
+    gap_ends = np.concatenate((np.where(split, left + limit + 1, right), right[split]))
+    gap_anchors = np.concatenate((left, left[split]))
+    gap_anchor_values = np.concatenate((left_values, left_values[split]))
+    gap_slopes = np.concatenate((slopes, slopes[split]))
+
+    # before the first and after the last observation: hold the value
+    lead_start = max(grid_start, points[0] - limit)
+    trail_end = min(grid_end, points[-1] + limit) + 1
+
+    starts = np.concatenate(([lead_start], gap_starts, [points[-1]]))
+    ends = np.concatenate(([points[0]], gap_ends, [trail_end]))
+    anchors = np.concatenate(([points[0]], gap_anchors, [points[-1]]))
+    anchor_values = np.concatenate(
+        ([point_values[0]], gap_anchor_values, [point_values[-1]])
+    )
+    slopes = np.concatenate(([0.0], gap_slopes, [0.0]))
+
+    nonempty = ends > starts
+    return (
+        starts[nonempty],
+        ends[nonempty],
+        anchors[nonempty],
+        anchor_values[nonempty],
+        slopes[nonempty],
+    )
+
+
+def _bin_labels(first, last, freq, tz):
+    # let pandas decide bin labels so they match ts.resample(freq) exactly
+    index = pd.to_datetime([first, last], unit="m", utc=True)
+    if tz is None:
+        index = index.tz_localize(None)
+    else:
+        index = index.tz_convert(tz)
+    return pd.Series(0.0, index=index).resample(freq).mean().index
+
+
+def _bin_means(pieces, labels):
+    starts, ends, anchors, anchor_values, slopes = pieces
+    edges = np.append(labels.asi8, (labels[-1] + labels.freq).value) // NS_PER_MINUTE
+
+    # split pieces at bin edges so every sub-piece falls in exactly one bin
+    first_bins = np.searchsorted(edges, starts, side="right") - 1
+    last_bins = np.searchsorted(edges, ends - 1, side="right") - 1
+    n_bins = last_bins - first_bins + 1
+    piece = np.repeat(np.arange(len(starts)), n_bins)
+    offsets = np.arange(len(piece)) - np.repeat(np.cumsum(n_bins) - n_bins, n_bins)
+    bins = first_bins[piece] + offsets
+    sub_starts = np.maximum(starts[piece], edges[bins])
+    sub_ends = np.minimum(ends[piece], edges[bins + 1])
+
+    # closed form sum of the linear interpolant over the minutes of each
+    # sub-piece
+    n = (sub_ends - sub_starts).astype(float)
+    sums = n * anchor_values[piece] + slopes[piece] * (
+        n * (sub_starts - anchors[piece]) + n * (n - 1) / 2.0
+    )
+
+    totals = np.bincount(bins, weights=sums, minlength=len(labels))
+    counts = np.bincount(bins, weights=n, minlength=len(labels))
+    means = np.full(len(labels), np.nan)
+    np.divide(totals, counts, out=means, where=counts > 0)
+    return means
+
+
+def resample_interpolated_mean(ts, freq, limit=60):
+    """Resample irregular temperature observations to a regular frequency
+    following CalTRACK 2.3.3.
+
+    The result is equivalent to upsampling to a minute grid, linearly
+    interpolating gaps up to ``limit`` minutes in either direction and taking
+    the mean of each bin::
+
+        ts.resample("Min").mean()
+          .interpolate(method="linear", limit=limit, limit_direction="both")
+          .resample(freq).mean()
+
+    but is computed by summing the piecewise-linear interpolant over each bin
+    in closed form, without building the minute grid.
+
+    Parameters
+    ----------
+    ts : pandas.Series
+        Observations indexed by a ``DatetimeIndex``.
+    freq : str
+        Pandas frequency of the result, e.g. ``"H"`` or ``"D"``.
+    limit : int, optional
+        Maximum number of consecutive minutes to fill on either side of a gap.
+
+    Returns
+    -------
+    pandas.Series
+        Mean interpolated temperature per bin, ``NaN`` for bins without any
+        filled minutes.
+    """
+    return resample_interpolated_means(ts, [freq], limit=limit)[freq]
+
+
+def resample_interpolated_means(ts, freqs, limit=60):
+    """Resample irregular temperature observations to several frequencies at
+    once.
+
+    The interpolant is built once and then averaged over the bins of each
+    frequency, so e.g. hourly, daily and monthly means cost little more than
+    one of them. See :any:`resample_interpolated_mean`.
+
+    Parameters
+    ----------
+    ts : pandas.Series
+        Observations indexed by a ``DatetimeIndex``.
+    freqs : list of str
+        Pandas frequencies of the results, e.g. ``["H", "D", "MS"]``.
+    limit : int, optional
+        Maximum number of consecutive minutes to fill on either side of a gap.
+
+    Returns
+    -------
+    dict
+        Resampled series keyed by frequency.
+    """
+    if len(ts) == 0:
+        return {freq: ts.astype(float).resample(freq).mean() for freq in freqs}
+
+    minutes, values = _minute_means(ts)
+    pieces = _interpolant_pieces(minutes, values, limit)
+    results = {}
+    for freq in freqs:
+        labels = _bin_labels(minutes[0], minutes[-1], freq, ts.index.tz)
+        results[freq] = pd.Series(
+            _bin_means(pieces, labels), index=labels, name=ts.name
+        )
+    return results
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+   Copyright 2018-2023 OpenEEmeter contributors
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+import logging
+import random
+import threading
+import time
+
+from .exceptions import CircuitOpenError, FetchNotFoundError, FetchTransientError
+
+logger = logging.getLogger(__name__)
+
+__all__ = ("RetryPolicy", "get_retry_policy", "set_retry_policy")
+
+
+class _HostState(object):
+    # circuit breaker and retry budget of one host
+    def __init__(self, retry_reserve):
+        self.failures = 0  # consecutive failed attempts
+        self.opened = None  # time the circuit was opened, None while closed
+        self.trial = False  # whether the attempt letting the host recover runs
+        self.retry_tokens = float(retry_reserve)
+
+
+class RetryPolicy(object):
+    """Retries, timeouts and circuit breaking shared by all fetches of a
+    transport in :any:`eeweather.connections`, kept per host.
+
+    A fetch failing with :any:`eeweather.FetchTransientError` is attempted
+    again after a jittered, exponentially growing delay, up to ``attempts``
+    times, as long as the host has retry budget left: every fetch adds
+    ``retry_ratio`` of a retry to the budget, up to ``retry_reserve``
+    retries, and every retry uses one, so retries add at most that fraction
+    of load to a failing host. A fetch failing with
+    :any:`eeweather.FetchNotFoundError` is not retried.
+
+    After ``failure_threshold`` failed attempts in a row, the circuit of the
+    host opens: fetches from it fail immediately with
+    :any:`eeweather.CircuitOpenError` for ``reset_timeout`` seconds. Then a
+    single attempt is let through, which closes the circuit again if it
+    succeeds and reopens it if it fails.
+
+    Parameters
+    ----------
+    attempts : int, optional
+        Maximum number of attempts of each fetch.
+    base_delay : float, optional
+        Seconds before the first retry, doubled for each further retry.
+        Each delay is randomly shortened by up to half.
+    max_delay : float, optional
+        Maximum seconds before a retry.
+    timeout : float, optional
+        Seconds to wait for a host to connect or send data.
+    timeouts : dict, optional
+        Timeouts keyed by host, overriding ``timeout``.
+    retry_ratio : float, optional
+        Retries added to the budget of a host by each fetch.
+    retry_reserve : float, optional
+        Maximum retry budget of a host.
+    failure_threshold : int, optional
+        Failed attempts in a row which open the circuit of a host.
+    reset_timeout : float, optional
+        Seconds the circuit of a host stays open.
+    sleep : callable, optional
+        Function waiting for a number of seconds.
+    clock : callable, optional
+        Function returning the current time in seconds.
+    """
+
+    def __init__(
+        self,
+        attempts=4,
+        base_delay=1,
+        max_delay=30,
+        timeout=60,
+        timeouts=None,
+        retry_ratio=0.2,
+        retry_reserve=10,
+        failure_threshold=5,
+        reset_timeout=60,
+        sleep=time.sleep,
+        clock=time.monotonic,
+    ):
+        if attempts < 1:
+            raise ValueError("attempts must be at least 1, got {}".format(attempts))
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.default_timeout = timeout
+        self.timeouts = dict(timeouts or {})
+        self.retry_ratio = retry_ratio
+        self.retry_reserve = retry_reserve
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._sleep = sleep
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def timeout(self, host):
+        """Seconds to wait for ``host`` to connect or send data."""
+        return self.timeouts.get(host, self.default_timeout)
+
+    def backoff(self, retry):
+        """Seconds to wait before retry number ``retry`` (starting at 0)."""
+        delay = min(self.max_delay, self.base_delay * 2**retry)
+        return delay * (1 - random.random() / 2)
+
+    def _state(self, host):
+        # with self._lock held
+        if host not in self._hosts:
+            self._hosts[host] = _HostState(self.retry_reserve)
+        return self._hosts[host]
+
+    def _start_attempt(self, host, url):
+        with self._lock:
+            state = self._state(host)
+            if state.opened is not None:
+                retry_after = state.opened + self.reset_timeout - self._clock()
+                if retry_after > 0 or state.trial:
+                    raise CircuitOpenError(url, host, max(retry_after, 0))
+                state.trial = True
+
+    def _succeeded(self, host):
+        with self._lock:
+            state = self._state(host)
+            if state.opened is not None:
+                logger.info("{} has recovered.".format(host))
+            state.failures = 0
+            state.opened = None
+            state.trial = False
+
+    def _failed(self, host):
+        # returns whether the circuit of host is open
+        with self._lock:
+            state = self._state(host)
+            state.failures += 1
+            if state.trial or state.failures >= self.failure_threshold:
+                if not state.trial:
+                    logger.warning(
+                        "{} failed {} times in a row, not trying again for {}"
+                        " seconds.".format(host, state.failures, self.reset_timeout)
+                    )
+                state.opened = self._clock()
+                state.trial = False
+            return state.opened is not None
+
+    def _withdraw_retry(self, host):
+        with self._lock:
+            state = self._state(host)
+            if state.retry_tokens < 1:
+                return False
+            state.retry_tokens -= 1
+            return True
+
+    def call(self, host, url, fetch):
+        """Call ``fetch()`` to fetch ``url`` from ``host`` following this
+        policy.
+
+        Parameters
+        ----------
+        host : str
+            Host whose timeout, retry budget and circuit apply.
+        url : str
+            URL being fetched, for errors.
+        fetch : callable
+            Function attempting the fetch once. It must raise
+            :any:`eeweather.FetchNotFoundError` if what it fetches does not
+            exist and :any:`eeweather.FetchTransientError` if the attempt
+            may be retried.
+
+        Returns
+        -------
+        The return value of ``fetch``.
+        """
+        with self._lock:
+            state = self._state(host)
+            state.retry_tokens = min(
+                self.retry_reserve, state.retry_tokens + self.retry_ratio
+            )
+        for attempt in range(self.attempts):
+            self._start_attempt(host, url)
+            try:
+                result = fetch()
+            except FetchNotFoundError:
+                # the host answered
+                self._succeeded(host)
+                raise
+            except FetchTransientError as e:
+                if self._failed(host):
+                    raise
+                if attempt + 1 == self.attempts or not self._withdraw_retry(host):
+                    raise
+                delay = self.backoff(attempt)
+                logger.warning(
+                    "Failed attempt ({} of {}), retrying in {:.1f} seconds: {}".format(
+                        attempt + 1, self.attempts, delay, e.message
+                    )
+                )
+                self._sleep(delay)
+                continue
+            except BaseException:
+                # e.g. a bug or KeyboardInterrupt, which don't say anything
+                # about the host; let the next attempt through
+                with self._lock:
+                    self._state(host).trial = False
+                raise
+            self._succeeded(host)
+            return result
+
+    def reset(self, host=None):
+        """Forget the failures and retry budget of ``host``, or of all
+        hosts."""
+        with self._lock:
+            if host is None:
+                self._hosts.clear()
+            else:
+                self._hosts.pop(host, None)
+
+
+_retry_policy = RetryPolicy()
+
+
+def get_retry_policy():
+    """Get the :any:`RetryPolicy` of the transports in
+    :any:`eeweather.connections` which were not given their own."""
+    return _retry_policy
+
+
+def set_retry_policy(policy):
+    """Set the :any:`RetryPolicy` of the transports in
+    :any:`eeweather.connections` which were not given their own, e.g. to
+    change timeouts::
+
+        eeweather.retry.set_retry_policy(
+            RetryPolicy(timeouts={"ftp.ncei.noaa.gov": 120})
+        )
+    """
+    global _retry_policy
+    _retry_policy = policy
@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+   Copyright 2018-2023 OpenEEmeter contributors
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+import struct
+import zlib
+
+import numpy as np
+import pandas as pd
+import pytz
+
+__all__ = (
+    "encode_series",
+    "decode_series",
+    "decode_series_values",
+    "encode_observations",
+    "decode_observations",
+    "is_encoded",
+    "uncompress",
+)
+
+MAGIC = b"EEWS"
+FORMAT_VERSION = 1
+
+# magic, format version, frequency, value dtype, compression, int16 scale,
+# first timestamp (epoch seconds), number of values
+_HEADER = struct.Struct("<4sBcBBHqI")
+
+IRREGULAR = b"-"
+_FREQ_SECONDS = {b"H": 3600, b"D": 86400}
+
+_DTYPES = {"float32": (0, np.dtype("<f4")), "int16": (1, np.dtype("<i2"))}
+_DTYPE_CODES = {code: dtype for code, dtype in _DTYPES.values()}
+_MISSING_INT16 = np.iinfo(np.int16).min
+
+_COMPRESSION_CODES = {None: 0, "zlib": 1}
+
+# cached values have never carried more than 4 decimals, and float32 keeps
+# enough precision to restore them by rounding
+DECIMALS = 4
+
+
+def is_encoded(data):
+    """Check whether a cached value was written with this binary encoding."""
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(
+        data[: len(MAGIC)]
+    ) == bytes(MAGIC)
+
+
+def _pack_values(values, dtype, scale):
+    if dtype not in _DTYPES:
+        raise ValueError('Unrecognized dtype "{}"'.format(dtype))
+    code, np_dtype = _DTYPES[dtype]
+    if dtype == "float32":
+        return code, values.astype(np_dtype)
+    scaled = np.round(values * scale)
+    finite = scaled[~np.isnan(scaled)]
+    if len(finite) > 0 and (finite.min() <= _MISSING_INT16 or finite.max() > 32767):
+        raise ValueError("Values out of range for int16 with scale {}".format(scale))
+    return code, np.where(np.isnan(scaled), _MISSING_INT16, scaled).astype(np_dtype)
+
+
+def _unpack_values(buf, dtype_code, scale, count, offset=0):
+    values = np.frombuffer(
+        buf, dtype=_DTYPE_CODES[dtype_code], count=count, offset=offset
+    )
+    if dtype_code == _DTYPES["float32"][0]:
+        return values.astype(float).round(DECIMALS)
+    return np.where(values == _MISSING_INT16, np.nan, values / float(scale))
+
+
+def _encode(freq, start, count, dtype_code, scale, payload, compression):
+    if compression not in _COMPRESSION_CODES:
+        raise ValueError('Unrecognized compression "{}"'.format(compression))
+    if compression == "zlib":
+        payload = zlib.compress(payload)
+    header = _HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        freq,
+        dtype_code,
+        _COMPRESSION_CODES[compression],
+        scale,
+        start,
+        count,
+    )
+    return header + payload
+
+
+def _decode_header(data):
+    (
+        magic,
+        version,
+        freq,
+        dtype_code,
+        compression,
+        scale,
+        start,
+        count,
+    ) = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not an encoded series")
+    if version > FORMAT_VERSION:
+        raise ValueError("Unsupported encoding version {}".format(version))
+    payload = memoryview(data)[_HEADER.size :]
+    if compression == _COMPRESSION_CODES["zlib"]:
+        payload = zlib.decompress(payload)
+    return freq, dtype_code, scale, start, count, payload
+
+
+def uncompress(data):
+    """Rewrite an encoded series or observations without compression, so its
+    values can be read straight from a memory-mapped buffer."""
+    (
+        magic,
+        version,
+        freq,
+        dtype_code,
+        compression,
+        scale,
+        start,
+        count,
+    ) = _HEADER.unpack_from(data)
+    if compression == _COMPRESSION_CODES[None]:
+        return data
+    payload = _decode_header(data)[-1]
+    header = _HEADER.pack(
+        magic,
+        version,
+        freq,
+        dtype_code,
+        _COMPRESSION_CODES[None],
+        scale,
+        start,
+        count,
+    )
+    return header + bytes(payload)
+
+
+def encode_series(ts, freq, dtype="float32", scale=100, compression="zlib"):
+    """Encode a regular time series as compact bytes.
+
+    The header records the first timestamp, frequency and length, so only the
+    values are stored, as float32 or as int16 multiples of ``1 / scale``.
+
+    Parameters
+    ----------
+    ts : pandas.Series
+        Series with a UTC ``DatetimeIndex``. Gaps in the index are filled
+        with ``NaN``.
+    freq : str
+        ``"H"`` or ``"D"``.
+    dtype : str, optional
+        ``"float32"`` or ``"int16"``.
+    scale : int, optional
+        Number of int16 steps per unit for ``dtype="int16"``.
+    compression : str, optional
+        ``"zlib"`` or ``None``.
+
+    Returns
+    -------
+    bytes
+    """
+    freq_code = freq.encode("ascii")
+    if freq_code not in _FREQ_SECONDS:
+        raise ValueError('Unrecognized frequency "{}"'.format(freq))
+    step = _FREQ_SECONDS[freq_code] * 10**9
+
+    if len(ts) == 0:
+        start, values = 0, np.array([], dtype=float)
+    else:
+        ns = ts.index.asi8
+        if len(ns) > 1 and not (np.diff(ns) == step).all():
+            ts = ts.resample(freq).mean()
+            ns = ts.index.asi8
+        start, values = ns[0] // 10**9, ts.values.astype(float)
+
+    dtype_code, packed = _pack_values(values, dtype, scale)
+    return _encode(
+        freq_code, start, len(packed), dtype_code, scale, packed.tobytes(), compression
+    )
+
+
+def decode_series(data):
+    """Decode a series written with :any:`encode_series`."""
+    freq, dtype_code, scale, start, count, payload = _decode_header(data)
+    values = _unpack_values(payload, dtype_code, scale, count)
+    index = pd.date_range(
+        pd.Timestamp(start, unit="s", tz=pytz.UTC),
+        periods=count,
+        freq=freq.decode("ascii"),
+    )
+    return pd.Series(values, index=index)
+
+
+def decode_series_values(data, start=None, end=None):
+    """Decode a series written with :any:`encode_series` as arrays of epoch
+    seconds and values, without building a pandas index.
+
+    Given ``start`` and/or ``end`` epoch seconds, only the values between them
+    (inclusive) are read and converted, so an uncompressed series in a
+    memory-mapped buffer is only touched where that range is stored.
+
+    Raises ``ValueError`` for anything else, e.g. encoded observations.
+    """
+    freq, dtype_code, scale, first, count, payload = _decode_header(data)
+    if freq not in _FREQ_SECONDS:
+        raise ValueError("Not an encoded series")
+    step = _FREQ_SECONDS[freq]
+    lower, upper = 0, count
+    if start is not None:
+        lower = min(count, max(0, -((first - start) // step)))
+    if end is not None:
+        upper = max(lower, min(count, (end - first) // step + 1))
+    offset = lower * _DTYPE_CODES[dtype_code].itemsize
+    values = _unpack_values(payload, dtype_code, scale, upper - lower, offset=offset)
+    seconds = first + np.arange(lower, upper, dtype=np.int64) * step
+    return seconds, values
+
+
+def encode_observations(times, temps, compression="zlib"):
+    """Encode irregular observations as int64 epoch seconds and int16 tenths
+    of a degree.
+
+    Parameters
+    ----------
+    times : numpy.ndarray
+        ``datetime64`` observation times.
+    temps : numpy.ndarray
+        Temperatures, ``NaN`` where missing.
+
+    Returns
+    -------
+    bytes
+    """
+    seconds = times.astype("datetime64[s]").astype("<i8")
+    start = int(seconds[0]) if len(seconds) > 0 else 0
+    dtype_code, packed = _pack_values(temps.astype(float), "int16", 10)
+    payload = seconds.tobytes() + packed.tobytes()
+    return _encode(IRREGULAR, start, len(seconds), dtype_code, 10, payload, compression)
+
+
+def decode_observations(data):
+    """Decode observation times as ``datetime64[s]`` and temperatures written
+    with :any:`encode_observations`."""
+    freq, dtype_code, scale, start, count, payload = _decode_header(data)
+    if freq != IRREGULAR:
+        raise ValueError("Not encoded observations")
+    seconds = np.frombuffer(payload, dtype="<i8", count=count)
+    temps = _unpack_values(payload, dtype_code, scale, count, offset=8 * count)
+    return seconds.astype("datetime64[s]"), temps
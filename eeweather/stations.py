@@ -17,37 +17,64 @@
    limitations under the License.
 
 """
+import contextlib
 from datetime import datetime, timedelta, timezone
-import gzip
+import functools
 import json
+import logging
+import os
 import pkg_resources
+import numpy as np
 import pandas as pd
 import pytz
+import tarfile
+import tempfile
+from urllib.parse import urlparse
+import zlib
 
 # this import allows monkeypatching noaa_ftp_connection_proxy in tests because
 # the fully qualified package path name is preserved
 import requests
+import urllib3
 
 from .exceptions import (
     UnrecognizedUSAFIDError,
     ISDDataNotAvailableError,
     GSODDataNotAvailableError,
+    GSODArchiveNotAvailableError,
     TMY3DataNotAvailableError,
     CZ2010DataNotAvailableError,
     NonUTCTimezoneInfoError,
+    FetchError,
+    FetchNotFoundError,
+    FetchTransientError,
+)
+from .cube import WeatherCube
+from .normals import HOURS_PER_NORMAL_YEAR, write_normals_archive
+from .resample import resample_interpolated_means
+from .retry import get_retry_policy
+from .serialization import (
+    decode_observations,
+    decode_series,
+    encode_observations,
+    encode_series,
+    is_encoded,
 )
 from .validation import valid_usaf_id_or_raise
 from .warnings import EEWeatherWarning
 import eeweather.connections
-from eeweather.connections import metadata_db_connection_proxy
+from eeweather.connections import _check_response, metadata_db_connection_proxy
 import eeweather.mockable
 
+logger = logging.getLogger(__name__)
+
 DATA_EXPIRATION_DAYS = 1
 
 __all__ = (
     "ISDStation",
     "get_isd_filenames",
     "get_gsod_filenames",
+    "get_gsod_archive_filename",
     "get_isd_station_metadata",
     "get_isd_file_metadata",
     "get_isd_raw_temp_data",  # Not currently written
@@ -55,14 +82,17 @@ __all__ = (
     "get_isd_daily_temp_data",  # Not currently written
     "get_gsod_raw_temp_data",  # Not currently written
     "get_gsod_daily_temp_data",  # Not currently written
+    "get_isd_raw_temp_data_cache_key",
     "get_isd_hourly_temp_data_cache_key",
     "get_isd_daily_temp_data_cache_key",
     "get_gsod_daily_temp_data_cache_key",
     "get_tmy3_hourly_temp_data_cache_key",
     "get_cz2010_hourly_temp_data_cache_key",
+    "cached_isd_raw_temp_data_is_expired",
     "cached_isd_hourly_temp_data_is_expired",
     "cached_isd_daily_temp_data_is_expired",
     "cached_gsod_daily_temp_data_is_expired",
+    "validate_isd_raw_temp_data_cache",
     "validate_isd_hourly_temp_data_cache",
     "validate_isd_daily_temp_data_cache",
     "validate_gsod_daily_temp_data_cache",
@@ -78,21 +108,26 @@ __all__ = (
     "deserialize_gsod_daily_temp_data",
     "deserialize_tmy3_daily_temp_data",
     "deserialize_cz2010_daily_temp_data",
+    "read_isd_raw_temp_data_from_cache",
     "read_isd_hourly_temp_data_from_cache",
     "read_isd_daily_temp_data_from_cache",
     "read_gsod_daily_temp_data_from_cache",
     "read_tmy3_hourly_temp_data_from_cache",
     "read_cz2010_hourly_temp_data_from_cache",
+    "read_tmy3_hourly_temp_data_from_normals_archive",
+    "read_cz2010_hourly_temp_data_from_normals_archive",
     "write_isd_hourly_temp_data_to_cache",
     "write_isd_daily_temp_data_to_cache",
     "write_gsod_daily_temp_data_to_cache",
     "write_tmy3_hourly_temp_data_to_cache",
     "write_cz2010_hourly_temp_data_to_cache",
+    "destroy_cached_isd_raw_temp_data",
     "destroy_cached_isd_hourly_temp_data",
     "destroy_cached_isd_daily_temp_data",
     "destroy_cached_gsod_daily_temp_data",
     "destroy_cached_tmy3_hourly_temp_data",
     "destroy_cached_cz2010_hourly_temp_data",
+    "load_isd_raw_temp_data_cached_proxy",
     "load_isd_hourly_temp_data_cached_proxy",
     "load_isd_daily_temp_data_cached_proxy",
     "load_gsod_daily_temp_data_cached_proxy",
@@ -108,6 +143,9 @@ __all__ = (
     "load_cached_gsod_daily_temp_data",
     "load_cached_tmy3_hourly_temp_data",
     "load_cached_cz2010_hourly_temp_data",
+    "ingest_gsod_archive",
+    "build_normals_archive",
+    "build_weather_cube",
 )
 
 
@@ -194,6 +232,13 @@ def get_gsod_filenames(usaf_id, year=None, with_host=False):
     )
 
 
+def get_gsod_archive_filename(year, with_host=False):
+    filename = "/pub/data/gsod/{year}/gsod_{year}.tar".format(year=year)
+    if with_host:
+        filename = "ftp://ftp.ncei.noaa.gov{}".format(filename)
+    return filename
+
+
 def get_isd_station_metadata(usaf_id):
     conn = metadata_db_connection_proxy.get_connection()
     cur = conn.cursor()
@@ -274,95 +319,284 @@ def get_cz2010_station_metadata(usaf_id):
     return {col[0]: row[i] for i, col in enumerate(cur.description)}
 
 
-def fetch_isd_raw_temp_data(usaf_id, year):
+def _fixed_width_ints(buf, starts, offset, width):
+    # gather a fixed-width column of ascii digits from every line and
+    # convert it to integers with a single dot product. leading spaces, as in
+    # right-aligned counts, count as zeros.
+    digits = buf[starts[:, None] + np.arange(offset, offset + width)]
+    digits = np.where(digits == ord(" "), ord("0"), digits)
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    return (digits.astype(np.int64) - ord("0")) @ powers
+
+
+def _line_starts(buf):
+    ends = np.flatnonzero(buf == ord("\n"))
+    if len(buf) > 0 and buf[-1] != ord("\n"):
+        ends = np.append(ends, len(buf))
+    starts = np.concatenate(([0], ends + 1))[: len(ends)].astype(np.int64)
+    # skip blank lines
+    return starts[ends > starts]
+
+
+def _decode_isd_records(data):
+    """Decode the timestamp and air temperature of every record in a block
+    of uncompressed ISD data.
+
+    Returns observation times as ``datetime64[m]`` and temperatures in degrees
+    C, with the ``+9999`` sentinel decoded as ``NaN``.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    starts = _line_starts(buf)
+
+    # YYYYMMDDHHMM at [15:27]
+    year = _fixed_width_ints(buf, starts, 15, 4)
+    month = _fixed_width_ints(buf, starts, 19, 2)
+    day = _fixed_width_ints(buf, starts, 21, 2)
+    hour = _fixed_width_ints(buf, starts, 23, 2)
+    minute = _fixed_width_ints(buf, starts, 25, 2)
+    dates = ((year - 1970) * 12 + month - 1).astype("datetime64[M]").astype(
+        "datetime64[D]"
+    ) + (day - 1).astype("timedelta64[D]")
+    times = dates.astype("datetime64[m]") + (hour * 60 + minute).astype(
+        "timedelta64[m]"
+    )
+
+    # signed temperature in tenths of a degree at [87:92]
+    sign = np.where(buf[starts + 87] == ord("-"), -1, 1)
+    tenths = sign * _fixed_width_ints(buf, starts, 88, 4)
+    temps = np.where(tenths == 9999, np.nan, tenths / 10.0)
+    return times, temps
+
+
+def _utc_index(times):
+    return pd.DatetimeIndex(times.astype("datetime64[ns]")).tz_localize(pytz.UTC)
+
+
+def _mean_by_time(times, temps):
+    # sort by time and average any duplicate timestamps, ignoring NaN
+    order = np.lexsort((temps, times))
+    times, temps = times[order], temps[order]
+    unique_times, group_starts = np.unique(times, return_index=True)
+    if len(unique_times) < len(times):
+        valid = ~np.isnan(temps)
+        sums = np.add.reduceat(np.where(valid, temps, 0.0), group_starts)
+        counts = np.add.reduceat(valid.astype(np.int64), group_starts)
+        temps = np.full(len(sums), np.nan)
+        np.divide(sums, counts, out=temps, where=counts > 0)
+    return pd.Series(temps, index=_utc_index(unique_times))
+
+
+def _sum_by_time(times, counts):
+    # sort by time and add up the counts of any duplicate timestamps
+    order = np.argsort(times, kind="stable")
+    times, counts = times[order], counts[order]
+    unique_times, group_starts = np.unique(times, return_index=True)
+    if len(unique_times) < len(times):
+        counts = np.add.reduceat(counts, group_starts)
+    return pd.Series(counts, index=_utc_index(unique_times))
+
+
+class _GzipRecordStream(object):
+    """Incrementally decompress a gzipped NOAA data file and decode its records.
+
+    Compressed chunks are passed to ``write`` as they come off the connection.
+    Complete lines are decoded in blocks of roughly ``block_size`` bytes with
+    ``decode_records``, so only the typed arrays it returns are kept for the
+    whole file and neither the full compressed nor decompressed file is ever
+    held in memory.
+
+    Parameters
+    ----------
+    decode_records : callable
+        Function of a bytes-like block of complete lines which returns a
+        tuple of arrays.
+    skip_lines : int, optional
+        Number of header lines to drop from the start of the file.
+    block_size : int, optional
+        Approximate number of uncompressed bytes to decode at a time.
+    """
+
+    def __init__(self, decode_records, skip_lines=0, block_size=2**18):
+        self.decode_records = decode_records
+        self.skip_lines = skip_lines
+        self.block_size = block_size
+        self.reset()
+
+    def reset(self):
+        """Discard everything written so far, e.g. before retrying a download."""
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._pending = bytearray()
+        self._lines_to_skip = self.skip_lines
+        self._blocks = []
+
+    def write(self, chunk):
+        while chunk:
+            self._pending += self._decompressor.decompress(chunk)
+            chunk = b""
+            # concatenated gzip members (e.g. appended yearly updates)
+            if self._decompressor.eof and self._decompressor.unused_data:
+                chunk = self._decompressor.unused_data
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if len(self._pending) >= self.block_size:
+            self._decode(self._pending.rfind(b"\n") + 1)
+
+    def _decode(self, end):
+        block = self._pending[:end]
+        del self._pending[:end]
+        while self._lines_to_skip > 0 and block:
+            block = block.partition(b"\n")[2]
+            self._lines_to_skip -= 1
+        if block:
+            self._blocks.append(self.decode_records(block))
+
+    def finish(self):
+        """Decode any remaining data and return the concatenated arrays."""
+        self._pending += self._decompressor.flush()
+        self._decode(len(self._pending))
+        if len(self._blocks) == 0:
+            return self.decode_records(b"")
+        return tuple(np.concatenate(arrays) for arrays in zip(*self._blocks))
+
+
+def _fetch_isd_raw_observations(usaf_id, year):
     # possible locations of this data, errors if station is not recognized
     filenames = get_isd_filenames(usaf_id, year)
 
-    data = []
+    times, temps = [], []
     for filename in filenames:
+        stream = _GzipRecordStream(_decode_isd_records)
         # using fully-qualified name facilitates monkeypatching
-        gzipped = eeweather.connections.noaa_ftp_connection_proxy.read_file_as_bytes(
-            filename
-        )
+        if eeweather.connections.noaa_ftp_connection_proxy.read_file_into(
+            filename, stream
+        ):
+            file_times, file_temps = stream.finish()
+            times.append(file_times)
+            temps.append(file_temps)
+
+    if sum(len(t) for t in times) == 0:
+        raise ISDDataNotAvailableError(usaf_id, year)
 
-        if gzipped is not None:
-            f = gzip.GzipFile(fileobj=gzipped)
-            for line in f.readlines():
-                if line[87:92].decode("utf-8") == "+9999":
-                    tempC = float("nan")
-                else:
-                    tempC = float(line[87:92]) / 10.0
-                date_str = line[15:27].decode("utf-8")
-                dt = pytz.UTC.localize(datetime.strptime(date_str, "%Y%m%d%H%M"))
-                data.append([dt, tempC])
-            gzipped.close()
+    # observations as parsed, before averaging duplicate timestamps
+    return np.concatenate(times), np.concatenate(temps)
 
-    if data == []:
-        raise ISDDataNotAvailableError(usaf_id, year)
 
-    dates, temps = zip(*sorted(data))
-    ts = pd.Series(temps, index=dates)
-    ts = ts.groupby(ts.index).mean()
-    return ts
+def fetch_isd_raw_temp_data(usaf_id, year):
+    return _mean_by_time(*_fetch_isd_raw_observations(usaf_id, year))
 
 
-def fetch_isd_hourly_temp_data(usaf_id, year):
+def fetch_isd_resampled_temp_data(usaf_id, year, freqs=("H", "D"), use_raw_cache=False):
     # TODO(philngo): allow swappable resample method
     # TODO(philngo): record data sufficiency warnings
-    ts = fetch_isd_raw_temp_data(usaf_id, year)
+    if use_raw_cache:
+        ts = load_isd_raw_temp_data_cached_proxy(usaf_id, year)
+    else:
+        ts = fetch_isd_raw_temp_data(usaf_id, year)
 
-    # CalTRACK 2.3.3
-    return (
-        ts.resample("Min")
-        .mean()
-        .interpolate(method="linear", limit=60, limit_direction="both")
-        .resample("H")
-        .mean()
-    )
+    # CalTRACK 2.3.3 - one download and one interpolation for all frequencies
+    return resample_interpolated_means(ts, freqs, limit=60)
 
 
-def fetch_isd_daily_temp_data(usaf_id, year):
-    # TODO(philngo): allow swappable resample method
-    # TODO(philngo): record data sufficiency warnings
-    ts = fetch_isd_raw_temp_data(usaf_id, year)
-    return (
-        ts.resample("Min")
-        .mean()
-        .interpolate(method="linear", limit=60, limit_direction="both")
-        .resample("D")
-        .mean()
-    )
+def fetch_isd_hourly_temp_data(usaf_id, year, use_raw_cache=False):
+    return fetch_isd_resampled_temp_data(
+        usaf_id, year, freqs=["H"], use_raw_cache=use_raw_cache
+    )["H"]
 
 
-def fetch_gsod_raw_temp_data(usaf_id, year):
+def fetch_isd_daily_temp_data(usaf_id, year, use_raw_cache=False):
+    return fetch_isd_resampled_temp_data(
+        usaf_id, year, freqs=["D"], use_raw_cache=use_raw_cache
+    )["D"]
+
+
+def _fixed_width_floats(buf, starts, offset, width):
+    # gather a fixed-width column of ascii decimals from every line and let
+    # numpy parse all of them at once.
+    chars = buf[starts[:, None] + np.arange(offset, offset + width)]
+    return chars.view("S{}".format(width))[:, 0].astype(float)
+
+
+def _fahrenheit_to_celsius(tempF):
+    return (5.0 / 9.0) * (tempF - 32.0)
+
+
+def _decode_gsod_records(data, extra_fields=False):
+    """Decode the date and mean temperature of every record in a block of
+    uncompressed GSOD data.
+
+    Returns observation dates as ``datetime64[D]`` and temperatures in degrees C.
+    If ``extra_fields`` is set, also returns the maximum and minimum
+    temperatures in degrees C, with the ``9999.9`` sentinel decoded as ``NaN``,
+    and the number of observations used to compute the mean.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    starts = _line_starts(buf)
+
+    # YEARMODA at [14:22]
+    year = _fixed_width_ints(buf, starts, 14, 4)
+    month = _fixed_width_ints(buf, starts, 18, 2)
+    day = _fixed_width_ints(buf, starts, 20, 2)
+    dates = ((year - 1970) * 12 + month - 1).astype("datetime64[M]").astype(
+        "datetime64[D]"
+    ) + (day - 1).astype("timedelta64[D]")
+
+    # mean temperature in degrees F at [24:30]
+    temps = _fahrenheit_to_celsius(_fixed_width_floats(buf, starts, 24, 6))
+    if not extra_fields:
+        return dates, temps
+
+    # observation count at [31:33], max and min temperatures in degrees F at
+    # [102:108] and [110:116], each followed by a one character flag
+    counts = _fixed_width_ints(buf, starts, 31, 2)
+    max_tempF = _fixed_width_floats(buf, starts, 102, 6)
+    min_tempF = _fixed_width_floats(buf, starts, 110, 6)
+    max_temps = np.where(max_tempF == 9999.9, np.nan, _fahrenheit_to_celsius(max_tempF))
+    min_temps = np.where(min_tempF == 9999.9, np.nan, _fahrenheit_to_celsius(min_tempF))
+    return dates, temps, max_temps, min_temps, counts
+
+
+def _fetch_gsod_records(usaf_id, year, extra_fields=False):
     filenames = get_gsod_filenames(usaf_id, year)
 
-    data = []
+    decode_records = functools.partial(_decode_gsod_records, extra_fields=extra_fields)
+    records = []
     for filename in filenames:
+        # first line is a header
+        stream = _GzipRecordStream(decode_records, skip_lines=1)
         # using fully-qualified name facilitates monkeypatching
-        gzipped = eeweather.connections.noaa_ftp_connection_proxy.read_file_as_bytes(
-            filename
-        )
-
-        if gzipped is not None:
-            f = gzip.GzipFile(fileobj=gzipped)
-            lines = f.readlines()
-            for line in lines[1:]:
-                columns = line.split()
-                date_str = columns[2].decode("utf-8")
-                tempF = float(columns[3])
-                tempC = (5.0 / 9.0) * (tempF - 32.0)
-                dt = pytz.UTC.localize(datetime.strptime(date_str, "%Y%m%d"))
-                data.append([dt, tempC])
-            gzipped.close()
+        if eeweather.connections.noaa_ftp_connection_proxy.read_file_into(
+            filename, stream
+        ):
+            records.append(stream.finish())
 
-    if data == []:
+    if sum(len(file_records[0]) for file_records in records) == 0:
         raise GSODDataNotAvailableError(usaf_id, year)
 
-    dates, temps = zip(*sorted(data))
-    ts = pd.Series(temps, index=dates)
-    ts = ts.groupby(ts.index).mean()
-    return ts
+    return tuple(np.concatenate(arrays) for arrays in zip(*records))
+
+
+def fetch_gsod_raw_temp_data(usaf_id, year):
+    return _mean_by_time(*_fetch_gsod_records(usaf_id, year))
+
+
+def fetch_gsod_raw_temp_fields(usaf_id, year):
+    """Fetch the daily mean, maximum and minimum temperatures and observation
+    counts from a GSOD file in a single pass.
+
+    Returns a :any:`pandas.DataFrame` with columns ``temp_C``, ``max_temp_C``,
+    ``min_temp_C`` and integer ``n_observations`` on a daily UTC index.
+    Missing maximum and minimum temperatures are ``NaN``.
+    """
+    dates, temps, max_temps, min_temps, counts = _fetch_gsod_records(
+        usaf_id, year, extra_fields=True
+    )
+    return pd.DataFrame(
+        {
+            "temp_C": _mean_by_time(dates, temps),
+            "max_temp_C": _mean_by_time(dates, max_temps),
+            "min_temp_C": _mean_by_time(dates, min_temps),
+            "n_observations": _sum_by_time(dates, counts),
+        }
+    )
 
 
 def fetch_gsod_daily_temp_data(usaf_id, year):
@@ -393,41 +627,74 @@ def fetch_cz2010_hourly_temp_data(usaf_id):
 
 @eeweather.mockable.mockable()
 def request_text(url):  # pragma: no cover
-    response = requests.get(url)
-    if response.ok:
-        return response.text
-    else:
-        raise RuntimeError("Could not find {}.".format(url))
+    # through the NOAA connection, so a mirror also serves TMY3 and CZ2010 data
+    return eeweather.connections.noaa_ftp_connection_proxy.request_text(url)
+
+
+# first hour of each month in the (non-leap) 1900 template year
+_NORMAL_YEAR_MONTH_START_HOURS = 24 * np.cumsum(
+    [0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30], dtype=np.int64
+)
+
+
+def _decode_normalized_temp_records(data):
+    """Decode the local standard hour of year and dry bulb temperature of
+    every record in a TMY3 or CZ2010 CSV file, skipping the two header lines.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    starts = _line_starts(buf)[2:]
+    commas = np.flatnonzero(buf == ord(","))
+    first_commas = np.searchsorted(commas, starts)
+
+    # MM/DD/YYYY,HH:MM at the start of each line, with hours 1-24
+    month = _fixed_width_ints(buf, starts, 0, 2)
+    day = _fixed_width_ints(buf, starts, 3, 2)
+    hour = _fixed_width_ints(buf, commas[first_commas] + 1, 0, 2) - 1
+    hour_of_year = _NORMAL_YEAR_MONTH_START_HOURS[month - 1] + (day - 1) * 24 + hour
+
+    # dry bulb temperature is the variable-width field after the 31st comma;
+    # pad every value with null bytes to a common width and parse them at once
+    temp_starts = commas[first_commas + 30] + 1
+    temp_widths = commas[first_commas + 31] - temp_starts
+    offsets = np.arange(temp_widths.max())
+    chars = np.where(
+        offsets < temp_widths[:, None], buf[temp_starts[:, None] + offsets], 0
+    ).astype(np.uint8)
+    temps = chars.view("S{}".format(len(offsets)))[:, 0].astype(float)
+    return hour_of_year, temps
 
 
 def fetch_hourly_normalized_temp_data(usaf_id, url, source_name):
-    index = pd.date_range("1900-01-01 00:00", "1900-12-31 23:00", freq="H", tz=pytz.UTC)
-    ts = pd.Series(None, index=index, dtype=float)
+    return _parse_hourly_normalized_temp_data(eeweather.mockable.request_text(url))
 
-    lines = eeweather.mockable.request_text(url).splitlines()
 
-    utc_offset_str = lines[0].split(",")[3]
-    utc_offset = timedelta(seconds=3600 * float(utc_offset_str))
+def _parse_hourly_normalized_temp_data(data):
+    index = pd.date_range("1900-01-01 00:00", "1900-12-31 23:00", freq="H", tz=pytz.UTC)
 
-    for line in lines[2:]:
-        row = line.split(",")
-        month = row[0][0:2]
-        day = row[0][3:5]
-        hour = int(row[1][0:2]) - 1
+    utc_offset_str = data[: data.find("\n")].split(",")[3]
+    utc_offset = float(utc_offset_str)
+    if not utc_offset.is_integer():
+        # e.g. a half-hour zone, whose hours can't be shifted onto UTC hours
+        raise ValueError(
+            "Unsupported UTC offset {} (not a whole number of hours)".format(
+                utc_offset_str
+            )
+        )
+    utc_offset_hours = int(utc_offset)
 
-        # YYYYMMDDHH
-        date_string = "1900{}{}{:02d}".format(month, day, hour)
+    hour_of_year, temps = _decode_normalized_temp_records(data.encode("utf-8"))
 
-        dt = datetime.strptime(date_string, "%Y%m%d%H") - utc_offset
+    # Shift to UTC, wrapping the first or last few hours of the year around
+    # so the series stays within 1900
+    hour_of_year = (hour_of_year - utc_offset_hours) % HOURS_PER_NORMAL_YEAR
 
-        # Only a little redundant to make year 1900 again - matters for
-        # first or last few hours of the year depending UTC on offset
-        dt = pytz.UTC.localize(dt.replace(year=1900))
-        temp_C = float(row[31])
+    ts = np.full(HOURS_PER_NORMAL_YEAR, np.nan)
+    ts[hour_of_year] = temps
+    return pd.Series(ts, index=index)
 
-        ts[dt] = temp_C
 
-    return ts
+def get_isd_raw_temp_data_cache_key(usaf_id, year):
+    return "isd-raw-{}-{}".format(usaf_id, year)
 
 
 def get_isd_hourly_temp_data_cache_key(usaf_id, year):
@@ -460,6 +727,36 @@ def _expired(last_updated, year):
     return expiration_limit > last_updated and updated_during_data_year
 
 
+def _cache_ttl(key):
+    # seconds after which a value saved now under key becomes expired by
+    # _expired, or None if it never does: data saved during its own year
+    # expires after DATA_EXPIRATION_DAYS, other data (e.g. tmy3) is final
+    parts = key.split("-")
+    if len(parts) < 4 or not parts[3].isdigit():
+        return None
+    if int(parts[3]) != datetime.now(pytz.UTC).year:
+        return None
+    return int(timedelta(days=DATA_EXPIRATION_DAYS).total_seconds())
+
+
+def _expired_range(year):
+    # [start, end) range of update times for which _expired(updated, year)
+    return (
+        datetime(year, 1, 1, tzinfo=pytz.UTC),
+        min(
+            datetime(year + 1, 1, 1, tzinfo=pytz.UTC),
+            pytz.UTC.localize(datetime.now() - timedelta(days=DATA_EXPIRATION_DAYS)),
+        ),
+    )
+
+
+def cached_isd_raw_temp_data_is_expired(usaf_id, year):
+    key = get_isd_raw_temp_data_cache_key(usaf_id, year)
+    store = eeweather.connections.key_value_store_proxy.get_store()
+    last_updated = store.key_updated(key)
+    return _expired(last_updated, year)
+
+
 def cached_isd_hourly_temp_data_is_expired(usaf_id, year):
     key = get_isd_hourly_temp_data_cache_key(usaf_id, year)
     store = eeweather.connections.key_value_store_proxy.get_store()
@@ -481,6 +778,22 @@ def cached_gsod_daily_temp_data_is_expired(usaf_id, year):
     return _expired(last_updated, year)
 
 
+def validate_isd_raw_temp_data_cache(usaf_id, year):
+    key = get_isd_raw_temp_data_cache_key(usaf_id, year)
+    store = eeweather.connections.key_value_store_proxy.get_store()
+
+    # fail if no key
+    if not store.key_exists(key):
+        return False
+
+    # check for expired data, fail if so
+    if cached_isd_raw_temp_data_is_expired(usaf_id, year):
+        store.clear(key)
+        return False
+
+    return True
+
+
 def validate_isd_hourly_temp_data_cache(usaf_id, year):
     key = get_isd_hourly_temp_data_cache_key(usaf_id, year)
     store = eeweather.connections.key_value_store_proxy.get_store()
@@ -620,64 +933,120 @@ def deserialize_cz2010_hourly_temp_data(data):
     return _deserialize(data, "H")
 
 
+def _decode_cached_temp_data(data, deserialize_json):
+    # rows written by earlier versions hold json
+    if is_encoded(data):
+        return decode_series(data)
+    return deserialize_json(data)
+
+
+def _decode_cached_raw_temp_data(data):
+    # unlike resampled data, raw observations were never cached as json
+    return _mean_by_time(*decode_observations(data))
+
+
+def read_isd_raw_temp_data_from_cache(usaf_id, year):
+    key = get_isd_raw_temp_data_cache_key(usaf_id, year)
+    store = eeweather.connections.key_value_store_proxy.get_store()
+    return _decode_cached_raw_temp_data(store.retrieve(key))
+
+
 def read_isd_hourly_temp_data_from_cache(usaf_id, year):
     key = get_isd_hourly_temp_data_cache_key(usaf_id, year)
     store = eeweather.connections.key_value_store_proxy.get_store()
-    return deserialize_isd_hourly_temp_data(store.retrieve_json(key))
+    return _decode_cached_temp_data(
+        store.retrieve(key), deserialize_isd_hourly_temp_data
+    )
 
 
 def read_isd_daily_temp_data_from_cache(usaf_id, year):
     key = get_isd_daily_temp_data_cache_key(usaf_id, year)
     store = eeweather.connections.key_value_store_proxy.get_store()
-    return deserialize_isd_daily_temp_data(store.retrieve_json(key))
+    return _decode_cached_temp_data(
+        store.retrieve(key), deserialize_isd_daily_temp_data
+    )
 
 
 def read_gsod_daily_temp_data_from_cache(usaf_id, year):
     key = get_gsod_daily_temp_data_cache_key(usaf_id, year)
     store = eeweather.connections.key_value_store_proxy.get_store()
-    return deserialize_gsod_daily_temp_data(store.retrieve_json(key))
+    return _decode_cached_temp_data(
+        store.retrieve(key), deserialize_gsod_daily_temp_data
+    )
 
 
 def read_tmy3_hourly_temp_data_from_cache(usaf_id):
     key = get_tmy3_hourly_temp_data_cache_key(usaf_id)
     store = eeweather.connections.key_value_store_proxy.get_store()
-    return deserialize_tmy3_hourly_temp_data(store.retrieve_json(key))
+    return _decode_cached_temp_data(
+        store.retrieve(key), deserialize_tmy3_hourly_temp_data
+    )
 
 
 def read_cz2010_hourly_temp_data_from_cache(usaf_id):
     key = get_cz2010_hourly_temp_data_cache_key(usaf_id)
     store = eeweather.connections.key_value_store_proxy.get_store()
-    return deserialize_cz2010_hourly_temp_data(store.retrieve_json(key))
+    return _decode_cached_temp_data(
+        store.retrieve(key), deserialize_cz2010_hourly_temp_data
+    )
+
+
+def _read_from_normals_archive(source_name, usaf_id):
+    # using fully-qualified name facilitates monkeypatching
+    archive = eeweather.connections.normals_archive_proxy.get_archive()
+    if archive is None:
+        return None
+    return archive.get_temp_data(source_name, usaf_id)
+
+
+def read_tmy3_hourly_temp_data_from_normals_archive(usaf_id):
+    return _read_from_normals_archive("TMY3", usaf_id)
+
+
+def read_cz2010_hourly_temp_data_from_normals_archive(usaf_id):
+    return _read_from_normals_archive("CZ2010", usaf_id)
+
+
+def _write_isd_raw_observations_to_cache(usaf_id, year, times, temps):
+    key = get_isd_raw_temp_data_cache_key(usaf_id, year)
+    store = eeweather.connections.key_value_store_proxy.get_store()
+    return store.save_bytes(key, encode_observations(times, temps))
 
 
 def write_isd_hourly_temp_data_to_cache(usaf_id, year, ts):
     key = get_isd_hourly_temp_data_cache_key(usaf_id, year)
     store = eeweather.connections.key_value_store_proxy.get_store()
-    return store.save_json(key, serialize_isd_hourly_temp_data(ts))
+    return store.save_bytes(key, encode_series(ts, "H"))
 
 
 def write_isd_daily_temp_data_to_cache(usaf_id, year, ts):
     key = get_isd_daily_temp_data_cache_key(usaf_id, year)
     store = eeweather.connections.key_value_store_proxy.get_store()
-    return store.save_json(key, serialize_isd_daily_temp_data(ts))
+    return store.save_bytes(key, encode_series(ts, "D"))
 
 
 def write_gsod_daily_temp_data_to_cache(usaf_id, year, ts):
     key = get_gsod_daily_temp_data_cache_key(usaf_id, year)
     store = eeweather.connections.key_value_store_proxy.get_store()
-    return store.save_json(key, serialize_gsod_daily_temp_data(ts))
+    return store.save_bytes(key, encode_series(ts, "D"))
 
 
 def write_tmy3_hourly_temp_data_to_cache(usaf_id, ts):
     key = get_tmy3_hourly_temp_data_cache_key(usaf_id)
     store = eeweather.connections.key_value_store_proxy.get_store()
-    return store.save_json(key, serialize_tmy3_hourly_temp_data(ts))
+    return store.save_bytes(key, encode_series(ts, "H"))
 
 
 def write_cz2010_hourly_temp_data_to_cache(usaf_id, ts):
     key = get_cz2010_hourly_temp_data_cache_key(usaf_id)
     store = eeweather.connections.key_value_store_proxy.get_store()
-    return store.save_json(key, serialize_cz2010_hourly_temp_data(ts))
+    return store.save_bytes(key, encode_series(ts, "H"))
+
+
+def destroy_cached_isd_raw_temp_data(usaf_id, year):
+    key = get_isd_raw_temp_data_cache_key(usaf_id, year)
+    store = eeweather.connections.key_value_store_proxy.get_store()
+    return store.clear(key)
 
 
 def destroy_cached_isd_hourly_temp_data(usaf_id, year):
@@ -710,49 +1079,205 @@ def destroy_cached_cz2010_hourly_temp_data(usaf_id):
     return store.clear(key)
 
 
-def load_isd_hourly_temp_data_cached_proxy(
+def _read_from_memory_cache(store, key, year=None):
+    # decoded series held by the store's in-process tier, if it is enabled
+    # and the entry is fresh
+    if store.memory_cache is None:
+        return None
+    entry = store.memory_cache.get(key)
+    if entry is None:
+        return None
+    ts, last_updated = entry
+    if year is not None and _expired(last_updated, year):
+        store.memory_cache.invalidate(key)
+        return None
+    # callers own the series they get back
+    return ts.copy()
+
+
+def _write_to_memory_cache(store, key, ts, last_updated):
+    if store.memory_cache is not None:
+        store.memory_cache.put(key, (ts.copy(), last_updated))
+
+
+def _read_fresh_from_cache(key, decode, year=None):
+    # equivalent of validate_*_cache followed by read_*_from_cache, but from
+    # memory or with a single query; returns None if the key is missing or,
+    # for data of a given year, expired (in which case it is also cleared)
+    store = eeweather.connections.key_value_store_proxy.get_store()
+    ts = _read_from_memory_cache(store, key, year)
+    if ts is not None:
+        return ts
+    data, last_updated = store.retrieve_with_updated(key)
+    if data is None:
+        return None
+    if year is not None and _expired(last_updated, year):
+        store.clear(key)
+        return None
+    ts = decode(data)
+    _write_to_memory_cache(store, key, ts, last_updated)
+    return ts
+
+
+def _read_fresh_years_from_cache(
+    get_cache_key, decode, usaf_id, years, read_from_cache=True, fetch_from_web=True
+):
+    # batch equivalent of the cache lookup in the year-keyed load_*_cached_proxy
+    # functions: years held in memory plus one query for the rest, returning
+    # the fresh series the proxies would read, keyed by year
+    if fetch_from_web and not read_from_cache:
+        return {}
+    store = eeweather.connections.key_value_store_proxy.get_store()
+    data = {}
+    keys = {}
+    for year in years:
+        key = get_cache_key(usaf_id, year)
+        ts = _read_from_memory_cache(store, key, year)
+        if ts is None:
+            keys[year] = key
+        else:
+            data[year] = ts
+    if len(keys) == 0:
+        return data
+
+    # stale values are recognized, and not sent, by the store
+    found = store.retrieve_many_with_updated(
+        keys.values(), stale={key: _expired_range(year) for year, key in keys.items()}
+    )
+    for year, key in keys.items():
+        if key not in found:
+            continue
+        value, last_updated = found[key]
+        if _expired(last_updated, year):
+            store.clear(key)
+        elif value is not None:
+            data[year] = decode(value)
+            _write_to_memory_cache(store, key, data[year], last_updated)
+    return data
+
+
+def load_isd_raw_temp_data_cached_proxy(
     usaf_id, year, read_from_cache=True, write_to_cache=True, fetch_from_web=True
 ):
-    # take from cache?
-    data_ok = validate_isd_hourly_temp_data_cache(usaf_id, year)
+    # take from cache? from memory, or payload and freshness in one query
+    cached_ts = _read_fresh_from_cache(
+        get_isd_raw_temp_data_cache_key(usaf_id, year),
+        _decode_cached_raw_temp_data,
+        year,
+    )
+    data_ok = cached_ts is not None
 
     if not fetch_from_web and not data_ok:
         raise ISDDataNotAvailableError(usaf_id, year)
     elif fetch_from_web and (not read_from_cache or not data_ok):
         # need to actually fetch the data
-        ts = fetch_isd_hourly_temp_data(usaf_id, year)
+        times, temps = _fetch_isd_raw_observations(usaf_id, year)
         if write_to_cache:
-            write_isd_hourly_temp_data_to_cache(usaf_id, year, ts)
+            _write_isd_raw_observations_to_cache(usaf_id, year, times, temps)
+        ts = _mean_by_time(times, temps)
     else:
         # read_from_cache=True and data_ok=True
-        ts = read_isd_hourly_temp_data_from_cache(usaf_id, year)
+        ts = cached_ts
+    return ts
+
+
+def _fetch_isd_hourly_and_daily_temp_data(usaf_id, year, write_to_cache, use_raw_cache):
+    # both frequencies come from the same download, so fill both caches
+    data = fetch_isd_resampled_temp_data(
+        usaf_id, year, freqs=("H", "D"), use_raw_cache=use_raw_cache
+    )
+    if write_to_cache:
+        store = eeweather.connections.key_value_store_proxy.get_store()
+        store.save_many(
+            {
+                get_isd_hourly_temp_data_cache_key(usaf_id, year): encode_series(
+                    data["H"], "H"
+                ),
+                get_isd_daily_temp_data_cache_key(usaf_id, year): encode_series(
+                    data["D"], "D"
+                ),
+            }
+        )
+    return data
+
+
+def load_isd_hourly_temp_data_cached_proxy(
+    usaf_id,
+    year,
+    read_from_cache=True,
+    write_to_cache=True,
+    fetch_from_web=True,
+    use_raw_cache=False,
+):
+    # take from cache? from memory, or payload and freshness in one query
+    cached_ts = _read_fresh_from_cache(
+        get_isd_hourly_temp_data_cache_key(usaf_id, year),
+        functools.partial(
+            _decode_cached_temp_data,
+            deserialize_json=deserialize_isd_hourly_temp_data,
+        ),
+        year,
+    )
+    data_ok = cached_ts is not None
+
+    if not fetch_from_web and not data_ok:
+        raise ISDDataNotAvailableError(usaf_id, year)
+    elif fetch_from_web and (not read_from_cache or not data_ok):
+        # need to actually fetch the data
+        ts = _fetch_isd_hourly_and_daily_temp_data(
+            usaf_id, year, write_to_cache, use_raw_cache
+        )["H"]
+    else:
+        # read_from_cache=True and data_ok=True
+        ts = cached_ts
     return ts
 
 
 def load_isd_daily_temp_data_cached_proxy(
-    usaf_id, year, read_from_cache=True, write_to_cache=True, fetch_from_web=True
+    usaf_id,
+    year,
+    read_from_cache=True,
+    write_to_cache=True,
+    fetch_from_web=True,
+    use_raw_cache=False,
 ):
-    # take from cache?
-    data_ok = validate_isd_daily_temp_data_cache(usaf_id, year)
+    # take from cache? from memory, or payload and freshness in one query
+    cached_ts = _read_fresh_from_cache(
+        get_isd_daily_temp_data_cache_key(usaf_id, year),
+        functools.partial(
+            _decode_cached_temp_data,
+            deserialize_json=deserialize_isd_daily_temp_data,
+        ),
+        year,
+    )
+    data_ok = cached_ts is not None
 
     if not fetch_from_web and not data_ok:
         raise ISDDataNotAvailableError(usaf_id, year)
     elif fetch_from_web and (not read_from_cache or not data_ok):
         # need to actually fetch the data
-        ts = fetch_isd_daily_temp_data(usaf_id, year)
-        if write_to_cache:
-            write_isd_daily_temp_data_to_cache(usaf_id, year, ts)
+        ts = _fetch_isd_hourly_and_daily_temp_data(
+            usaf_id, year, write_to_cache, use_raw_cache
+        )["D"]
     else:
         # read_from_cache=True and data_ok=True
-        ts = read_isd_daily_temp_data_from_cache(usaf_id, year)
+        ts = cached_ts
     return ts
 
 
 def load_gsod_daily_temp_data_cached_proxy(
     usaf_id, year, read_from_cache=True, write_to_cache=True, fetch_from_web=True
 ):
-    # take from cache?
-    data_ok = validate_gsod_daily_temp_data_cache(usaf_id, year)
+    # take from cache? from memory, or payload and freshness in one query
+    cached_ts = _read_fresh_from_cache(
+        get_gsod_daily_temp_data_cache_key(usaf_id, year),
+        functools.partial(
+            _decode_cached_temp_data,
+            deserialize_json=deserialize_gsod_daily_temp_data,
+        ),
+        year,
+    )
+    data_ok = cached_ts is not None
 
     if not fetch_from_web and not data_ok:
         raise GSODDataNotAvailableError(usaf_id, year)
@@ -763,15 +1288,28 @@ def load_gsod_daily_temp_data_cached_proxy(
             write_gsod_daily_temp_data_to_cache(usaf_id, year, ts)
     else:
         # read_from_cache=True and data_ok=True
-        ts = read_gsod_daily_temp_data_from_cache(usaf_id, year)
+        ts = cached_ts
     return ts
 
 
 def load_tmy3_hourly_temp_data_cached_proxy(
     usaf_id, read_from_cache=True, write_to_cache=True, fetch_from_web=True
 ):
-    # take from cache?
-    data_ok = validate_tmy3_hourly_temp_data_cache(usaf_id)
+    # take from offline normals archive?
+    if read_from_cache:
+        ts = read_tmy3_hourly_temp_data_from_normals_archive(usaf_id)
+        if ts is not None:
+            return ts
+
+    # take from cache? from memory, or payload and freshness in one query
+    cached_ts = _read_fresh_from_cache(
+        get_tmy3_hourly_temp_data_cache_key(usaf_id),
+        functools.partial(
+            _decode_cached_temp_data,
+            deserialize_json=deserialize_tmy3_hourly_temp_data,
+        ),
+    )
+    data_ok = cached_ts is not None
 
     if not fetch_from_web and not data_ok:
         raise TMY3DataNotAvailableError(usaf_id)
@@ -782,15 +1320,28 @@ def load_tmy3_hourly_temp_data_cached_proxy(
             write_tmy3_hourly_temp_data_to_cache(usaf_id, ts)
     else:
         # read_from_cache=True and data_ok=True
-        ts = read_tmy3_hourly_temp_data_from_cache(usaf_id)
+        ts = cached_ts
     return ts
 
 
 def load_cz2010_hourly_temp_data_cached_proxy(
     usaf_id, read_from_cache=True, write_to_cache=True, fetch_from_web=True
 ):
-    # take from cache?
-    data_ok = validate_cz2010_hourly_temp_data_cache(usaf_id)
+    # take from offline normals archive?
+    if read_from_cache:
+        ts = read_cz2010_hourly_temp_data_from_normals_archive(usaf_id)
+        if ts is not None:
+            return ts
+
+    # take from cache? from memory, or payload and freshness in one query
+    cached_ts = _read_fresh_from_cache(
+        get_cz2010_hourly_temp_data_cache_key(usaf_id),
+        functools.partial(
+            _decode_cached_temp_data,
+            deserialize_json=deserialize_cz2010_hourly_temp_data,
+        ),
+    )
+    data_ok = cached_ts is not None
 
     if not fetch_from_web and not data_ok:
         raise CZ2010DataNotAvailableError(usaf_id)
@@ -801,7 +1352,99 @@ def load_cz2010_hourly_temp_data_cached_proxy(
             write_cz2010_hourly_temp_data_to_cache(usaf_id, ts)
     else:
         # read_from_cache=True and data_ok=True
-        ts = read_cz2010_hourly_temp_data_from_cache(usaf_id)
+        ts = cached_ts
+    return ts
+
+
+def _normal_year_hours(index):
+    # hour of the (non-leap) normal year of each UTC timestamp, and whether
+    # the timestamp falls exactly on an hour other than those of February 29
+    ns = index.tz_convert(pytz.UTC).tz_localize(None).values
+    months = ns.astype("datetime64[M]")
+    days = ns.astype("datetime64[D]")
+    month = months.astype(np.int64) % 12 + 1
+    day = (days - months.astype("datetime64[D]")).astype(np.int64) + 1
+    ns_into_day = (ns - days).astype(np.int64)
+    hour_of_year = (
+        _NORMAL_YEAR_MONTH_START_HOURS[month - 1]
+        + (day - 1) * 24
+        + ns_into_day // (3600 * 10**9)
+    )
+    valid = (ns_into_day % (3600 * 10**9) == 0) & ~((month == 2) & (day == 29))
+    return hour_of_year, valid
+
+
+def _project_normal_year(single_year_data, start, end):
+    """Repeat a normal-year hourly series over each year from ``start`` to
+    ``end``, matching hours by month, day and hour of day.
+
+    February 29 is not part of the normal year and is left ``NaN``.
+    """
+    hour_of_year, valid = _normal_year_hours(single_year_data.index)
+    template = np.full(HOURS_PER_NORMAL_YEAR, np.nan)
+    template[hour_of_year[valid]] = single_year_data.values[valid]
+
+    index = pd.date_range(start, end, freq="H", tz=pytz.UTC)
+    hour_of_year, valid = _normal_year_hours(index)
+    values = np.where(valid, template[np.where(valid, hour_of_year, 0)], np.nan)
+    return pd.Series(values, index=index)
+
+
+def _fill_hourly_range(ts, start, end):
+    if len(ts) > 0:
+        # because start and end dates need.to fall exactly on hours
+        ts_start = datetime(
+            start.year, start.month, start.day, start.hour, tzinfo=pytz.UTC
+        )
+        # add an hour if not already exactly on an hour, which guarantees
+        # that ts_start is greater than or equal to start.
+        if ts_start < start:
+            ts_start += timedelta(seconds=3600)
+        ts_end = datetime(end.year, end.month, end.day, end.hour, tzinfo=pytz.UTC)
+        # fill in gaps
+        ts = ts.reindex(pd.date_range(ts_start, ts_end, freq="H", tz=pytz.UTC))
+    return ts
+
+
+def _fill_daily_range(ts, start, end):
+    if len(ts) > 0:
+        # because start and end dates need.to fall exactly on days
+        ts_start = datetime(start.year, start.month, start.day, tzinfo=pytz.UTC)
+        # add a day if not already exactly on a day, which guarantees
+        # that ts_start is greater than or equal to start.
+        if ts_start < start:
+            ts_start += timedelta(days=1)
+        ts_end = datetime(end.year, end.month, end.day, tzinfo=pytz.UTC)
+        # fill in gaps
+        ts = ts.reindex(pd.date_range(ts_start, ts_end, freq="D", tz=pytz.UTC))
+    return ts
+
+
+def _read_range_from_cache(get_cache_key, usaf_id, start, end, read_from_cache):
+    # the observations between start and end of fresh cached years, read
+    # from the store's observations table without loading whole years, or
+    # None if they have to be loaded year by year
+    store = eeweather.connections.key_value_store_proxy.get_store()
+    if not read_from_cache or not getattr(store, "store_observations", False):
+        return None
+    keys = {
+        year: get_cache_key(usaf_id, year) for year in range(start.year, end.year + 1)
+    }
+    if store.memory_cache is not None and any(
+        key in store.memory_cache for key in keys.values()
+    ):
+        # decoded years in memory are cheaper still
+        return None
+    ts = store.retrieve_observations(
+        keys.values(),
+        start,
+        end,
+        stale={key: _expired_range(year) for year, key in keys.items()},
+    )
+    if ts is None or len(ts) == 0:
+        # without any observations in the range, whether it lies within the
+        # data of the years decides between an empty and an all-NaN result
+        return None
     return ts
 
 
@@ -813,6 +1456,7 @@ def load_isd_hourly_temp_data(
     write_to_cache=True,
     error_on_missing_years=False,
     fetch_from_web=True,
+    use_raw_cache=False,
 ):
     warnings = []
     # CalTRACK 2.3.3
@@ -820,19 +1464,42 @@ def load_isd_hourly_temp_data(
         raise NonUTCTimezoneInfoError(start)
     if not _datetime_is_utc(end):
         raise NonUTCTimezoneInfoError(end)
+    ts = _read_range_from_cache(
+        get_isd_hourly_temp_data_cache_key, usaf_id, start, end, read_from_cache
+    )
+    if ts is not None:
+        return _fill_hourly_range(ts, start, end), warnings
+    years = range(start.year, end.year + 1)
+    # all cached years from memory or in one query
+    cached = _read_fresh_years_from_cache(
+        get_isd_hourly_temp_data_cache_key,
+        functools.partial(
+            _decode_cached_temp_data,
+            deserialize_json=deserialize_isd_hourly_temp_data,
+        ),
+        usaf_id,
+        years,
+        read_from_cache=read_from_cache,
+        fetch_from_web=fetch_from_web,
+    )
+
+    def load_year(year):
+        if year in cached:
+            return cached[year]
+        return load_isd_hourly_temp_data_cached_proxy(
+            usaf_id,
+            year,
+            read_from_cache=read_from_cache,
+            write_to_cache=write_to_cache,
+            fetch_from_web=fetch_from_web,
+            use_raw_cache=use_raw_cache,
+        )
+
     if not error_on_missing_years:
         data = []
-        for year in range(start.year, end.year + 1):
+        for year in years:
             try:
-                data.append(
-                    load_isd_hourly_temp_data_cached_proxy(
-                        usaf_id,
-                        year,
-                        read_from_cache=read_from_cache,
-                        write_to_cache=write_to_cache,
-                        fetch_from_web=fetch_from_web,
-                    )
-                )
+                data.append(load_year(year))
             except ISDDataNotAvailableError:
                 warnings.append(
                     EEWeatherWarning(
@@ -841,18 +1508,17 @@ def load_isd_hourly_temp_data(
                         data={"year": year},
                     )
                 )
-                pass
+            except FetchTransientError as e:
+                # not missing, so fetched again by a later load
+                warnings.append(
+                    EEWeatherWarning(
+                        qualified_name="eeweather.isd_data_not_fetched",
+                        description=("ISD Data could not be fetched"),
+                        data={"year": year, "url": e.url, "reason": e.reason},
+                    )
+                )
     else:
-        data = [
-            load_isd_hourly_temp_data_cached_proxy(
-                usaf_id,
-                year,
-                read_from_cache=read_from_cache,
-                write_to_cache=write_to_cache,
-                fetch_from_web=fetch_from_web,
-            )
-            for year in range(start.year, end.year + 1)
-        ]
+        data = [load_year(year) for year in years]
 
     # get raw data from loaded years into hourly form
     ts = pd.concat(data).resample("H").mean()
@@ -860,38 +1526,53 @@ def load_isd_hourly_temp_data(
     # whittle down to desired range
     ts = ts[start:end]
 
-    if len(ts) > 0:
-        # because start and end dates need.to fall exactly on hours
-        ts_start = datetime(
-            start.year, start.month, start.day, start.hour, tzinfo=pytz.UTC
-        )
-        # add an hour if not already exactly on an hour, which guarantees
-        # that ts_start is greater than or equal to start.
-        if ts_start < start:
-            ts_start += timedelta(seconds=3600)
-        ts_end = datetime(end.year, end.month, end.day, end.hour, tzinfo=pytz.UTC)
-        # fill in gaps
-        ts = ts.reindex(pd.date_range(ts_start, ts_end, freq="H", tz=pytz.UTC))
-    return ts, warnings
+    return _fill_hourly_range(ts, start, end), warnings
 
 
 def load_isd_daily_temp_data(
-    usaf_id, start, end, read_from_cache=True, write_to_cache=True, fetch_from_web=True
+    usaf_id,
+    start,
+    end,
+    read_from_cache=True,
+    write_to_cache=True,
+    fetch_from_web=True,
+    use_raw_cache=False,
 ):
     # CalTRACK 2.3.3
     if start.tzinfo != pytz.UTC:
         raise NonUTCTimezoneInfoError(start)
     if end.tzinfo != pytz.UTC:
         raise NonUTCTimezoneInfoError(end)
+    ts = _read_range_from_cache(
+        get_isd_daily_temp_data_cache_key, usaf_id, start, end, read_from_cache
+    )
+    if ts is not None:
+        return _fill_daily_range(ts, start, end)
+    years = range(start.year, end.year + 1)
+    # all cached years from memory or in one query
+    cached = _read_fresh_years_from_cache(
+        get_isd_daily_temp_data_cache_key,
+        functools.partial(
+            _decode_cached_temp_data,
+            deserialize_json=deserialize_isd_daily_temp_data,
+        ),
+        usaf_id,
+        years,
+        read_from_cache=read_from_cache,
+        fetch_from_web=fetch_from_web,
+    )
     data = [
-        load_isd_daily_temp_data_cached_proxy(
+        cached[year]
+        if year in cached
+        else load_isd_daily_temp_data_cached_proxy(
             usaf_id,
             year,
             read_from_cache=read_from_cache,
             write_to_cache=write_to_cache,
             fetch_from_web=fetch_from_web,
+            use_raw_cache=use_raw_cache,
         )
-        for year in range(start.year, end.year + 1)
+        for year in years
     ]
 
     # get raw data
@@ -899,18 +1580,7 @@ def load_isd_daily_temp_data(
 
     # whittle down
     ts = ts[start:end]
-
-    if len(ts) > 0:
-        # because start and end dates need.to fall exactly on days
-        ts_start = datetime(start.year, start.month, start.day, tzinfo=pytz.UTC)
-        # add a day if not already exactly on a day, which guarantees
-        # that ts_start is greater than or equal to start.
-        if ts_start < start:
-            ts_start += timedelta(days=1)
-        ts_end = datetime(end.year, end.month, end.day, tzinfo=pytz.UTC)
-        # fill in gaps
-        ts = ts.reindex(pd.date_range(ts_start, ts_end, freq="D", tz=pytz.UTC))
-    return ts
+    return _fill_daily_range(ts, start, end)
 
 
 def load_gsod_daily_temp_data(
@@ -921,33 +1591,42 @@ def load_gsod_daily_temp_data(
         raise NonUTCTimezoneInfoError(start)
     if end.tzinfo != pytz.UTC:
         raise NonUTCTimezoneInfoError(end)
+    ts = _read_range_from_cache(
+        get_gsod_daily_temp_data_cache_key, usaf_id, start, end, read_from_cache
+    )
+    if ts is not None:
+        return _fill_daily_range(ts, start, end)
+    years = range(start.year, end.year + 1)
+    # all cached years from memory or in one query
+    cached = _read_fresh_years_from_cache(
+        get_gsod_daily_temp_data_cache_key,
+        functools.partial(
+            _decode_cached_temp_data,
+            deserialize_json=deserialize_gsod_daily_temp_data,
+        ),
+        usaf_id,
+        years,
+        read_from_cache=read_from_cache,
+        fetch_from_web=fetch_from_web,
+    )
     data = [
-        load_gsod_daily_temp_data_cached_proxy(
+        cached[year]
+        if year in cached
+        else load_gsod_daily_temp_data_cached_proxy(
             usaf_id,
             year,
             read_from_cache=read_from_cache,
             write_to_cache=write_to_cache,
             fetch_from_web=fetch_from_web,
         )
-        for year in range(start.year, end.year + 1)
+        for year in years
     ]
     # get raw data
     ts = pd.concat(data).resample("D").mean()
 
     # whittle down
     ts = ts[start:end]
-
-    if len(ts) > 0:
-        # because start and end dates need.to fall exactly on days
-        ts_start = datetime(start.year, start.month, start.day, tzinfo=pytz.UTC)
-        # add a day if not already exactly on a day, which guarantees
-        # that ts_start is greater than or equal to start.
-        if ts_start < start:
-            ts_start += timedelta(days=1)
-        ts_end = datetime(end.year, end.month, end.day, tzinfo=pytz.UTC)
-        # fill in gaps
-        ts = ts.reindex(pd.date_range(ts_start, ts_end, freq="D", tz=pytz.UTC))
-    return ts
+    return _fill_daily_range(ts, start, end)
 
 
 def load_tmy3_hourly_temp_data(
@@ -965,22 +1644,7 @@ def load_tmy3_hourly_temp_data(
         fetch_from_web=fetch_from_web,
     )
 
-    # dealing with year replacement
-    data = []
-    for year in range(start.year, end.year + 1):
-        single_year_index = single_year_data.index.map(lambda t: t.replace(year=year))
-
-        data.append(pd.Series(single_year_data.values, index=single_year_index))
-
-    # get raw data
-    ts = pd.concat(data).resample("H").mean()
-
-    # whittle down
-    ts = ts[start:end]
-
-    # fill in gaps
-    ts = ts.reindex(pd.date_range(start, end, freq="H", tz=pytz.UTC))
-    return ts
+    return _project_normal_year(single_year_data, start, end)
 
 
 def load_cz2010_hourly_temp_data(
@@ -998,31 +1662,21 @@ def load_cz2010_hourly_temp_data(
         fetch_from_web=fetch_from_web,
     )
 
-    # dealing with year replacement
-    data = []
-    for year in range(start.year, end.year + 1):
-        single_year_index = single_year_data.index.map(lambda t: t.replace(year=year))
-
-        data.append(pd.Series(single_year_data.values, index=single_year_index))
-
-    # get raw data
-    ts = pd.concat(data).resample("H").mean()
-
-    # whittle down
-    ts = ts[start:end]
-
-    # fill in gaps
-    ts = ts.reindex(pd.date_range(start, end, freq="H", tz=pytz.UTC))
-    return ts
+    return _project_normal_year(single_year_data, start, end)
 
 
 def load_cached_isd_hourly_temp_data(usaf_id):
     store = eeweather.connections.key_value_store_proxy.get_store()
 
-    data = [
-        read_isd_hourly_temp_data_from_cache(usaf_id, year)
+    keys = [
+        get_isd_hourly_temp_data_cache_key(usaf_id, year)
         for year in range(2000, datetime.now().year + 1)
-        if store.key_exists(get_isd_hourly_temp_data_cache_key(usaf_id, year))
+    ]
+    cached = store.retrieve_many(keys)
+    data = [
+        _decode_cached_temp_data(cached[key], deserialize_isd_hourly_temp_data)
+        for key in keys
+        if key in cached
     ]
     if data == []:
         return None
@@ -1032,10 +1686,15 @@ def load_cached_isd_hourly_temp_data(usaf_id):
 def load_cached_isd_daily_temp_data(usaf_id):
     store = eeweather.connections.key_value_store_proxy.get_store()
 
-    data = [
-        read_isd_daily_temp_data_from_cache(usaf_id, year)
+    keys = [
+        get_isd_daily_temp_data_cache_key(usaf_id, year)
         for year in range(2000, datetime.now().year + 1)
-        if store.key_exists(get_isd_daily_temp_data_cache_key(usaf_id, year))
+    ]
+    cached = store.retrieve_many(keys)
+    data = [
+        _decode_cached_temp_data(cached[key], deserialize_isd_daily_temp_data)
+        for key in keys
+        if key in cached
     ]
     if data == []:
         return None
@@ -1045,10 +1704,15 @@ def load_cached_isd_daily_temp_data(usaf_id):
 def load_cached_gsod_daily_temp_data(usaf_id):
     store = eeweather.connections.key_value_store_proxy.get_store()
 
-    data = [
-        read_gsod_daily_temp_data_from_cache(usaf_id, year)
+    keys = [
+        get_gsod_daily_temp_data_cache_key(usaf_id, year)
         for year in range(2000, datetime.now().year + 1)
-        if store.key_exists(get_gsod_daily_temp_data_cache_key(usaf_id, year))
+    ]
+    cached = store.retrieve_many(keys)
+    data = [
+        _decode_cached_temp_data(cached[key], deserialize_gsod_daily_temp_data)
+        for key in keys
+        if key in cached
     ]
     if data == []:
         return None
@@ -1073,6 +1737,340 @@ def load_cached_cz2010_hourly_temp_data(usaf_id):
         return None
 
 
+class _SpooledDownload(object):
+    # download target for NOAAFTPConnectionProxy.read_file_into which keeps
+    # large files on disk rather than in memory.
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+
+    def write(self, chunk):
+        self.file.write(chunk)
+
+    def reset(self):
+        self.file.seek(0)
+        self.file.truncate()
+
+
+def _open_gsod_archive_stream(year, **kwargs):
+    try:
+        return tarfile.open(mode="r|*", **kwargs)
+    except tarfile.ReadError:
+        raise GSODArchiveNotAvailableError(year)
+
+
+def _request_stream(url):
+    # open a streamed HTTP response following the retry policy; only
+    # opening it is retried, as a stream which failed can't be resumed
+    policy = get_retry_policy()
+    host = urlparse(url).netloc
+
+    def fetch():
+        try:
+            response = requests.get(url, stream=True, timeout=policy.timeout(host))
+        except IOError as e:  # e.g. requests.ConnectionError
+            raise FetchTransientError(url, e)
+        try:
+            _check_response(url, response)
+        except FetchError:
+            response.close()
+            raise
+        return response
+
+    return policy.call(host, url, fetch)
+
+
+class _ResponseStream(object):
+    # file object reading a streamed HTTP response, raising
+    # FetchTransientError if the connection breaks off or stalls
+    def __init__(self, url, raw):
+        self.url = url
+        self.raw = raw
+
+    def read(self, size=None):
+        try:
+            return self.raw.read(size)
+        except (IOError, urllib3.exceptions.HTTPError) as e:
+            raise FetchTransientError(self.url, e)
+
+
+@contextlib.contextmanager
+def _open_gsod_archive(year, source=None):
+    if source is None:
+        download = _SpooledDownload()
+        with download.file:
+            # using fully-qualified name facilitates monkeypatching
+            if not eeweather.connections.noaa_ftp_connection_proxy.read_file_into(
+                get_gsod_archive_filename(year), download
+            ):
+                raise GSODArchiveNotAvailableError(year)
+            download.file.seek(0)
+            with _open_gsod_archive_stream(year, fileobj=download.file) as archive:
+                yield archive
+    elif source.startswith(("http://", "https://")):
+        try:
+            response = _request_stream(source)
+        except FetchNotFoundError:
+            raise GSODArchiveNotAvailableError(year)
+        with response:
+            response.raw.decode_content = True
+            fileobj = _ResponseStream(source, response.raw)
+            with _open_gsod_archive_stream(year, fileobj=fileobj) as archive:
+                yield archive
+    else:
+        with _open_gsod_archive_stream(year, name=source) as archive:
+            yield archive
+
+
+def ingest_gsod_archive(year, source=None, usaf_ids=None, write_to_cache=True):
+    """Load daily GSOD temperature data for many stations from the yearly
+    archive NOAA publishes for all stations.
+
+    The archive is read sequentially, so it is never held in memory, and
+    every station is written to the ``gsod-daily-*`` cache keys in a single
+    transaction.
+
+    Parameters
+    ----------
+    year : int
+        Year of the archive.
+    source : str, optional
+        Local path or HTTP(S) URL of a ``gsod_{year}.tar`` archive. If not
+        given, the archive is downloaded from the NOAA FTP server.
+    usaf_ids : list of str, optional
+        Only ingest these stations, e.g. the result of
+        :any:`eeweather.get_isd_station_usaf_ids`. By default every station
+        in the archive is ingested.
+    write_to_cache : bool, optional
+        Write the daily data to the cache.
+
+    Returns
+    -------
+    dict
+        Daily temperature series keyed by USAF ID.
+    """
+    if usaf_ids is not None:
+        usaf_ids = set(usaf_ids)
+
+    records = {}
+    with _open_gsod_archive(year, source) as archive:
+        for member in archive:
+            # members are named like ./722874-93134-2007.op.gz
+            name = os.path.basename(member.name)
+            if not member.isfile() or not name.endswith(".op.gz"):
+                continue
+            usaf_id = name.split("-")[0]
+            if usaf_ids is not None and usaf_id not in usaf_ids:
+                continue
+            # first line is a header
+            stream = _GzipRecordStream(_decode_gsod_records, skip_lines=1)
+            f = archive.extractfile(member)
+            for chunk in iter(lambda: f.read(2**16), b""):
+                stream.write(chunk)
+            records.setdefault(usaf_id, []).append(stream.finish())
+
+    data = {}
+    for usaf_id, station_records in sorted(records.items()):
+        dates, temps = (np.concatenate(arrays) for arrays in zip(*station_records))
+        if len(dates) > 0:
+            data[usaf_id] = _mean_by_time(dates, temps).resample("D").mean()
+
+    if write_to_cache:
+        store = eeweather.connections.key_value_store_proxy.get_store()
+        store.save_many(
+            {
+                get_gsod_daily_temp_data_cache_key(usaf_id, year): encode_series(
+                    ts, "D"
+                )
+                for usaf_id, ts in data.items()
+            }
+        )
+    return data
+
+
+def _get_normals_station_usaf_ids(table):
+    conn = metadata_db_connection_proxy.get_connection()
+    cur = conn.cursor()
+    cur.execute("select usaf_id from {} order by usaf_id".format(table))
+    return [row[0] for row in cur.fetchall()]
+
+
+def build_normals_archive(
+    path, sources=("TMY3", "CZ2010"), csv_directory=None, usaf_ids=None
+):
+    """Pack normal-year hourly temperature data for many stations into a
+    memory-mapped archive which :any:`load_tmy3_hourly_temp_data_cached_proxy`
+    and :any:`load_cz2010_hourly_temp_data_cached_proxy` read from when the
+    ``EEWEATHER_NORMALS_ARCHIVE`` environment variable points at it.
+
+    Parameters
+    ----------
+    path : str
+        Path of the archive to write.
+    sources : list of str, optional
+        Any of ``"TMY3"`` and ``"CZ2010"``.
+    csv_directory : str, optional
+        Directory holding the original ``{usaf_id}TYA.CSV`` and
+        ``{usaf_id}_CZ2010.CSV`` files. If not given, data is taken from the
+        cache instead. Stations without data are skipped.
+    usaf_ids : list of str, optional
+        Only include these stations. By default every station with TMY3 or
+        CZ2010 metadata is included.
+
+    Returns
+    -------
+    int
+        Number of series written.
+    """
+    normals_sources = {
+        "TMY3": (
+            "tmy3_station_metadata",
+            "{}TYA.CSV",
+            validate_tmy3_hourly_temp_data_cache,
+            read_tmy3_hourly_temp_data_from_cache,
+        ),
+        "CZ2010": (
+            "cz2010_station_metadata",
+            "{}_CZ2010.CSV",
+            validate_cz2010_hourly_temp_data_cache,
+            read_cz2010_hourly_temp_data_from_cache,
+        ),
+    }
+
+    def iter_temp_data():
+        for source_name in sources:
+            table, filename_format, validate_cache, read_from_cache = normals_sources[
+                source_name
+            ]
+            station_usaf_ids = _get_normals_station_usaf_ids(table)
+            if usaf_ids is not None:
+                station_usaf_ids = [u for u in station_usaf_ids if u in usaf_ids]
+            for usaf_id in station_usaf_ids:
+                if csv_directory is not None:
+                    filename = os.path.join(
+                        csv_directory, filename_format.format(usaf_id)
+                    )
+                    if not os.path.exists(filename):
+                        continue
+                    with open(filename, encoding="utf-8", errors="replace") as f:
+                        ts = _parse_hourly_normalized_temp_data(f.read())
+                elif validate_cache(usaf_id):
+                    ts = read_from_cache(usaf_id)
+                else:
+                    continue
+                yield source_name, usaf_id, ts
+
+    return write_normals_archive(path, iter_temp_data())
+
+
+def build_weather_cube(
+    path,
+    start_year=None,
+    end_year=None,
+    usaf_ids=None,
+    read_from_cache=True,
+    write_to_cache=True,
+    fetch_from_web=True,
+):
+    """Create or update a :any:`eeweather.cube.WeatherCube` of ISD hourly
+    temperatures.
+
+    Station years already in the cube are skipped, so an interrupted build
+    can be resumed and a cube extended by running this again. Data of the
+    current year is reloaded every time. Station years without data are
+    left empty (NaN). Station years which could not be downloaded (see
+    :any:`eeweather.FetchTransientError`) are left empty too, but loaded
+    again by the next build.
+
+    Parameters
+    ----------
+    path : str
+        Directory of the cube.
+    start_year, end_year : int, optional
+        Years of a new cube. Required unless the cube exists.
+    usaf_ids : list of str, optional
+        Stations of a new cube, or stations to update in an existing one. By
+        default every ISD station.
+    read_from_cache, write_to_cache, fetch_from_web : bool, optional
+        As for :any:`load_isd_hourly_temp_data_cached_proxy`.
+
+    Returns
+    -------
+    int
+        Number of station years written with data.
+    """
+    if os.path.exists(os.path.join(path, "index.json")):
+        cube = WeatherCube(path, mode="r+")
+        if usaf_ids is not None:
+            # fail before anything is fetched
+            unknown = sorted(set(usaf_ids) - set(cube.usaf_ids))
+            if len(unknown) > 0:
+                raise UnrecognizedUSAFIDError(unknown[0])
+    else:
+        if start_year is None or end_year is None:
+            raise ValueError("start_year and end_year are required for a new cube")
+        if usaf_ids is None:
+            conn = metadata_db_connection_proxy.get_connection()
+            cur = conn.cursor()
+            cur.execute("select usaf_id from isd_station_metadata order by usaf_id")
+            usaf_ids = [row[0] for row in cur.fetchall()]
+        cube = WeatherCube.create(path, sorted(set(usaf_ids)), start_year, end_year)
+
+    current_year = datetime.now(pytz.UTC).year
+    decode = functools.partial(
+        _decode_cached_temp_data, deserialize_json=deserialize_isd_hourly_temp_data
+    )
+    n = 0
+    try:
+        for i, usaf_id in enumerate(cube.usaf_ids if usaf_ids is None else usaf_ids):
+            years = [
+                year
+                for year in range(cube.start_year, cube.end_year + 1)
+                if not cube.has_year(usaf_id, year)
+            ]
+            # all cached years of the station in one query
+            cached = _read_fresh_years_from_cache(
+                get_isd_hourly_temp_data_cache_key,
+                decode,
+                usaf_id,
+                years,
+                read_from_cache=read_from_cache,
+                fetch_from_web=fetch_from_web,
+            )
+            for year in years:
+                ts = cached.get(year)
+                if ts is None:
+                    try:
+                        ts = load_isd_hourly_temp_data_cached_proxy(
+                            usaf_id,
+                            year,
+                            read_from_cache=read_from_cache,
+                            write_to_cache=write_to_cache,
+                            fetch_from_web=fetch_from_web,
+                        )
+                    except ISDDataNotAvailableError:
+                        ts = None
+                    except FetchTransientError as e:
+                        logger.warning(
+                            "Skipping station {} in {}: {}".format(
+                                usaf_id, year, e.message
+                            )
+                        )
+                        cube.write(usaf_id, year, None, complete=False)
+                        continue
+                if ts is not None:
+                    n += 1
+                # missing data is only final if it could have been fetched
+                complete = year < current_year and (ts is not None or fetch_from_web)
+                cube.write(usaf_id, year, ts, complete=complete)
+            if i % 100 == 99:
+                # so a resumed build skips these stations
+                cube.flush()
+    finally:
+        # keep the stations written so far, e.g. if interrupted
+        cube.flush()
+    return n
+
+
 class ISDStation(object):
     """A representation of an Integrated Surface Database weather station.
 
@@ -1212,7 +2210,15 @@ class ISDStation(object):
         """Pull raw GSOD data for the given year directly from FTP."""
         return fetch_gsod_raw_temp_data(self.usaf_id, year)
 
+    def fetch_gsod_raw_temp_fields(self, year):
+        """Pull raw GSOD temperature fields for the given year directly from FTP."""
+        return fetch_gsod_raw_temp_fields(self.usaf_id, year)
+
     # fetch raw data then frequency-normalize
+    def fetch_isd_resampled_temp_data(self, year, freqs=("H", "D")):
+        """Pull raw ISD temperature data for the given year directly from FTP and resample to each of the given frequencies."""
+        return fetch_isd_resampled_temp_data(self.usaf_id, year, freqs=freqs)
+
     def fetch_isd_hourly_temp_data(self, year):
         """Pull raw ISD temperature data for the given year directly from FTP and resample to hourly time series."""
         return fetch_isd_hourly_temp_data(self.usaf_id, year)
@@ -1234,6 +2240,10 @@ class ISDStation(object):
         return fetch_cz2010_hourly_temp_data(self.usaf_id)
 
     # get key-value store key
+    def get_isd_raw_temp_data_cache_key(self, year):
+        """Get key used to cache parsed raw ISD temperature observations for the given year."""
+        return get_isd_raw_temp_data_cache_key(self.usaf_id, year)
+
     def get_isd_hourly_temp_data_cache_key(self, year):
         """Get key used to cache resampled hourly ISD temperature data for the given year."""
         return get_isd_hourly_temp_data_cache_key(self.usaf_id, year)
@@ -1255,6 +2265,10 @@ class ISDStation(object):
         return get_cz2010_hourly_temp_data_cache_key(self.usaf_id)
 
     # is cached data expired? boolean. true if expired or not in cache
+    def cached_isd_raw_temp_data_is_expired(self, year):
+        """Return True if cache of raw ISD temperature observations has expired or does not exist for the given year."""
+        return cached_isd_raw_temp_data_is_expired(self.usaf_id, year)
+
     def cached_isd_hourly_temp_data_is_expired(self, year):
         """Return True if cache of resampled hourly ISD temperature data has expired or does not exist for the given year."""
         return cached_isd_hourly_temp_data_is_expired(self.usaf_id, year)
@@ -1268,6 +2282,10 @@ class ISDStation(object):
         return cached_gsod_daily_temp_data_is_expired(self.usaf_id, year)
 
     # check if data is available and delete data in the cache if it's expired
+    def validate_isd_raw_temp_data_cache(self, year):
+        """Delete cached raw ISD temperature observations if they have expired for the given year."""
+        return validate_isd_raw_temp_data_cache(self.usaf_id, year)
+
     def validate_isd_hourly_temp_data_cache(self, year):
         """Delete cached resampled hourly ISD temperature data if it has expired for the given year."""
         return validate_isd_hourly_temp_data_cache(self.usaf_id, year)
@@ -1331,6 +2349,10 @@ class ISDStation(object):
         return deserialize_cz2010_hourly_temp_data(data)
 
     # return pandas time series of data from cache
+    def read_isd_raw_temp_data_from_cache(self, year):
+        """Get cached version of raw ISD temperature data for given year."""
+        return read_isd_raw_temp_data_from_cache(self.usaf_id, year)
+
     def read_isd_hourly_temp_data_from_cache(self, year):
         """Get cached version of resampled hourly ISD temperature data for given year."""
         return read_isd_hourly_temp_data_from_cache(self.usaf_id, year)
@@ -1351,6 +2373,14 @@ class ISDStation(object):
         """Get cached version of hourly TMY3 temperature data."""
         return read_cz2010_hourly_temp_data_from_cache(self.usaf_id)
 
+    def read_tmy3_hourly_temp_data_from_normals_archive(self):
+        """Get hourly TMY3 temperature data from the offline normals archive."""
+        return read_tmy3_hourly_temp_data_from_normals_archive(self.usaf_id)
+
+    def read_cz2010_hourly_temp_data_from_normals_archive(self):
+        """Get hourly CZ2010 temperature data from the offline normals archive."""
+        return read_cz2010_hourly_temp_data_from_normals_archive(self.usaf_id)
+
     # write pandas time series of data to cache for a particular year
     def write_isd_hourly_temp_data_to_cache(self, year, ts):
         """Write resampled hourly ISD temperature data to cache for given year."""
@@ -1373,6 +2403,10 @@ class ISDStation(object):
         return write_cz2010_hourly_temp_data_to_cache(self.usaf_id, ts)
 
     # delete cached data for a particular year
+    def destroy_cached_isd_raw_temp_data(self, year):
+        """Remove cached raw ISD temperature observations for given year."""
+        return destroy_cached_isd_raw_temp_data(self.usaf_id, year)
+
     def destroy_cached_isd_hourly_temp_data(self, year):
         """Remove cached resampled hourly ISD temperature data to cache for given year."""
         return destroy_cached_isd_hourly_temp_data(self.usaf_id, year)
@@ -1394,6 +2428,12 @@ class ISDStation(object):
         return destroy_cached_cz2010_hourly_temp_data(self.usaf_id)
 
     # load data either from cache if valid or directly from source
+    def load_isd_raw_temp_data_cached_proxy(self, year, fetch_from_web=True):
+        """Load raw ISD temperature data from cache, or if it is expired or hadn't been cached, fetch from FTP for given year."""
+        return load_isd_raw_temp_data_cached_proxy(
+            self.usaf_id, year, fetch_from_web=fetch_from_web
+        )
+
     def load_isd_hourly_temp_data_cached_proxy(self, year, fetch_from_web=True):
         """Load resampled hourly ISD temperature data from cache, or if it is expired or hadn't been cached, fetch from FTP for given year."""
         return load_isd_hourly_temp_data_cached_proxy(
@@ -1427,6 +2467,7 @@ class ISDStation(object):
         write_to_cache=True,
         fetch_from_web=True,
         error_on_missing_years=True,
+        use_raw_cache=False,
     ):
         """Load resampled hourly ISD temperature data from start date to end date (inclusive).
 
@@ -1444,6 +2485,8 @@ class ISDStation(object):
             Whether or not to fetch data from ftp.
         write_to_cache : bool
             Whether or not to write newly loaded data to cache.
+        use_raw_cache : bool
+            Whether or not to resample fetched years from cached raw observations.
         """
         return load_isd_hourly_temp_data(
             self.usaf_id,
@@ -1453,10 +2496,17 @@ class ISDStation(object):
             write_to_cache=write_to_cache,
             fetch_from_web=fetch_from_web,
             error_on_missing_years=error_on_missing_years,
+            use_raw_cache=use_raw_cache,
         )
 
     def load_isd_daily_temp_data(
-        self, start, end, read_from_cache=True, write_to_cache=True, fetch_from_web=True
+        self,
+        start,
+        end,
+        read_from_cache=True,
+        write_to_cache=True,
+        fetch_from_web=True,
+        use_raw_cache=False,
     ):
         """Load resampled daily ISD temperature data from start date to end date (inclusive).
 
@@ -1474,6 +2524,8 @@ class ISDStation(object):
             Whether or not to fetch data from ftp.
         write_to_cache : bool
             Whether or not to write newly loaded data to cache.
+        use_raw_cache : bool
+            Whether or not to resample fetched years from cached raw observations.
         """
         return load_isd_daily_temp_data(
             self.usaf_id,
@@ -1482,6 +2534,7 @@ class ISDStation(object):
             read_from_cache=read_from_cache,
             write_to_cache=write_to_cache,
             fetch_from_web=fetch_from_web,
+            use_raw_cache=use_raw_cache,
         )
 
     def load_gsod_daily_temp_data(
@@ -20,6 +20,7 @@
 from io import BytesIO
 import pkg_resources
 import re
+import tarfile
 import tempfile
 
 from eeweather.cache import KeyValueStore
@@ -62,6 +63,16 @@ def write_missing_gsod_file(bytes_string):
         bytes_string.write(f.read())
 
 
+def write_gsod_archive_file(bytes_string):
+    # yearly archive holding the GSOD fixture under two station ids
+    data = pkg_resources.resource_string("eeweather.resources", "GSOD.op.gz")
+    with tarfile.open(fileobj=bytes_string, mode="w") as archive:
+        for name in ["./722874-93134-2007.op.gz", "./722880-23152-2007.op.gz"]:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, BytesIO(data))
+
+
 def mock_request_text_tmy3(url):
     match_url = (
         "https://storage.googleapis.com/openeemeter-public-resources/"
@@ -92,10 +103,18 @@ class MockNOAAFTPConnectionProxy:
             write_gsod_file(bytes_string)
         elif re.match("/pub/data/gsod/2006/722874-93134-2006.op.gz", filename):
             write_missing_gsod_file(bytes_string)
+        elif re.match("/pub/data/gsod/2007/gsod_2007.tar", filename):
+            write_gsod_archive_file(bytes_string)
 
         bytes_string.seek(0)
         return bytes_string
 
+    def read_file_into(self, filename, stream, blocksize=8192):
+        bytes_string = self.read_file_as_bytes(filename)
+        for chunk in iter(lambda: bytes_string.read(blocksize), b""):
+            stream.write(chunk)
+        return True
+
 
 class MockKeyValueStoreProxy:
     def __init__(self):
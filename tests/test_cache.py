@@ -17,10 +17,29 @@
    limitations under the License.
 
 """
+import multiprocessing
+import os
+import sqlite3
 import tempfile
-from eeweather.cache import KeyValueStore, get_datetime_if_exists
-from datetime import datetime
+import threading
+from eeweather.cache import (
+    POSTGRES_COPY_ROWS,
+    KeyValueStore,
+    MemoryCache,
+    RetentionPolicy,
+    _copy_text,
+    _get_engine_options,
+    get_datetime_if_exists,
+)
+from eeweather.serialization import encode_series
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
 import pytz
+from sqlalchemy import event, create_engine, MetaData, Table, Column, String, DateTime
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import select
 
 import pytest
 
@@ -72,6 +91,537 @@ def test_key_value_store_clear_single_key(s):
     assert s.key_exists("b") is False
 
 
+def test_key_value_store_save_many(s):
+    s.save_json("a", "old")
+    s.save_many({"a": "new", "b": [1, 2], "c": b"\x00"})
+    assert s.retrieve_json("a") == "new"
+    assert s.retrieve_json("b") == [1, 2]
+    assert s.retrieve("c") == b"\x00"
+    assert s.key_updated("b").date() == datetime.utcnow().date()
+
+    # upserts replace the other column
+    s.save_many({"a": b"new", "c": [3]})
+    assert s.retrieve("a") == b"new"
+    assert s.retrieve("c") == [3]
+
+    # nothing to save
+    s.save_many({})
+    assert s.retrieve("a") == b"new"
+
+
+def test_key_value_store_bytes(s):
+    assert s.retrieve_bytes("a") is None
+    assert s.retrieve("a") is None
+
+    s.save_bytes("a", b"\x00\x01")
+    assert s.key_exists("a") is True
+    assert s.retrieve_bytes("a") == b"\x00\x01"
+    assert s.retrieve("a") == b"\x00\x01"
+    assert s.retrieve_json("a") is None
+    assert s.key_updated("a").date() == datetime.utcnow().date()
+
+    # overwrite with json and back
+    s.save_json("a", [1])
+    assert s.retrieve("a") == [1]
+    assert s.retrieve_bytes("a") is None
+    s.save_bytes("a", b"\x02")
+    assert s.retrieve("a") == b"\x02"
+
+
+def test_key_value_store_retrieve_with_updated(s):
+    assert s.retrieve_with_updated("a") == (None, None)
+
+    s.save_json("a", [1])
+    data, updated = s.retrieve_with_updated("a")
+    assert data == [1]
+    assert updated == s.key_updated("a")
+
+    s.save_bytes("a", b"\x00")
+    data, updated = s.retrieve_with_updated("a")
+    assert data == b"\x00"
+    assert updated.tzinfo is not None
+
+
+def test_key_value_store_save_many_single_statement(s):
+    statements = []
+    event.listen(
+        s.eng,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    s.save_many({str(i): [i] for i in range(100)})
+    inserts = [statement for statement in statements if "INSERT" in statement]
+    assert len(inserts) == 1
+    assert "ON CONFLICT" in inserts[0]
+
+
+def test_key_value_store_save_many_without_native_upsert(s, monkeypatch):
+    monkeypatch.setattr("eeweather.cache._DIALECT_INSERTS", {})
+    s.save_json("a", "old")
+    s.save_many({"a": "new", "b": b"\x00"})
+    assert s.retrieve("a") == "new"
+    assert s.retrieve("b") == b"\x00"
+
+
+def test_key_value_store_retrieve_many(s):
+    assert s.retrieve_many([]) == {}
+    assert s.retrieve_many(["a"]) == {}
+
+    s.save_many({"a": [1], "b": b"\x00"})
+    assert s.retrieve_many(["a", "b", "c"]) == {"a": [1], "b": b"\x00"}
+
+    data = s.retrieve_many_with_updated(["a", "c"])
+    assert list(data) == ["a"]
+    value, updated = data["a"]
+    assert value == [1]
+    assert updated == s.key_updated("a")
+
+
+def test_key_value_store_retrieve_many_chunks_keys(s):
+    s.save_many({str(i): i for i in range(1200)})
+    data = s.retrieve_many([str(i) for i in range(1300)])
+    assert len(data) == 1200
+    assert data["1199"] == 1199
+
+
+def test_key_value_store_retrieve_many_stale(s):
+    s.save_many({"a": [1], "b": b"\x00", "c": "c"})
+    _set_times(s, "a", datetime(2018, 1, 2, tzinfo=pytz.UTC))
+    _set_times(s, "b", datetime(2018, 1, 2, tzinfo=pytz.UTC))
+    statements = []
+    event.listen(
+        s.eng,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+
+    stale_range = (
+        datetime(2018, 1, 1, tzinfo=pytz.UTC),
+        datetime(2018, 2, 1, tzinfo=pytz.UTC),
+    )
+    data = s.retrieve_many_with_updated(
+        ["a", "b", "c", "d"],
+        stale={"a": stale_range, "c": stale_range, "d": stale_range},
+    )
+    assert len(statements) == 1
+    assert "CASE" in statements[0]
+    # stale values are not read, fresh ones are
+    assert data["a"] == (None, datetime(2018, 1, 2, tzinfo=pytz.UTC))
+    assert data["b"][0] == b"\x00"
+    assert data["c"][0] == "c"
+    assert "d" not in data
+
+
+def test_get_engine_options(monkeypatch):
+    assert _get_engine_options("sqlite://") == {}
+    assert _get_engine_options("postgresql://host/db") == {"pool_pre_ping": True}
+    monkeypatch.setenv("EEWEATHER_CACHE_POOL_SIZE", "20")
+    monkeypatch.setenv("EEWEATHER_CACHE_POOL_MAX_OVERFLOW", "5")
+    assert _get_engine_options("postgresql://host/db") == {
+        "pool_pre_ping": True,
+        "pool_size": 20,
+        "max_overflow": 5,
+    }
+    assert _get_engine_options("sqlite:///cache.db") == {}
+
+
+def test_key_value_store_engine_options():
+    url = "sqlite:///{}/cache.db".format(tempfile.mkdtemp())
+    s = KeyValueStore(url, engine_options={"pool_size": 2, "max_overflow": 0})
+    assert s.eng.pool.size() == 2
+    s.save_json("a", 1)
+    assert s.retrieve("a") == 1
+
+
+def test_copy_text():
+    assert _copy_text(None) == "\\N"
+    assert _copy_text(3) == "3"
+    assert _copy_text(b"\x00\xff") == "\\\\x00ff"
+    assert _copy_text('a\tb\nc\rd\\e"') == 'a\\tb\\nc\\rd\\\\e"'
+
+
+def test_key_value_store_adds_blob_column_to_existing_store():
+    url = "sqlite:///{}/cache.db".format(tempfile.mkdtemp())
+    eng = create_engine(url)
+    items = Table(
+        "items",
+        MetaData(),
+        Column("key", String, unique=True, index=True),
+        Column("data", String),
+        Column("updated", DateTime(timezone=True)),
+    )
+    items.create(bind=eng)
+    with eng.begin() as conn:
+        conn.execute(items.insert().values(key="a", data='["legacy"]'))
+
+    s = KeyValueStore(url)
+    assert s.retrieve("a") == ["legacy"]
+    s.save_bytes("b", b"\x00")
+    assert s.retrieve("b") == b"\x00"
+
+
+def test_memory_cache():
+    cache = MemoryCache(max_bytes=250)
+    assert repr(cache) == "MemoryCache(max_bytes=250)"
+    assert cache.get("a") is None
+    assert cache.misses == 1
+
+    cache.put("a", np.zeros(10))  # 80 bytes
+    cache.put("b", np.zeros(10))
+    assert len(cache) == 2
+    assert cache.nbytes == 160
+    assert cache.get("a").shape == (10,)
+    assert cache.hits == 1
+
+    # least recently used "b" is evicted
+    cache.put("c", np.zeros(10))
+    cache.put("d", np.zeros(10))
+    assert "b" not in cache
+    assert "a" in cache
+    assert cache.nbytes == 240
+
+    # replacing a key does not double count it
+    cache.put("a", np.zeros(5))
+    assert cache.nbytes == 200
+
+    # too large to cache at all
+    cache.put("e", np.zeros(100))
+    assert "e" not in cache
+
+    cache.invalidate("a")
+    assert "a" not in cache
+    assert cache.nbytes == 160
+    cache.invalidate()
+    assert len(cache) == 0
+    assert cache.nbytes == 0
+
+
+def test_memory_cache_sizes_pandas_objects():
+    cache = MemoryCache(max_bytes=10**6)
+    ts = pd.Series(
+        np.zeros(24), index=pd.date_range("2018-01-01", periods=24, freq="H")
+    )
+    cache.put("a", (ts, None))
+    assert cache.nbytes >= 24 * 16
+
+
+def test_key_value_store_memory_cache_invalidation(s):
+    s.memory_cache = MemoryCache(max_bytes=10**6)
+    s.memory_cache.put("a", "decoded")
+    s.memory_cache.put("b", "decoded")
+    s.memory_cache.put("c", "decoded")
+
+    s.save_json("a", [1])
+    assert "a" not in s.memory_cache
+    s.save_many({"b": b"\x00"})
+    assert "b" not in s.memory_cache
+    s.clear("c")
+    assert "c" not in s.memory_cache
+
+    s.memory_cache.put("a", "decoded")
+    s.clear()
+    assert len(s.memory_cache) == 0
+
+
+def test_key_value_store_memory_cache_from_environment(monkeypatch):
+    url = "sqlite:///{}/cache.db".format(tempfile.mkdtemp())
+    assert KeyValueStore(url).memory_cache is None
+
+    monkeypatch.setenv("EEWEATHER_MEMORY_CACHE_BYTES", "1000")
+    assert KeyValueStore(url).memory_cache.max_bytes == 1000
+
+    monkeypatch.setenv("EEWEATHER_MEMORY_CACHE_BYTES", "0")
+    assert KeyValueStore(url).memory_cache is None
+
+
+def test_key_value_store_sqlite_pragmas(s):
+    with s.eng.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 30000
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+
+
+def test_key_value_store_in_memory_sqlite():
+    s = KeyValueStore("sqlite://")
+    s.save_json("a", [1])
+    assert s.retrieve("a") == [1]
+
+
+def _fail_inserts(s, n, message="database is locked"):
+    failures = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        if "INSERT" in statement and len(failures) < n:
+            failures.append(statement)
+            raise sqlite3.OperationalError(message)
+
+    event.listen(s.eng, "before_cursor_execute", before_cursor_execute)
+    return failures
+
+
+def test_key_value_store_retries_locked_writes(s, monkeypatch):
+    monkeypatch.setattr("eeweather.cache.WRITE_RETRY_DELAY", 0)
+    failures = _fail_inserts(s, 4)
+    s.save_json("a", [1])
+    assert len(failures) == 4
+    assert s.retrieve("a") == [1]
+
+
+def test_key_value_store_retries_are_bounded(s, monkeypatch):
+    monkeypatch.setattr("eeweather.cache.WRITE_RETRY_DELAY", 0)
+    failures = _fail_inserts(s, 10)
+    with pytest.raises(OperationalError):
+        s.save_json("a", [1])
+    assert len(failures) == 5
+    assert s.key_exists("a") is False
+
+
+def test_key_value_store_does_not_retry_other_errors(s, monkeypatch):
+    monkeypatch.setattr("eeweather.cache.WRITE_RETRY_DELAY", 0)
+    failures = _fail_inserts(s, 10, message="disk I/O error")
+    with pytest.raises(OperationalError):
+        s.save_json("a", [1])
+    assert len(failures) == 1
+
+
+def _stress_worker(s, worker, n_keys=50):
+    for i in range(n_keys):
+        s.save_json("{}-{}".format(worker, i), [worker, i])
+        assert s.retrieve("{}-{}".format(worker, i)) == [worker, i]
+    s.save_many({"{}-many-{}".format(worker, i): b"\x00" for i in range(n_keys)})
+    s.save_json("shared", worker)
+    s.retrieve_many(["shared"] + ["{}-{}".format(worker, i) for i in range(n_keys)])
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_key_value_store_concurrent_processes(s):
+    # the parent's pooled connection must not be reused by the children
+    s.save_json("parent", True)
+
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_stress_worker, args=(s, i)) for i in range(6)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+    assert [process.exitcode for process in processes] == [0] * 6
+
+    assert s.retrieve("parent") is True
+    assert s.retrieve("shared") in range(6)
+    keys = ["{}-{}".format(w, i) for w in range(6) for i in range(50)]
+    assert len(s.retrieve_many(keys)) == 300
+    many_keys = ["{}-many-{}".format(w, i) for w in range(6) for i in range(50)]
+    assert len(s.retrieve_many(many_keys)) == 300
+
+
+def test_key_value_store_concurrent_threads(s):
+    errors = []
+
+    def run(worker):
+        try:
+            _stress_worker(s, worker, n_keys=20)
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    keys = ["{}-{}".format(w, i) for w in range(6) for i in range(20)]
+    assert len(s.retrieve_many(keys)) == 120
+
+
+def _set_times(s, key, updated, accessed=None):
+    with s.eng.begin() as conn:
+        conn.execute(
+            s.items.update()
+            .where(s.items.c.key == key)
+            .values(updated=updated, accessed=accessed)
+        )
+
+
+def test_key_value_store_stats(s):
+    s.record_accesses = True
+    assert s.stats() == []
+
+    s.save_many({"isd-hourly-1-2007": b"\x00" * 10, "isd-hourly-2-2007": [1, 2]})
+    s.save_json("tmy3-hourly-1", "abc")
+    s.retrieve("isd-hourly-1-2007")
+    s.retrieve_json("isd-hourly-3-2007")
+    s.retrieve_many(["isd-hourly-2-2007", "tmy3-hourly-2"])
+
+    stats = s.stats()
+    assert stats == [
+        {
+            "prefix": "isd-hourly",
+            "rows": 2,
+            "bytes": 15,
+            "hits": 2,
+            "misses": 1,
+            "hit_ratio": 2 / 3,
+        },
+        {
+            "prefix": "tmy3-hourly",
+            "rows": 1,
+            "bytes": 5,
+            "hits": 0,
+            "misses": 1,
+            "hit_ratio": 0.0,
+        },
+    ]
+
+    # counts accumulate across flushes
+    s.retrieve_bytes("isd-hourly-1-2007")
+    assert s.stats()[0]["hits"] == 3
+
+
+def test_key_value_store_access_log_flushes_in_batches(s, monkeypatch):
+    s.record_accesses = True
+    monkeypatch.setattr("eeweather.cache.ACCESS_FLUSH_SIZE", 2)
+    s.save_json("a-b-1", 1)
+    s.save_json("a-b-2", 2)
+    s.retrieve("a-b-1")
+    with Session(s.eng) as session:
+        assert session.execute(select(s.items.c.accessed)).scalars().all() == [
+            None,
+            None,
+        ]
+    s.retrieve("a-b-2")
+    with Session(s.eng) as session:
+        accessed = session.execute(select(s.items.c.accessed)).scalars().all()
+    assert all(dt is not None for dt in accessed)
+    assert s._n_pending == 0
+
+
+def test_key_value_store_reads_do_not_write_by_default(tmp_path, monkeypatch):
+    monkeypatch.delenv("EEWEATHER_CACHE_RECORD_ACCESSES", raising=False)
+    s = KeyValueStore("sqlite:///{}/cache.db".format(tmp_path))
+    s.save_many({"a-b-1": 1, "a-b-2": b"\x02"})
+    s.eng.dispose()
+
+    # e.g. a cache shared read-only
+    s = KeyValueStore("sqlite:///file:{}/cache.db?mode=ro&uri=true".format(tmp_path))
+    assert s.record_accesses is False
+    monkeypatch.setattr("eeweather.cache.ACCESS_FLUSH_SIZE", 1)
+    statements = []
+    event.listen(
+        s.eng,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    assert s.retrieve("a-b-1") == 1
+    assert s.retrieve_many(["a-b-2", "a-b-3"]) == {"a-b-2": b"\x02"}
+    s.flush_accesses()
+    assert all(statement.lstrip().startswith("SELECT") for statement in statements)
+    assert [row["hit_ratio"] for row in s.stats()] == [None]
+
+
+def test_key_value_store_record_accesses_from_environment(monkeypatch):
+    url = "sqlite:///{}/cache.db".format(tempfile.mkdtemp())
+    monkeypatch.delenv("EEWEATHER_CACHE_RECORD_ACCESSES", raising=False)
+    assert KeyValueStore(url).record_accesses is False
+    monkeypatch.setenv("EEWEATHER_CACHE_RECORD_ACCESSES", "1")
+    assert KeyValueStore(url).record_accesses is True
+    monkeypatch.setenv("EEWEATHER_CACHE_RECORD_ACCESSES", "0")
+    assert KeyValueStore(url).record_accesses is False
+
+
+def test_key_value_store_gc_prefix_quota_least_recently_used(s):
+    s.record_accesses = True
+    s.save_many({"isd-hourly-{}-2007".format(i): b"\x00" * 10 for i in range(4)})
+    s.save_json("tmy3-hourly-1", "x" * 100)
+    for i in range(4):
+        _set_times(
+            s,
+            "isd-hourly-{}-2007".format(i),
+            updated=datetime(2018, 1, 1, tzinfo=pytz.UTC),
+            accessed=datetime(2018, 1, 1 + i, tzinfo=pytz.UTC),
+        )
+    # just read, so most recently used
+    s.retrieve("isd-hourly-0-2007")
+
+    result = s.gc(RetentionPolicy(prefix_max_bytes={"isd-hourly-*": 25}))
+    assert result == {"rows": 2, "bytes": 20}
+    remaining = s.retrieve_many(
+        ["isd-hourly-{}-2007".format(i) for i in range(4)] + ["tmy3-hourly-1"]
+    )
+    assert sorted(remaining) == [
+        "isd-hourly-0-2007",
+        "isd-hourly-3-2007",
+        "tmy3-hourly-1",
+    ]
+
+
+def test_key_value_store_gc_max_bytes_and_max_age(s):
+    s.save_many({"a-b-{}".format(i): b"\x00" * 10 for i in range(5)})
+    for i in range(5):
+        _set_times(s, "a-b-{}".format(i), datetime(2018, 1, 1 + i, tzinfo=pytz.UTC))
+
+    # nothing to do
+    assert s.gc(RetentionPolicy()) == {"rows": 0, "bytes": 0}
+
+    result = s.gc(RetentionPolicy(max_bytes=30))
+    assert result == {"rows": 2, "bytes": 20}
+    assert sorted(s.retrieve_many(["a-b-{}".format(i) for i in range(5)])) == [
+        "a-b-2",
+        "a-b-3",
+        "a-b-4",
+    ]
+
+    s.save_json("a-b-5", "new")
+    result = s.gc(RetentionPolicy(max_age=timedelta(days=1)))
+    assert result["rows"] == 3
+    assert s.key_exists("a-b-5") is True
+
+
+def test_key_value_store_gc_invalidates_memory_cache(s):
+    s.memory_cache = MemoryCache(max_bytes=10**6)
+    s.save_json("a-b-1", 1)
+    s.memory_cache.put("a-b-1", "decoded")
+    s.gc(RetentionPolicy(max_bytes=0))
+    assert "a-b-1" not in s.memory_cache
+
+
+def test_retention_policy_repr():
+    policy = RetentionPolicy(max_bytes=10, prefix_max_bytes={"isd-*": 5})
+    assert repr(policy) == (
+        "RetentionPolicy(max_bytes=10, max_age=None, prefix_max_bytes={'isd-*': 5})"
+    )
+
+
+def test_key_value_store_compact(s):
+    s.save_many({"a-b-{}".format(i): b"\x00" * 100000 for i in range(20)})
+    s.gc(RetentionPolicy(max_bytes=100000))
+
+    before, after = s.compact(pages=1)
+    assert after == before - 4096
+    before, after = s.compact()
+    assert after < 300000
+    assert len(s.retrieve_many(["a-b-{}".format(i) for i in range(20)])) == 1
+
+
+def test_key_value_store_compact_converts_legacy_database():
+    directory = tempfile.mkdtemp()
+    conn = sqlite3.connect("{}/cache.db".format(directory))
+    conn.execute("CREATE TABLE filler (x BLOB)")
+    conn.executemany(
+        "INSERT INTO filler VALUES (?)", [(b"\x00" * 100000,) for _ in range(10)]
+    )
+    conn.execute("DELETE FROM filler")
+    conn.commit()
+    conn.close()
+
+    s = KeyValueStore("sqlite:///{}/cache.db".format(directory))
+    with s.eng.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 0
+    before, after = s.compact()
+    assert after < before
+    with s.eng.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2
+
+
 def test_get_datetime_if_exists(s):
     data = None
     result = get_datetime_if_exists(data)
@@ -84,3 +634,208 @@ def test_get_datetime_if_exists(s):
     data = [pytz.utc.localize(datetime(2018, 1, 1))]
     result = get_datetime_if_exists(data)
     assert result == pytz.utc.localize(datetime(2018, 1, 1))
+
+
+def _observation_count(s):
+    with Session(s.eng) as session:
+        return len(session.execute(select(s.observations.c.timestamp)).all())
+
+
+def test_key_value_store_observations():
+    s = KeyValueStore(
+        "sqlite:///{}/cache.db".format(tempfile.mkdtemp()), store_observations=True
+    )
+    index = pd.date_range("2007-01-01", periods=48, freq="H", tz="UTC")
+    ts = pd.Series(np.arange(48, dtype=float), index=index)
+    ts.iloc[5] = np.nan
+    s.save_many(
+        {
+            "isd-hourly-722874-2007": encode_series(ts, "H"),
+            "isd-hourly-722874-2006": encode_series(ts.iloc[:0], "H"),
+            "a": {"b": 1},
+        }
+    )
+    # missing values are left out
+    assert _observation_count(s) == 47
+
+    keys = ["isd-hourly-722874-2006", "isd-hourly-722874-2007"]
+    start = datetime(2006, 12, 31, 12, 30, tzinfo=pytz.UTC)
+    end = datetime(2007, 1, 1, 6, 59, tzinfo=pytz.UTC)
+    observed = s.retrieve_observations(keys, start, end)
+    pd.testing.assert_series_equal(
+        observed, ts[start:end].dropna(), check_freq=False, check_names=False
+    )
+
+    # replaced rather than added to
+    s.save_bytes("isd-hourly-722874-2007", encode_series(ts.iloc[:10] + 1, "H"))
+    assert _observation_count(s) == 9
+    assert s.retrieve_observations(keys, start, end).iloc[0] == 1.0
+
+    # gone with their value
+    s.clear("isd-hourly-722874-2007")
+    assert _observation_count(s) == 0
+    assert s.retrieve_observations(keys, start, end) is None
+
+
+def test_key_value_store_retrieve_observations_none():
+    s = KeyValueStore(
+        "sqlite:///{}/cache.db".format(tempfile.mkdtemp()), store_observations=True
+    )
+    index = pd.date_range("2007-01-01", periods=24, freq="H", tz="UTC")
+    data = encode_series(pd.Series(np.ones(24), index=index), "H")
+    s.save_many({"isd-hourly-722874-2007": data, "isd-hourly-722880-2007": data})
+    start = datetime(2007, 1, 1, tzinfo=pytz.UTC)
+    end = datetime(2007, 1, 2, tzinfo=pytz.UTC)
+    assert len(s.retrieve_observations(["isd-hourly-722874-2007"], start, end)) == 24
+
+    # missing or other keys, or several series
+    assert s.retrieve_observations(["isd-hourly-722874-2008"], start, end) is None
+    assert s.retrieve_observations(["a"], start, end) is None
+    assert s.retrieve_observations([], start, end) is None
+    assert (
+        s.retrieve_observations(
+            ["isd-hourly-722874-2007", "isd-hourly-722880-2007"], start, end
+        )
+        is None
+    )
+
+    # stale
+    stale = {
+        "isd-hourly-722874-2007": (
+            datetime(2000, 1, 1, tzinfo=pytz.UTC),
+            datetime(3000, 1, 1, tzinfo=pytz.UTC),
+        )
+    }
+    assert (
+        s.retrieve_observations(["isd-hourly-722874-2007"], start, end, stale=stale)
+        is None
+    )
+
+    # saved without observations
+    s.store_observations = False
+    s.save_bytes("isd-hourly-722874-2007", data)
+    assert s.retrieve_observations(["isd-hourly-722874-2007"], start, end) is None
+    with Session(s.eng) as session:
+        query = select(s.items.c.n_observations)
+        assert session.execute(query).scalars().all() == [None, 24]
+
+
+def test_key_value_store_observations_from_environment(monkeypatch):
+    url = "sqlite:///{}/cache.db".format(tempfile.mkdtemp())
+    monkeypatch.delenv("EEWEATHER_CACHE_OBSERVATIONS", raising=False)
+    assert KeyValueStore(url).store_observations is False
+    monkeypatch.setenv("EEWEATHER_CACHE_OBSERVATIONS", "1")
+    assert KeyValueStore(url).store_observations is True
+    monkeypatch.setenv("EEWEATHER_CACHE_OBSERVATIONS", "0")
+    assert KeyValueStore(url).store_observations is False
+
+
+def test_key_value_store_gc_removes_observations():
+    s = KeyValueStore(
+        "sqlite:///{}/cache.db".format(tempfile.mkdtemp()), store_observations=True
+    )
+    index = pd.date_range("2007-01-01", periods=24, freq="H", tz="UTC")
+    s.save_bytes(
+        "isd-hourly-722874-2007",
+        encode_series(pd.Series(np.ones(24), index=index), "H"),
+    )
+    assert _observation_count(s) == 24
+    assert s.gc(RetentionPolicy(max_bytes=0))["rows"] == 1
+    assert _observation_count(s) == 0
+
+
+@pytest.fixture
+def pg():
+    # e.g. postgresql://postgres@localhost/eeweather_test; the cache tables of
+    # this database are cleared
+    url = os.environ.get("EEWEATHER_TEST_POSTGRES_URL")
+    if url is None:
+        pytest.skip("EEWEATHER_TEST_POSTGRES_URL is not set")
+    s = KeyValueStore(url)
+    s.clear()
+    yield s
+    s.clear()
+    s.eng.dispose()
+
+
+def test_postgres_key_value_store(pg):
+    assert pg.eng.dialect.name == "postgresql"
+    pg.save_json("a", {"b": [1, "two"]})
+    pg.save_bytes("c", b"\x00\xff")
+    assert pg.retrieve_many(["a", "c", "d"]) == {
+        "a": {"b": [1, "two"]},
+        "c": b"\x00\xff",
+    }
+    pg.save_json("c", "replaced")
+    assert pg.retrieve("c") == "replaced"
+    assert pg.retrieve_bytes("c") is None
+    assert pg.key_updated("a").tzinfo is not None
+
+
+def test_postgres_key_value_store_save_many_with_copy(pg):
+    statements = []
+    event.listen(
+        pg.eng,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    pg.save_json("k-0", "old")
+    items = {
+        "k-{}".format(i): b"\x00\\\t\n" * i if i % 2 else 'a\tb\n\\"{}'.format(i)
+        for i in range(POSTGRES_COPY_ROWS)
+    }
+    statements.clear()
+    pg.save_many(items)
+    assert any("items_load" in statement for statement in statements)
+    assert pg.retrieve_many(items) == items
+
+    # small batches are upserted directly
+    statements.clear()
+    pg.save_many({"k-1": "new"})
+    assert not any("items_load" in statement for statement in statements)
+    assert pg.retrieve("k-1") == "new"
+
+
+def test_postgres_key_value_store_stale(pg):
+    pg.save_many({"a": b"\x00", "b": b"\x01"})
+    _set_times(pg, "a", datetime(2018, 1, 2, tzinfo=pytz.UTC))
+    stale_range = (
+        datetime(2018, 1, 1, tzinfo=pytz.UTC),
+        datetime(2018, 2, 1, tzinfo=pytz.UTC),
+    )
+    data = pg.retrieve_many_with_updated(
+        ["a", "b"], stale={"a": stale_range, "b": stale_range}
+    )
+    assert data["a"] == (None, datetime(2018, 1, 2, tzinfo=pytz.UTC))
+    assert data["b"][0] == b"\x01"
+
+
+def test_postgres_key_value_store_stats_gc_compact(pg):
+    pg.record_accesses = True
+    pg.save_many({"a-b-{}".format(i): b"\x00" * 10 for i in range(3)})
+    pg.retrieve_many(["a-b-0", "a-b-9"])
+    stats = {row["prefix"]: row for row in pg.stats()}
+    assert stats["a-b"]["rows"] == 3
+    assert stats["a-b"]["hits"] >= 1
+    assert pg.gc(RetentionPolicy(max_bytes=10)) == {"rows": 2, "bytes": 20}
+    before, after = pg.compact()
+    assert before is not None and after is not None
+
+
+def test_postgres_key_value_store_observations(pg):
+    pg.store_observations = True
+    index = pd.date_range("2007-01-01", periods=24 * 10, freq="H", tz="UTC")
+    ts = pd.Series(np.arange(240, dtype=float), index=index)
+    items = {
+        "isd-hourly-{}-2007".format(i): encode_series(ts, "H")
+        for i in range(POSTGRES_COPY_ROWS)
+    }
+    pg.save_many(items)
+    start = datetime(2007, 1, 2, tzinfo=pytz.UTC)
+    end = datetime(2007, 1, 3, tzinfo=pytz.UTC)
+    observed = pg.retrieve_observations(["isd-hourly-7-2007"], start, end)
+    pd.testing.assert_series_equal(
+        observed, ts[start:end], check_freq=False, check_names=False
+    )
+    pg.clear()
+    assert _observation_count(pg) == 0
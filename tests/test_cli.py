@@ -17,8 +17,11 @@
    limitations under the License.
 
 """
+from datetime import timedelta
 import json
+import pkg_resources
 from click.testing import CliRunner
+import pytest
 
 
 from eeweather.cli import (
@@ -27,7 +30,23 @@ from eeweather.cli import (
     inspect_isd_file_years,
     inspect_isd_filenames,
     inspect_gsod_filenames,
+    ingest_gsod_archive,
+    build_normals_archive,
+    build_weather_cube,
+    _parse_age,
+    _parse_size,
 )
+from eeweather.testing import MockKeyValueStoreProxy, write_gsod_archive_file
+
+
+@pytest.fixture
+def monkeypatch_key_value_store(monkeypatch):
+    key_value_store_proxy = MockKeyValueStoreProxy()
+    monkeypatch.setattr(
+        "eeweather.connections.key_value_store_proxy", key_value_store_proxy
+    )
+
+    return key_value_store_proxy.get_store()
 
 
 def test_eeweather_cli():
@@ -131,3 +150,97 @@ def test_inspect_gsod_filenames_unrecognized():
     runner = CliRunner()
     result = runner.invoke(inspect_gsod_filenames, ["INVALID", "2017"])
     assert result.exit_code == 1
+
+
+def test_ingest_gsod_archive(monkeypatch_key_value_store, tmp_path):
+    path = tmp_path / "gsod_2007.tar"
+    with open(path, "wb") as f:
+        write_gsod_archive_file(f)
+
+    runner = CliRunner()
+    result = runner.invoke(
+        ingest_gsod_archive, ["2007", "--source", str(path), "--usaf-id", "722874"]
+    )
+    assert result.exit_code == 0
+    assert result.output == "Ingested GSOD data for 1 stations.\n"
+    assert monkeypatch_key_value_store.key_exists("gsod-daily-722874-2007")
+
+
+def test_build_normals_archive(tmp_path):
+    with open(tmp_path / "722880TYA.CSV", "wb") as f:
+        f.write(pkg_resources.resource_string("eeweather.resources", "722880TYA.CSV"))
+    path = str(tmp_path / "normals.npy")
+
+    runner = CliRunner()
+    result = runner.invoke(
+        build_normals_archive,
+        [path, "--csv-directory", str(tmp_path), "--usaf-id", "722880"],
+    )
+    assert result.exit_code == 0
+    assert result.output == "Wrote 1 normal-year series to {}.\n".format(path)
+
+
+def test_build_weather_cube(monkeypatch_key_value_store, tmp_path):
+    path = str(tmp_path / "cube")
+    runner = CliRunner()
+    result = runner.invoke(build_weather_cube, [path, "--usaf-id", "722874"])
+    assert result.exit_code == 2
+    assert "start_year and end_year are required" in result.output
+
+    result = runner.invoke(
+        build_weather_cube,
+        [path, "--start-year", "2006", "--end-year", "2007"]
+        + ["--usaf-id", "722874", "--no-fetch"],
+    )
+    assert result.exit_code == 0
+    assert result.output == "Wrote 0 station years to {}.\n".format(path)
+
+
+def test_cache_stats(monkeypatch_key_value_store):
+    store = monkeypatch_key_value_store
+    store.record_accesses = True
+    store.save_many({"isd-hourly-1-2007": b"\x00" * 10, "tmy3-hourly-1": b"\x00"})
+    store.retrieve("isd-hourly-1-2007")
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ["cache", "stats"])
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [
+        "prefix                 rows            bytes  hit ratio",
+        "isd-hourly                1               10     100.0%",
+        "tmy3-hourly               1                1          -",
+        "total                     2               11",
+    ]
+
+
+def test_cache_gc(monkeypatch_key_value_store):
+    store = monkeypatch_key_value_store
+    store.save_many({"isd-hourly-{}-2007".format(i): b"\x00" * 10 for i in range(3)})
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli, ["cache", "gc", "--prefix-max-bytes", "isd-hourly-*=10", "--compact"]
+    )
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    assert lines[0] == "Removed 2 entries (20 bytes)."
+    assert lines[1].startswith("Compacted cache from ")
+
+    result = runner.invoke(cli, ["cache", "gc", "--prefix-max-bytes", "10"])
+    assert result.exit_code == 2
+
+
+def test_cache_compact(monkeypatch_key_value_store):
+    runner = CliRunner()
+    result = runner.invoke(cli, ["cache", "compact", "--pages", "10"])
+    assert result.exit_code == 0
+    assert result.output.startswith("Compacted cache from ")
+
+
+def test_parse_size_and_age():
+    assert _parse_size("512") == 512
+    assert _parse_size("5G") == 5 * 1024**3
+    assert _parse_size("1.5kb") == 1536
+    assert _parse_age("30") == timedelta(days=30)
+    assert _parse_age("12h") == timedelta(hours=12)
+    assert _parse_age("365d") == timedelta(days=365)
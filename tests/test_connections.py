@@ -0,0 +1,653 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+   Copyright 2018-2023 OpenEEmeter contributors
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+import ftplib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import eeweather.connections
+
+from eeweather.exceptions import (
+    CircuitOpenError,
+    FetchError,
+    FetchNotFoundError,
+    FetchTransientError,
+)
+from eeweather.retry import RetryPolicy
+from eeweather.connections import (
+    NOAAConnectionProxy,
+    NOAAFTPConnectionProxy,
+    NOAAHTTPConnectionProxy,
+    NOAAMirrorConnectionProxy,
+    get_noaa_connection_proxy,
+)
+from eeweather.stations import (
+    fetch_gsod_daily_temp_data,
+    fetch_hourly_normalized_temp_data,
+    fetch_isd_hourly_temp_data,
+)
+from eeweather.testing import (
+    MockNOAAFTPConnectionProxy,
+    write_gsod_file,
+    write_isd_file,
+    write_tmy3_file,
+)
+
+
+@pytest.fixture(autouse=True)
+def retry_policy(monkeypatch):
+    # retry without waiting, and without failures of other tests
+    policy = RetryPolicy(base_delay=0)
+    monkeypatch.setattr("eeweather.retry._retry_policy", policy)
+    return policy
+
+
+class FakeFTP(object):
+    def __init__(self, server):
+        self.server = server
+        self.closed = False
+        self.broken = False
+
+    def retrbinary(self, command, callback):
+        with self.server.lock:
+            self.server.retrs += 1
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        try:
+            time.sleep(0.01)
+            if self.broken:
+                callback(b"partial")
+                raise EOFError("connection lost")
+            filename = command.split(" ", 1)[1]
+            if filename in self.server.replies:
+                raise ftplib.error_perm(self.server.replies[filename])
+            if filename not in self.server.files:
+                raise ftplib.error_perm("550 {}: No such file".format(filename))
+            callback(self.server.files[filename])
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    def voidcmd(self, command):
+        self.server.noops += 1
+        if self.broken:
+            raise EOFError("connection lost")
+        return "200 NOOP command successful"
+
+    def quit(self):
+        self.close()
+
+    def close(self):
+        self.closed = True
+
+
+class FakeFTPServer(object):
+    def __init__(self, files):
+        self.files = files
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.noops = 0
+        self.retrs = 0
+        self.connections = []
+        # permanent error replies to RETR by filename
+        self.replies = {}
+
+    def connect(self):
+        with self.lock:
+            ftp = FakeFTP(self)
+            self.connections.append(ftp)
+        return ftp
+
+
+@pytest.fixture
+def server():
+    return FakeFTPServer({"/pub/a.gz": b"a" * 10, "/pub/b.gz": b"b" * 20})
+
+
+def test_noaa_ftp_connection_proxy_read_file_as_bytes(server):
+    proxy = NOAAFTPConnectionProxy(pool_size=2, connect=server.connect)
+    assert proxy.read_file_as_bytes("/pub/a.gz").read() == b"a" * 10
+    assert proxy.read_file_as_bytes("/pub/b.gz").read() == b"b" * 20
+    # the connection was reused
+    assert len(server.connections) == 1
+    # missing files are not retried, and don't cost the connection
+    assert proxy.read_file_as_bytes("/pub/missing.gz") is None
+    assert server.retrs == 3
+    assert len(server.connections) == 1
+
+
+def test_noaa_ftp_connection_proxy_concurrent_reads(server):
+    proxy = NOAAFTPConnectionProxy(pool_size=3, connect=server.connect)
+    results = []
+
+    def read(filename):
+        results.append(proxy.read_file_as_bytes(filename).read())
+
+    threads = [
+        threading.Thread(target=read, args=("/pub/{}.gz".format("ab"[i % 2]),))
+        for i in range(30)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [b"a" * 10] * 15 + [b"b" * 20] * 15
+    # downloads ran in parallel on at most pool_size connections
+    assert 1 < server.max_active <= 3
+    assert len(server.connections) <= 3
+
+
+def test_noaa_ftp_connection_proxy_reconnects_broken_connections(server):
+    proxy = NOAAFTPConnectionProxy(pool_size=1, connect=server.connect)
+    proxy.read_file_as_bytes("/pub/a.gz")
+    server.connections[0].broken = True
+
+    # partial data of the failed attempt is discarded
+    assert proxy.read_file_as_bytes("/pub/b.gz").read() == b"b" * 20
+    assert server.connections[0].closed is True
+    assert len(server.connections) == 2
+
+
+def test_noaa_ftp_connection_proxy_read_file_into(server):
+    class Stream(object):
+        def __init__(self):
+            self.chunks = []
+
+        def write(self, chunk):
+            self.chunks.append(chunk)
+
+        def reset(self):
+            self.chunks = []
+
+    proxy = NOAAFTPConnectionProxy(pool_size=1, connect=server.connect)
+    proxy.read_file_as_bytes("/pub/a.gz")
+    server.connections[0].broken = True
+    stream = Stream()
+    assert proxy.read_file_into("/pub/a.gz", stream) is True
+    assert stream.chunks == [b"a" * 10]
+    assert proxy.read_file_into("/pub/missing.gz", stream) is False
+
+
+def test_noaa_ftp_connection_proxy_idle_connections(server):
+    proxy = NOAAFTPConnectionProxy(
+        pool_size=1, idle_timeout=0.05, health_check_interval=0, connect=server.connect
+    )
+    proxy.read_file_as_bytes("/pub/a.gz")
+
+    # checked before reuse
+    proxy.read_file_as_bytes("/pub/a.gz")
+    assert server.noops == 1
+    assert len(server.connections) == 1
+
+    # replaced if the check fails
+    server.connections[0].broken = True
+    proxy.read_file_as_bytes("/pub/a.gz")
+    assert server.connections[0].closed is True
+    assert len(server.connections) == 2
+
+    # closed once idle for too long
+    time.sleep(0.1)
+    proxy.read_file_as_bytes("/pub/a.gz")
+    assert server.connections[1].closed is True
+    assert len(server.connections) == 3
+
+    proxy.close()
+    assert server.connections[2].closed is True
+
+
+def test_noaa_ftp_connection_proxy_connection(server):
+    proxy = NOAAFTPConnectionProxy(pool_size=1, connect=server.connect)
+    with proxy.connection() as ftp:
+        assert ftp is server.connections[0]
+    with pytest.raises(EOFError):
+        with proxy.connection() as ftp:
+            raise EOFError("connection lost")
+    # closed rather than returned, and its slot freed
+    assert ftp.closed is True
+    with proxy.connection() as ftp:
+        assert ftp is server.connections[1]
+
+
+def test_noaa_ftp_connection_proxy_failed_connect_frees_slot(retry_policy):
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        raise FetchTransientError("ftp://ftp.ncei.noaa.gov", "timed out")
+
+    proxy = NOAAFTPConnectionProxy(pool_size=1, connect=connect)
+    with pytest.raises(FetchTransientError):
+        proxy.read_file_as_bytes("/pub/a.gz")
+    assert len(attempts) == retry_policy.attempts
+    with pytest.raises(FetchTransientError):
+        proxy.read_file_as_bytes("/pub/a.gz")
+
+
+def test_noaa_ftp_connection_proxy_gives_up_on_broken_connections(server):
+    def connect():
+        ftp = server.connect()
+        ftp.broken = True
+        return ftp
+
+    policy = RetryPolicy(base_delay=0, attempts=3, failure_threshold=4)
+    proxy = NOAAFTPConnectionProxy(pool_size=1, connect=connect, policy=policy)
+    with pytest.raises(FetchTransientError) as excinfo:
+        proxy.read_file_as_bytes("/pub/a.gz")
+    assert excinfo.value.url == "ftp://ftp.ncei.noaa.gov/pub/a.gz"
+    assert len(server.connections) == 3
+    assert all(ftp.closed for ftp in server.connections)
+
+
+def test_noaa_ftp_connection_proxy_permanent_errors(server, retry_policy):
+    proxy = NOAAFTPConnectionProxy(pool_size=1, connect=server.connect)
+    server.replies["/pub/a.gz"] = "501 Syntax error in parameters or arguments"
+    with pytest.raises(FetchError) as excinfo:
+        proxy.read_file_as_bytes("/pub/a.gz")
+    assert not isinstance(excinfo.value, FetchTransientError)
+    assert excinfo.value.reason.startswith("501")
+    # not retried, and the connection is kept
+    assert server.retrs == 1
+    assert len(server.connections) == 1
+    assert not server.connections[0].closed
+    assert retry_policy._state("ftp.ncei.noaa.gov").failures == 0
+
+    # logged out, so logged in again and retried
+    server.replies["/pub/b.gz"] = "530 Not logged in"
+    with pytest.raises(FetchTransientError):
+        proxy.read_file_as_bytes("/pub/b.gz")
+    assert server.retrs == 1 + retry_policy.attempts
+    assert server.connections[0].closed
+
+
+def test_noaa_ftp_connection_proxy_pool_size(monkeypatch):
+    monkeypatch.setenv("EEWEATHER_NOAA_POOL_SIZE", "8")
+    assert NOAAFTPConnectionProxy().pool_size == 8
+    with pytest.raises(ValueError):
+        NOAAFTPConnectionProxy(pool_size=0)
+
+
+class NOAAHTTPRequestHandler(BaseHTTPRequestHandler):
+    # serves server.files with keep-alive, range requests and ETags, and
+    # breaks off the first response of each path in server.break_off
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        status = self.server.statuses.get(self.path, [])
+        if len(status) > 0:
+            self.send_response(status.pop(0))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path in self.server.text_files:
+            data = self.server.text_files[self.path].encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        data = self.server.files.get(self.path)
+        if data is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = '"{}"'.format(hash(data))
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header is not None and self.headers.get("If-Range") == etag:
+            start = int(range_header[len("bytes=") : -1])
+            self.send_response(206)
+            self.send_header(
+                "Content-Range",
+                "bytes {}-{}/{}".format(start, len(data) - 1, len(data)),
+            )
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(data) - start))
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("ETag", etag)
+        self.end_headers()
+        if self.path in self.server.break_off:
+            self.server.break_off.remove(self.path)
+            self.wfile.write(data[start : start + len(data) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(data[start:])
+
+
+def _read_fixture(write):
+    bytes_string = BytesIO()
+    write(bytes_string)
+    return bytes_string.getvalue()
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), NOAAHTTPRequestHandler)
+    server.daemon_threads = True
+    server.files = {
+        "/pub/data/noaa/2007/722874-93134-2007.gz": _read_fixture(write_isd_file),
+        "/pub/data/gsod/2007/722874-93134-2007.op.gz": _read_fixture(write_gsod_file),
+    }
+    # e.g. TMY3 data
+    server.text_files = {"/tmy3_archive/722880TYA.CSV": write_tmy3_file()}
+    server.break_off = set()
+    # statuses to respond with before serving a path
+    server.statuses = {}
+    server.requests = []
+    server.connections = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = "http://127.0.0.1:{}".format(server.server_address[1])
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_noaa_http_connection_proxy_read_file_as_bytes(http_server):
+    proxy = NOAAHTTPConnectionProxy(http_server.url, pool_size=2)
+    filename = "/pub/data/noaa/2007/722874-93134-2007.gz"
+    for _ in range(3):
+        # passed through rather than decompressed
+        assert proxy.read_file_as_bytes(filename).read() == http_server.files[filename]
+    assert proxy.read_file_as_bytes("/pub/data/noaa/2007/missing.gz") is None
+    # one kept-alive connection
+    assert http_server.connections == 1
+    assert http_server.requests[0][1]["Accept-Encoding"] == "identity"
+    proxy.close()
+
+
+def test_noaa_http_connection_proxy_resumes_broken_downloads(http_server):
+    proxy = NOAAHTTPConnectionProxy(http_server.url, pool_size=1, block_size=1024)
+    filename = "/pub/data/noaa/2007/722874-93134-2007.gz"
+    http_server.break_off.add(filename)
+    assert proxy.read_file_as_bytes(filename).read() == http_server.files[filename]
+
+    (_, first), (_, second) = http_server.requests
+    assert "Range" not in first
+    size = len(http_server.files[filename]) // 2
+    assert second["Range"] == "bytes={}-".format(size)
+    assert second["If-Range"].startswith('"')
+
+
+def test_noaa_http_connection_proxy_restarts_changed_files(http_server):
+    class Stream(object):
+        def __init__(self):
+            self.data = b""
+            self.resets = 0
+
+        def write(self, chunk):
+            self.data += chunk
+
+        def reset(self):
+            self.data = b""
+            self.resets += 1
+
+    proxy = NOAAHTTPConnectionProxy(http_server.url, pool_size=1, block_size=1024)
+    filename = "/pub/data/gsod/2007/722874-93134-2007.op.gz"
+    http_server.break_off.add(filename)
+    original = http_server.files[filename]
+
+    stream = Stream()
+    write = stream.write
+
+    def write_and_change(chunk):
+        # the file changes on the server while it is downloaded
+        http_server.files[filename] = original[::-1]
+        write(chunk)
+
+    stream.write = write_and_change
+    assert proxy.read_file_into(filename, stream) is True
+    assert stream.resets == 1
+    assert stream.data == original[::-1]
+
+
+def test_noaa_http_connection_proxy_concurrent_reads(http_server):
+    proxy = NOAAHTTPConnectionProxy(http_server.url, pool_size=3)
+    filenames = sorted(http_server.files)
+    results = []
+
+    def read(filename):
+        results.append(proxy.read_file_as_bytes(filename).read())
+
+    threads = [
+        threading.Thread(target=read, args=(filenames[i % 2],)) for i in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == sorted(http_server.files[f] for f in filenames * 10)
+    assert http_server.connections <= 3
+
+
+def test_noaa_http_connection_proxy_fetch(http_server, monkeypatch):
+    monkeypatch.setattr(
+        "eeweather.connections.noaa_ftp_connection_proxy", MockNOAAFTPConnectionProxy()
+    )
+    expected_isd = fetch_isd_hourly_temp_data("722874", 2007)
+    expected_gsod = fetch_gsod_daily_temp_data("722874", 2007)
+
+    monkeypatch.setattr(
+        "eeweather.connections.noaa_ftp_connection_proxy",
+        NOAAHTTPConnectionProxy(http_server.url),
+    )
+    pd.testing.assert_series_equal(
+        fetch_isd_hourly_temp_data("722874", 2007), expected_isd
+    )
+    pd.testing.assert_series_equal(
+        fetch_gsod_daily_temp_data("722874", 2007), expected_gsod
+    )
+
+
+def test_get_noaa_connection_proxy(monkeypatch):
+    monkeypatch.delenv("EEWEATHER_NOAA_URL", raising=False)
+    monkeypatch.delenv("EEWEATHER_MIRROR", raising=False)
+    proxy = get_noaa_connection_proxy()
+    assert isinstance(proxy, NOAAFTPConnectionProxy)
+    assert proxy.host == "ftp.ncei.noaa.gov"
+
+    monkeypatch.setenv("EEWEATHER_NOAA_URL", "https://www.ncei.noaa.gov/")
+    proxy = get_noaa_connection_proxy()
+    assert isinstance(proxy, NOAAHTTPConnectionProxy)
+    assert proxy.url == "https://www.ncei.noaa.gov"
+
+    assert get_noaa_connection_proxy("ftp://mirror.local").host == "mirror.local"
+    assert get_noaa_connection_proxy("ftp://mirror.local/").host == "mirror.local"
+    with pytest.raises(ValueError):
+        get_noaa_connection_proxy("gopher://noaa")
+    # files are always looked up at their /pub/data paths
+    with pytest.raises(ValueError):
+        get_noaa_connection_proxy("ftp://mirror.local/noaa")
+
+
+def test_noaa_connection_proxy_resolves_lazily(monkeypatch):
+    monkeypatch.setenv("EEWEATHER_NOAA_URL", "gopher://noaa")
+    monkeypatch.delenv("EEWEATHER_MIRROR", raising=False)
+    # an unsupported URL doesn't break importing eeweather, only downloads
+    result = subprocess.run([sys.executable, "-c", "import eeweather"])
+    assert result.returncode == 0
+    proxy = NOAAConnectionProxy()
+    with pytest.raises(ValueError):
+        proxy.read_file_as_bytes("/pub/data/noaa/2007/722874-93134-2007.gz")
+
+    monkeypatch.setenv("EEWEATHER_NOAA_URL", "https://www.ncei.noaa.gov")
+    http_proxy = proxy.get_proxy()
+    assert isinstance(http_proxy, NOAAHTTPConnectionProxy)
+    assert proxy.get_proxy() is http_proxy
+    monkeypatch.setenv("EEWEATHER_NOAA_URL", "ftp://mirror.local")
+    assert proxy.get_proxy().host == "mirror.local"
+
+
+def test_noaa_mirror_connection_proxy(tmp_path):
+    filename = "/pub/data/noaa/2007/722874-93134-2007.gz"
+    path = tmp_path / "pub" / "data" / "noaa" / "2007" / "722874-93134-2007.gz"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"isd" * 100)
+
+    proxy = NOAAMirrorConnectionProxy(str(tmp_path), block_size=7)
+    assert proxy.read_file_as_bytes(filename).read() == b"isd" * 100
+    assert proxy.read_file_as_bytes("/pub/data/noaa/2007/missing.gz") is None
+    with pytest.raises(ValueError):
+        proxy.read_file_as_bytes("/pub/data/../../etc/passwd")
+    with pytest.raises(FetchNotFoundError):
+        proxy.request_text("https://example.com/722880TYA.CSV")
+
+
+def test_noaa_mirror_connection_proxy_records_through(server, tmp_path):
+    upstream = NOAAFTPConnectionProxy(pool_size=1, connect=server.connect)
+    proxy = NOAAMirrorConnectionProxy(str(tmp_path), upstream=upstream)
+    assert proxy.read_file_as_bytes("/pub/a.gz").read() == b"a" * 10
+    assert (tmp_path / "pub" / "a.gz").read_bytes() == b"a" * 10
+    # files missing upstream are not saved
+    assert proxy.read_file_as_bytes("/pub/missing.gz") is None
+    assert sorted(p.name for p in (tmp_path / "pub").iterdir()) == ["a.gz"]
+
+    # read from the mirror from then on
+    server.files.clear()
+    assert proxy.read_file_as_bytes("/pub/a.gz").read() == b"a" * 10
+    offline = NOAAMirrorConnectionProxy(str(tmp_path))
+    assert offline.read_file_as_bytes("/pub/a.gz").read() == b"a" * 10
+
+
+def test_noaa_mirror_connection_proxy_fetch_offline(http_server, monkeypatch, tmp_path):
+    upstream = NOAAHTTPConnectionProxy(http_server.url)
+    tmy3_url = http_server.url + "/tmy3_archive/722880TYA.CSV"
+
+    def fetch(proxy):
+        monkeypatch.setattr("eeweather.connections.noaa_ftp_connection_proxy", proxy)
+        return [
+            fetch_isd_hourly_temp_data("722874", 2007),
+            fetch_gsod_daily_temp_data("722874", 2007),
+            fetch_hourly_normalized_temp_data("722880", tmy3_url, "TMY3"),
+        ]
+
+    expected = fetch(upstream)
+    recorded = fetch(NOAAMirrorConnectionProxy(str(tmp_path), upstream=upstream))
+    n_requests = len(http_server.requests)
+    assert (tmp_path / "127.0.0.1:{}".format(http_server.server_address[1])).exists()
+
+    # without network access
+    offline = fetch(NOAAMirrorConnectionProxy(str(tmp_path)))
+    assert len(http_server.requests) == n_requests
+    for results in zip(expected, recorded, offline):
+        for result in results[1:]:
+            pd.testing.assert_series_equal(result, results[0])
+
+
+def test_get_noaa_connection_proxy_mirror(monkeypatch, tmp_path):
+    monkeypatch.setenv("EEWEATHER_NOAA_URL", "https://www.ncei.noaa.gov")
+    monkeypatch.setenv("EEWEATHER_MIRROR", str(tmp_path))
+    monkeypatch.delenv("EEWEATHER_MIRROR_RECORD", raising=False)
+    proxy = get_noaa_connection_proxy()
+    assert isinstance(proxy, NOAAMirrorConnectionProxy)
+    assert proxy.root == str(tmp_path)
+    assert proxy.upstream is None
+
+    monkeypatch.setenv("EEWEATHER_MIRROR_RECORD", "1")
+    proxy = get_noaa_connection_proxy()
+    assert isinstance(proxy.upstream, NOAAHTTPConnectionProxy)
+
+    proxy = get_noaa_connection_proxy("file://{}".format(tmp_path))
+    assert isinstance(proxy, NOAAMirrorConnectionProxy)
+    assert proxy.root == str(tmp_path)
+
+
+def test_mirror_set_after_import(http_server, monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        "eeweather.connections.noaa_ftp_connection_proxy", MockNOAAFTPConnectionProxy()
+    )
+    expected = fetch_isd_hourly_temp_data("722874", 2007)
+    monkeypatch.setattr(
+        "eeweather.connections.noaa_ftp_connection_proxy", NOAAConnectionProxy()
+    )
+
+    # e.g. set by a batch job once eeweather is imported
+    monkeypatch.setenv("EEWEATHER_NOAA_URL", http_server.url)
+    monkeypatch.setenv("EEWEATHER_MIRROR", str(tmp_path))
+    monkeypatch.setenv("EEWEATHER_MIRROR_RECORD", "1")
+    pd.testing.assert_series_equal(fetch_isd_hourly_temp_data("722874", 2007), expected)
+    assert (tmp_path / "pub/data/noaa/2007/722874-93134-2007.gz").exists()
+    n_requests = len(http_server.requests)
+
+    monkeypatch.delenv("EEWEATHER_MIRROR_RECORD")
+    pd.testing.assert_series_equal(fetch_isd_hourly_temp_data("722874", 2007), expected)
+    assert len(http_server.requests) == n_requests
+    assert isinstance(
+        eeweather.connections.noaa_ftp_connection_proxy.get_proxy(),
+        NOAAMirrorConnectionProxy,
+    )
+
+
+def test_noaa_http_connection_proxy_errors(http_server):
+    proxy = NOAAHTTPConnectionProxy(http_server.url)
+    filename = "/pub/data/noaa/2007/722874-93134-2007.gz"
+
+    # server errors are retried
+    http_server.statuses[filename] = [503, 500]
+    assert proxy.read_file_as_bytes(filename).read() == http_server.files[filename]
+    assert len(http_server.requests) == 3
+
+    # missing files and other client errors are not
+    http_server.requests.clear()
+    assert proxy.read_file_as_bytes("/pub/data/noaa/2007/missing.gz") is None
+    http_server.statuses[filename] = [403]
+    with pytest.raises(FetchError) as excinfo:
+        proxy.read_file_as_bytes(filename)
+    assert not isinstance(excinfo.value, FetchTransientError)
+    assert excinfo.value.reason == "HTTP 403"
+    assert len(http_server.requests) == 2
+
+    with pytest.raises(FetchNotFoundError):
+        proxy.request_text(http_server.url + "/missing.csv")
+    http_server.statuses["/tmy3_archive/722880TYA.CSV"] = [429]
+    assert proxy.request_text(http_server.url + "/tmy3_archive/722880TYA.CSV")
+
+
+def test_noaa_http_connection_proxy_unreachable():
+    policy = RetryPolicy(base_delay=0, attempts=2, failure_threshold=3)
+    # nothing listens on port 9 of localhost
+    proxy = NOAAHTTPConnectionProxy("http://127.0.0.1:9", policy=policy)
+    for _ in range(2):
+        with pytest.raises(FetchTransientError):
+            proxy.read_file_as_bytes("/pub/data/noaa/2007/722874-93134-2007.gz")
+    # then fails fast
+    with pytest.raises(CircuitOpenError) as excinfo:
+        proxy.read_file_as_bytes("/pub/data/noaa/2007/722874-93134-2007.gz")
+    assert excinfo.value.host == "127.0.0.1:9"
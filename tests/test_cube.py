@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+   Copyright 2018-2023 OpenEEmeter contributors
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+from datetime import datetime
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
+
+from eeweather.cube import WeatherCube
+from eeweather.exceptions import NonUTCTimezoneInfoError, UnrecognizedUSAFIDError
+
+
+@pytest.fixture
+def cube(tmp_path):
+    return WeatherCube.create(str(tmp_path / "cube"), ["1", "2", "3"], 2006, 2007)
+
+
+def _year_data(year, offset=0.0):
+    index = pd.date_range(
+        datetime(year, 1, 1), datetime(year, 12, 31, 23), freq="H", tz=pytz.UTC
+    )
+    return pd.Series(np.arange(len(index), dtype=float) / 10 + offset, index=index)
+
+
+def test_weather_cube_create(cube):
+    assert repr(cube) == 'WeatherCube("{}")'.format(cube.path)
+    assert len(cube) == 3
+    assert "2" in cube and "4" not in cube
+    assert cube.data.shape == (3, 2 * 8760)
+    assert cube.data.dtype == np.float32
+    assert np.isnan(cube.data).all()
+    assert cube.index[0] == datetime(2006, 1, 1, tzinfo=pytz.UTC)
+    assert cube.index[-1] == datetime(2007, 12, 31, 23, tzinfo=pytz.UTC)
+
+    with pytest.raises(ValueError):
+        WeatherCube.create(cube.path, ["1", "1"], 2006, 2007)
+    with pytest.raises(ValueError):
+        WeatherCube(cube.path, mode="w")
+
+
+def test_weather_cube_write_and_query(cube):
+    ts = _year_data(2007)
+    ts.iloc[3] = np.nan
+    cube.write("2", 2007, ts.iloc[1:])
+    # values outside the year are ignored
+    cube.write("3", 2006, _year_data(2007))
+    assert cube.has_year("2", 2007) and not cube.has_year("2", 2006)
+    cube.flush()
+
+    cube = WeatherCube(cube.path)
+    assert cube.has_year("2", 2007) and cube.has_year("3", 2006)
+    assert np.isnan(cube.data[2]).all()
+
+    start = datetime(2007, 1, 1, tzinfo=pytz.UTC)
+    end = datetime(2007, 1, 1, 5, tzinfo=pytz.UTC)
+    values = cube.values(["2", "3"], start, end)
+    assert values.shape == (2, 6)
+    np.testing.assert_allclose(values[0], [np.nan, 0.1, 0.2, np.nan, 0.4, 0.5])
+
+    df = cube.query(["2"], start, end)
+    assert list(df.columns) == ["2"]
+    assert df.index[0] == start and df.index[-1] == end
+    np.testing.assert_allclose(df["2"], ts[start:end].where(df.index != df.index[0]))
+
+    # whole cube by default, and bounds between hours are rounded inwards
+    assert cube.values().shape == (3, 2 * 8760)
+    assert cube.query(
+        start=datetime(2005, 1, 1, tzinfo=pytz.UTC),
+        end=datetime(2006, 1, 1, 1, 30, tzinfo=pytz.UTC),
+    ).shape == (2, 3)
+    assert cube.values(["1"], end, start).shape == (1, 0)
+
+
+def test_weather_cube_values_are_views(cube):
+    cube.write("1", 2006, _year_data(2006))
+    cube.write("2", 2006, _year_data(2006, offset=1))
+
+    values = cube.values(["1", "2"])
+    assert np.shares_memory(values, cube.data)
+    assert np.shares_memory(cube.query(["1", "2"]).values, cube.data)
+    # rows out of order are copied
+    values = cube.values(["2", "1"])
+    assert not np.shares_memory(values, cube.data)
+    assert values[0, 0] == 1 and values[1, 0] == 0
+
+
+def test_weather_cube_errors(cube):
+    with pytest.raises(UnrecognizedUSAFIDError):
+        cube.values(["4"])
+    with pytest.raises(NonUTCTimezoneInfoError):
+        cube.values(start=datetime(2007, 1, 1))
+
+    cube.flush()
+    read_only = WeatherCube(cube.path)
+    with pytest.raises(ValueError):
+        read_only.write("1", 2006, _year_data(2006))
+    with pytest.raises(ValueError):
+        read_only.values()[0, 0] = 1
+    assert sorted(os.listdir(cube.path)) == ["index.json", "temps.npy"]
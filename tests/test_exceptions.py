@@ -25,6 +25,11 @@ from eeweather import (
     UnrecognizedZCTAError,
     ISDDataNotAvailableError,
     GSODDataNotAvailableError,
+    GSODArchiveNotAvailableError,
+    FetchError,
+    FetchNotFoundError,
+    FetchTransientError,
+    CircuitOpenError,
 )
 
 
@@ -71,3 +76,31 @@ def test_gsod_data_does_not_exist_error():
     assert excinfo.value.message == (
         'GSOD data does not exist for station "123456" in year 1800.'
     )
+
+
+def test_gsod_archive_not_available_error():
+    with pytest.raises(GSODArchiveNotAvailableError) as excinfo:
+        raise GSODArchiveNotAvailableError(1800)
+    assert excinfo.value.year == 1800
+    assert excinfo.value.message == (
+        "GSOD archive could not be retrieved for year 1800."
+    )
+
+
+def test_fetch_errors():
+    with pytest.raises(FetchError) as excinfo:
+        raise FetchNotFoundError("ftp://ftp.ncei.noaa.gov/a.gz", "550 No such file")
+    assert excinfo.value.url == "ftp://ftp.ncei.noaa.gov/a.gz"
+    assert excinfo.value.reason == "550 No such file"
+    assert excinfo.value.message == (
+        "Could not fetch ftp://ftp.ncei.noaa.gov/a.gz: 550 No such file"
+    )
+
+    with pytest.raises(FetchTransientError) as excinfo:
+        raise CircuitOpenError("ftp://ftp.ncei.noaa.gov/a.gz", "ftp.ncei.noaa.gov", 30)
+    assert excinfo.value.host == "ftp.ncei.noaa.gov"
+    assert excinfo.value.retry_after == 30
+    assert excinfo.value.message == (
+        "Could not fetch ftp://ftp.ncei.noaa.gov/a.gz: ftp.ncei.noaa.gov failed"
+        " repeatedly, not trying again for 30 seconds"
+    )
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+   Copyright 2018-2023 OpenEEmeter contributors
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+from datetime import datetime, timedelta
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
+
+from eeweather.cache import (
+    KeyValueStore,
+    MemoryCache,
+    RetentionPolicy,
+    get_key_value_store,
+)
+from eeweather import serialization
+from eeweather.filestore import FileKeyValueStore
+from eeweather.serialization import decode_series, encode_series, is_encoded
+
+
+@pytest.fixture
+def s(tmp_path):
+    return FileKeyValueStore("file://{}".format(tmp_path / "cache"))
+
+
+def test_file_key_value_store(s):
+    assert repr(s) == 'FileKeyValueStore("{}")'.format(s.url)
+    assert s.key_exists("a") is False
+    assert s.retrieve("a") is None
+    assert s.retrieve_json("a") is None
+    assert s.retrieve_bytes("a") is None
+    assert s.key_updated("a") is None
+    assert s.retrieve_with_updated("a") == (None, None)
+
+    s.save_json("a", {"b": [1, "two", 3.0]})
+    assert s.key_exists("a") is True
+    assert s.retrieve_json("a") == {"b": [1, "two", 3.0]}
+    assert s.retrieve("a") == {"b": [1, "two", 3.0]}
+    assert s.retrieve_bytes("a") is None
+    assert s.key_updated("a").date() == datetime.utcnow().date()
+
+    # switch to bytes and back
+    s.save_bytes("a", b"\x00\x01")
+    assert s.retrieve("a") == b"\x00\x01"
+    assert s.retrieve_json("a") is None
+    s.save_json("a", [1])
+    assert s.retrieve("a") == [1]
+    assert s.retrieve_bytes("a") is None
+
+    s.clear("a")
+    assert s.key_exists("a") is False
+    s.clear("a")  # already gone
+
+
+def test_file_key_value_store_layout(s):
+    s.save_bytes("isd-hourly-722874-2007", b"\x00")
+    s.save_json("tmy3-hourly-722880", [1])
+    assert os.path.exists(os.path.join(s.root, "isd", "hourly", "722874", "2007.npy"))
+    assert os.path.exists(os.path.join(s.root, "tmy3", "hourly", "722880.json"))
+
+    # awkward keys stay inside the root and round trip
+    s.save_json("../x-/y-", 1)
+    assert s.retrieve("../x-/y-") == 1
+    assert sorted(key for key, _ in s._walk()) == [
+        "../x-/y-",
+        "isd-hourly-722874-2007",
+        "tmy3-hourly-722880",
+    ]
+    assert not os.path.exists(os.path.join(os.path.dirname(s.root), "x"))
+
+
+def test_file_key_value_store_memory_mapped_series(s):
+    ts = pd.Series(
+        np.arange(48, dtype=float) / 10,
+        index=pd.date_range("2018-01-01", periods=48, freq="H", tz=pytz.UTC),
+    )
+    s.save_bytes("isd-hourly-722874-2018", encode_series(ts, "H"))
+
+    data = s.retrieve("isd-hourly-722874-2018")
+    assert isinstance(data, memoryview)
+    assert isinstance(data.obj, np.memmap)
+    assert is_encoded(data)
+    # stored uncompressed, so values are read from the mapped file
+    assert len(data) == len(encode_series(ts, "H", compression=None))
+    assert decode_series(data).equals(ts)
+
+
+def test_file_key_value_store_retrieve_observations(s, monkeypatch):
+    ts = pd.Series(
+        np.arange(48, dtype=float) / 10,
+        index=pd.date_range("2017-12-31", periods=48, freq="H", tz=pytz.UTC),
+    )
+    ts.iloc[25] = np.nan
+    s.save_bytes("isd-hourly-722874-2017", encode_series(ts[:24], "H"))
+    s.save_bytes("isd-hourly-722874-2018", encode_series(ts[24:], "H"))
+    keys = ["isd-hourly-722874-2017", "isd-hourly-722874-2018"]
+
+    unpacked = []
+    unpack_values = serialization._unpack_values
+
+    def spy_unpack_values(buf, dtype_code, scale, count, offset=0):
+        unpacked.append(count)
+        return unpack_values(buf, dtype_code, scale, count, offset=offset)
+
+    monkeypatch.setattr("eeweather.serialization._unpack_values", spy_unpack_values)
+    start = datetime(2017, 12, 31, 22, 30, tzinfo=pytz.UTC)
+    end = datetime(2018, 1, 1, 3, tzinfo=pytz.UTC)
+    observations = s.retrieve_observations(keys, start, end)
+    # only the values in range are converted, leaving out missing ones
+    assert unpacked == [1, 4]
+    expected = ts[start:end].dropna()
+    np.testing.assert_array_equal(observations.index, expected.index)
+    np.testing.assert_allclose(observations.values, expected.values, atol=0.00005)
+
+    assert s.retrieve_observations(keys[:1], start, end).index[-1] == ts.index[23]
+    assert s.retrieve_observations([], start, end) is None
+    assert (
+        s.retrieve_observations(keys + ["isd-hourly-722874-2019"], start, end) is None
+    )
+    assert s.retrieve_observations(keys, start, end, stale={keys[1]: None}) is not None
+    now = datetime.now(pytz.UTC)
+    stale = {keys[1]: (now - timedelta(days=1), now + timedelta(days=1))}
+    assert s.retrieve_observations(keys, start, end, stale=stale) is None
+    s.save_json(keys[0], [1])
+    assert s.retrieve_observations(keys, start, end) is None
+
+
+def test_file_key_value_store_many(s):
+    s.save_many({"a-1": [1], "a-2": b"\x02"})
+    assert s.retrieve_many(["a-1", "a-2", "a-3"]) == {"a-1": [1], "a-2": b"\x02"}
+    data = s.retrieve_many_with_updated(["a-1", "a-3"])
+    assert list(data) == ["a-1"]
+    assert data["a-1"][1] == s.key_updated("a-1")
+
+
+def test_file_key_value_store_atomic_writes(s, monkeypatch):
+    s.save_json("a-1", "old")
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("eeweather.filestore.os.replace", fail)
+    with pytest.raises(OSError):
+        s.save_json("a-1", "new")
+    assert s.retrieve("a-1") == "old"
+    assert os.listdir(os.path.join(s.root, "a")) == ["1.json"]
+
+
+def test_file_key_value_store_clear_all(s, tmp_path):
+    s.save_many({"a-b-1": 1, "a-c-2": b"\x00"})
+    other = os.path.join(s.root, "README")
+    with open(other, "w") as f:
+        f.write("not a cache value")
+
+    s.clear()
+    assert s.retrieve_many(["a-b-1", "a-c-2"]) == {}
+    # only cache values are removed
+    assert os.listdir(s.root) == ["README"]
+
+
+def test_file_key_value_store_memory_cache_invalidation(tmp_path):
+    s = FileKeyValueStore(
+        "file://{}".format(tmp_path), memory_cache=MemoryCache(max_bytes=10**6)
+    )
+    s.memory_cache.put("a", "decoded")
+    s.memory_cache.put("b", "decoded")
+    s.save_json("a", 1)
+    assert "a" not in s.memory_cache
+    s.clear()
+    assert len(s.memory_cache) == 0
+
+
+def test_file_key_value_store_read_only(s):
+    s.save_json("a-1", 1)
+    ro = FileKeyValueStore(s.url + "?mode=ro")
+    assert ro.read_only is True
+    assert ro.retrieve("a-1") == 1
+
+    # writes are ignored
+    ro.save_json("a-1", 2)
+    ro.save_bytes("a-2", b"\x00")
+    ro.clear()
+    assert ro.gc(RetentionPolicy(max_bytes=0)) == {"rows": 0, "bytes": 0}
+    assert s.retrieve_many(["a-1", "a-2"]) == {"a-1": 1}
+
+
+def test_file_key_value_store_stats_gc_compact(s):
+    s.save_many({"isd-hourly-{}-2007".format(i): b"\x00" * 10 for i in range(3)})
+    s.save_json("tmy3-hourly-1", "abc")
+    for i in range(3):
+        path = s._find("isd-hourly-{}-2007".format(i))
+        mtime = datetime(2018, 1, 1 + i, tzinfo=pytz.UTC).timestamp()
+        os.utime(path, (mtime, mtime))
+
+    stats = s.stats()
+    assert [(row["prefix"], row["rows"], row["hit_ratio"]) for row in stats] == [
+        ("isd-hourly", 3, None),
+        ("tmy3-hourly", 1, None),
+    ]
+    npy_size = os.stat(s._find("isd-hourly-0-2007")).st_size
+    assert stats[0]["bytes"] == 3 * npy_size
+
+    result = s.gc(RetentionPolicy(prefix_max_bytes={"isd-hourly-*": npy_size}))
+    assert result == {"rows": 2, "bytes": 2 * npy_size}
+    keys = ["isd-hourly-{}-2007".format(i) for i in range(3)]
+    assert list(s.retrieve_many(keys)) == ["isd-hourly-2-2007"]
+
+    s.gc(RetentionPolicy(max_age=timedelta(days=1)))
+    assert s.compact() == (None, None)
+    assert os.listdir(s.root) == ["tmy3"]
+
+
+def test_get_key_value_store(tmp_path, monkeypatch):
+    s = get_key_value_store("file://{}".format(tmp_path))
+    assert isinstance(s, FileKeyValueStore)
+    assert s.root == str(tmp_path)
+
+    s = get_key_value_store("sqlite:///{}/cache.db".format(tmp_path))
+    assert isinstance(s, KeyValueStore)
+
+    monkeypatch.setenv("EEWEATHER_CACHE_URL", "file://{}/env".format(tmp_path))
+    assert get_key_value_store().root == "{}/env".format(tmp_path)
+
+    with pytest.raises(ValueError):
+        FileKeyValueStore("sqlite://")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+   Copyright 2018-2023 OpenEEmeter contributors
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from eeweather.normals import NormalsArchive, write_normals_archive
+
+
+@pytest.fixture
+def normal_year_data():
+    index = pd.date_range("1900-01-01", "1900-12-31 23:00", freq="H", tz="UTC")
+    temps = np.round(np.linspace(-20.0, 40.0, len(index)), 1)
+    temps[5] = np.nan
+    return pd.Series(temps, index=index)
+
+
+@pytest.fixture
+def archive(tmp_path, normal_year_data):
+    path = str(tmp_path / "normals.npy")
+    n = write_normals_archive(
+        path,
+        [
+            ("TMY3", "722880", normal_year_data),
+            ("CZ2010", "722880", normal_year_data + 1),
+        ],
+    )
+    assert n == 2
+    return NormalsArchive(path)
+
+
+def test_normals_archive_get_temp_data(archive, normal_year_data):
+    ts = archive.get_temp_data("TMY3", "722880")
+    # float32 storage is rounded back to the original values
+    pd.testing.assert_series_equal(ts, normal_year_data, check_freq=False)
+    assert np.isnan(ts.iloc[5])
+
+    ts = archive.get_temp_data("CZ2010", "722880")
+    assert ts.iloc[0] == normal_year_data.iloc[0] + 1
+
+    assert archive.get_temp_data("TMY3", "UNKNOWN") is None
+
+
+def test_normals_archive_precision(tmp_path, normal_year_data):
+    path = str(tmp_path / "normals.npy")
+    # e.g. normals read back from the cache
+    four_decimals = normal_year_data + 0.0123
+    write_normals_archive(
+        path,
+        [
+            ("TMY3", "722880", four_decimals),
+            ("CZ2010", "722880", normal_year_data + 0.00001),
+        ],
+    )
+    archive = NormalsArchive(path)
+    ts = archive.get_temp_data("TMY3", "722880")
+    pd.testing.assert_series_equal(
+        ts, four_decimals.round(4), check_freq=False, check_exact=True
+    )
+    # further decimals are rounded off
+    ts = archive.get_temp_data("CZ2010", "722880")
+    pd.testing.assert_series_equal(
+        ts, normal_year_data, check_freq=False, check_exact=True
+    )
+
+
+def test_normals_archive_keys(archive):
+    assert len(archive) == 2
+    assert ("TMY3", "722880") in archive
+    assert ("TMY3", "722874") not in archive
+    assert archive.keys() == [("TMY3", "722880"), ("CZ2010", "722880")]
+
+
+def test_normals_archive_repr(archive):
+    assert repr(archive) == 'NormalsArchive("{}")'.format(archive.path)
+
+
+def test_write_normals_archive_partial_series(tmp_path, normal_year_data):
+    path = str(tmp_path / "normals.npy")
+    write_normals_archive(path, [("TMY3", "722880", normal_year_data[:24])])
+    ts = NormalsArchive(path).get_temp_data("TMY3", "722880")
+    assert ts.shape == (8760,)
+    assert ts.count() == 23
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+   Copyright 2018-2023 OpenEEmeter contributors
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from eeweather.cache import MemoryCache, RetentionPolicy, get_key_value_store
+from eeweather.redisstore import RedisKeyValueStore
+from eeweather.stations import (
+    _cache_ttl,
+    load_isd_hourly_temp_data,
+    load_isd_hourly_temp_data_cached_proxy,
+)
+from eeweather.testing import MockNOAAFTPConnectionProxy
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture
+def s(client):
+    return RedisKeyValueStore("redis://localhost:6379/0", client=client)
+
+
+def test_redis_key_value_store(s, client):
+    assert repr(s) == 'RedisKeyValueStore("redis://localhost:6379/0")'
+    assert s.key_exists("a") is False
+    assert s.retrieve("a") is None
+    assert s.retrieve_json("a") is None
+    assert s.retrieve_bytes("a") is None
+    assert s.key_updated("a") is None
+    assert s.retrieve_with_updated("a") == (None, None)
+
+    s.save_json("a", {"b": [1, "two", 3.0]})
+    assert s.key_exists("a") is True
+    assert s.retrieve_json("a") == {"b": [1, "two", 3.0]}
+    assert s.retrieve("a") == {"b": [1, "two", 3.0]}
+    assert s.retrieve_bytes("a") is None
+    assert s.key_updated("a").date() == datetime.now(pytz.UTC).date()
+    assert client.keys() == [b"eeweather:a"]
+
+    # switch to bytes and back
+    s.save_bytes("a", b"\x00\xff")
+    assert s.retrieve("a") == b"\x00\xff"
+    assert s.retrieve_json("a") is None
+    s.save_json("a", [1])
+    assert s.retrieve("a") == [1]
+    assert s.retrieve_bytes("a") is None
+
+    s.clear("a")
+    assert s.key_exists("a") is False
+    s.clear("a")  # already gone
+
+
+def test_redis_key_value_store_pipelines_batches(s, client, monkeypatch):
+    s.save_many({})
+    calls = []
+    execute = client.pipeline().__class__.execute
+
+    def counting_execute(self, *args, **kwargs):
+        calls.append(len(self.command_stack))
+        return execute(self, *args, **kwargs)
+
+    monkeypatch.setattr(client.pipeline().__class__, "execute", counting_execute)
+    s.save_many({"a-{}".format(i): b"\x00" * i for i in range(10)})
+    data = s.retrieve_many_with_updated(["a-{}".format(i) for i in range(12)])
+    assert len(calls) == 2  # one round trip each
+    assert sorted(data) == ["a-{}".format(i) for i in range(10)]
+    assert data["a-3"][0] == b"\x00\x00\x00"
+    assert s.retrieve_many(["a-1", "b"]) == {"a-1": b"\x00"}
+
+
+def test_redis_key_value_store_ttl(client):
+    this_year = datetime.now(pytz.UTC).year
+    current = "isd-hourly-722874-{}".format(this_year)
+    s = RedisKeyValueStore("redis://", client=client)
+    s.save_many({current: b"\x00", "isd-hourly-722874-2007": b"\x00"})
+    s.save_json("tmy3-hourly-722874", [])
+    assert 0 < client.ttl(b"eeweather:" + current.encode()) <= 86400
+    assert client.ttl(b"eeweather:isd-hourly-722874-2007") == -1
+    assert client.ttl(b"eeweather:tmy3-hourly-722874") == -1
+
+    s = RedisKeyValueStore("redis://", client=client, ttl=lambda key: 10)
+    s.save_json("a", 1)
+    assert 0 < client.ttl(b"eeweather:a") <= 10
+
+
+def test_cache_ttl():
+    this_year = datetime.now(pytz.UTC).year
+    assert _cache_ttl("isd-raw-722874-{}".format(this_year)) == 86400
+    assert _cache_ttl("gsod-daily-722874-{}".format(this_year)) == 86400
+    assert _cache_ttl("isd-hourly-722874-{}".format(this_year - 1)) is None
+    assert _cache_ttl("tmy3-hourly-722874") is None
+
+
+def test_redis_key_value_store_namespace(client):
+    s1 = RedisKeyValueStore("redis://", client=client, namespace="a[1]:")
+    s2 = RedisKeyValueStore("redis://", client=client, namespace="a2:")
+    s1.save_json("k", 1)
+    s2.save_json("k", 2)
+    assert s1.retrieve("k") == 1
+    s1.clear()
+    assert s1.retrieve("k") is None
+    assert s2.retrieve("k") == 2
+    assert [row["rows"] for row in s2.stats()] == [1]
+
+
+def test_redis_key_value_store_memory_cache_invalidation(client):
+    s = RedisKeyValueStore(
+        "redis://", client=client, memory_cache=MemoryCache(max_bytes=10**6)
+    )
+    s.memory_cache.put("a", "decoded")
+    s.memory_cache.put("b", "decoded")
+    s.save_json("a", 1)
+    assert "a" not in s.memory_cache
+    s.clear()
+    assert len(s.memory_cache) == 0
+
+
+def test_redis_key_value_store_stats_gc_compact(s, client):
+    s.save_many({"isd-hourly-{}-2007".format(i): b"\x00" * 10 for i in range(3)})
+    s.save_json("tmy3-hourly-1", "abc")
+    for i in range(3):
+        updated = datetime(2018, 1, 1 + i, tzinfo=pytz.UTC).timestamp()
+        client.hset("eeweather:isd-hourly-{}-2007".format(i), "updated", updated)
+
+    assert s.stats() == [
+        {
+            "prefix": "isd-hourly",
+            "rows": 3,
+            "bytes": 30,
+            "hits": 0,
+            "misses": 0,
+            "hit_ratio": None,
+        },
+        {
+            "prefix": "tmy3-hourly",
+            "rows": 1,
+            "bytes": 5,
+            "hits": 0,
+            "misses": 0,
+            "hit_ratio": None,
+        },
+    ]
+
+    result = s.gc(RetentionPolicy(prefix_max_bytes={"isd-hourly-*": 10}))
+    assert result == {"rows": 2, "bytes": 20}
+    keys = ["isd-hourly-{}-2007".format(i) for i in range(3)]
+    assert list(s.retrieve_many(keys)) == ["isd-hourly-2-2007"]
+
+    s.gc(RetentionPolicy(max_age=timedelta(days=1)))
+    assert s.compact() == (None, None)
+    assert client.keys() == [b"eeweather:tmy3-hourly-1"]
+
+
+def test_get_key_value_store_redis():
+    pytest.importorskip("redis")
+    s = get_key_value_store("redis://localhost:6379/1")
+    assert isinstance(s, RedisKeyValueStore)
+    assert s.client.connection_pool.connection_kwargs["db"] == 1
+
+
+def test_load_isd_hourly_temp_data_redis_store(s, monkeypatch):
+    monkeypatch.setattr(
+        "eeweather.connections.noaa_ftp_connection_proxy", MockNOAAFTPConnectionProxy()
+    )
+    monkeypatch.setattr(
+        "eeweather.connections.key_value_store_proxy.get_store", lambda: s
+    )
+    ts1 = load_isd_hourly_temp_data_cached_proxy("722874", 2007)
+    assert s.key_exists("isd-hourly-722874-2007")
+    assert s.key_exists("isd-daily-722874-2007")
+
+    # later loads, e.g. on another machine, are served from the shared cache
+    monkeypatch.setattr("eeweather.connections.noaa_ftp_connection_proxy", None)
+    ts2 = load_isd_hourly_temp_data_cached_proxy("722874", 2007, fetch_from_web=False)
+    assert ts1.index.equals(ts2.index)
+    start = datetime(2007, 1, 3, tzinfo=pytz.UTC)
+    end = datetime(2007, 4, 3, tzinfo=pytz.UTC)
+    ts, warnings = load_isd_hourly_temp_data("722874", start, end, fetch_from_web=False)
+    assert ts.index[-1] == end
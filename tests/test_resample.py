@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+   Copyright 2018-2023 OpenEEmeter contributors
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
+
+from eeweather.resample import resample_interpolated_mean, resample_interpolated_means
+from eeweather.stations import fetch_isd_raw_temp_data
+from eeweather.testing import MockNOAAFTPConnectionProxy
+
+
+def pandas_resample(ts, freq, limit=60):
+    # reference implementation, CalTRACK 2.3.3
+    return (
+        ts.resample("Min")
+        .mean()
+        .interpolate(method="linear", limit=limit, limit_direction="both")
+        .resample(freq)
+        .mean()
+    )
+
+
+def assert_parity(ts, freq, limit=60):
+    pd.testing.assert_series_equal(
+        resample_interpolated_mean(ts, freq, limit=limit),
+        pandas_resample(ts, freq, limit=limit),
+        rtol=1e-9,
+        atol=1e-9,
+    )
+
+
+def series(minutes, values):
+    index = pd.to_datetime(minutes, unit="m", utc=True).tz_convert(pytz.UTC)
+    return pd.Series(np.array(values, dtype=float), index=index)
+
+
+@pytest.fixture
+def monkeypatch_noaa_ftp(monkeypatch):
+    monkeypatch.setattr(
+        "eeweather.connections.noaa_ftp_connection_proxy", MockNOAAFTPConnectionProxy()
+    )
+
+
+@pytest.mark.parametrize("freq", ["H", "D"])
+@pytest.mark.parametrize("gap", [1, 60, 61, 120, 121, 122, 123, 500, 5000])
+def test_gap_lengths(freq, gap):
+    ts = series([0, 37, 37 + gap, 37 + gap + 10], [1.0, 2.0, 8.0, 3.0])
+    assert_parity(ts, freq)
+
+
+@pytest.mark.parametrize("freq", ["H", "D"])
+def test_missing_values_at_ends(freq):
+    ts = series([10, 40, 95, 300, 330, 400], [np.nan, np.nan, 5.0, 7.0, np.nan, np.nan])
+    assert_parity(ts, freq)
+
+
+@pytest.mark.parametrize("freq", ["H", "D"])
+def test_all_missing(freq):
+    ts = series([10, 40, 95, 3000], [np.nan] * 4)
+    result = resample_interpolated_mean(ts, freq)
+    assert result.isnull().all()
+    assert_parity(ts, freq)
+
+
+@pytest.mark.parametrize("freq", ["H", "D"])
+def test_single_observation(freq):
+    assert_parity(series([125], [3.5]), freq)
+
+
+@pytest.mark.parametrize("freq", ["H", "D"])
+def test_duplicate_and_sub_minute_timestamps(freq):
+    ts = series([0, 30, 30, 30.5, 200, 130], [1.0, 2.0, np.nan, 4.0, 5.0, 6.0])
+    assert_parity(ts, freq)
+
+
+def test_limit():
+    ts = series([0, 100, 400], [1.0, 2.0, 3.0])
+    assert_parity(ts, "H", limit=10)
+
+
+def test_empty():
+    ts = pd.Series([], index=pd.DatetimeIndex([], tz=pytz.UTC), dtype=float)
+    assert resample_interpolated_mean(ts, "H").shape == (0,)
+
+
+def test_multiple_frequencies():
+    ts = series([0, 100, 400, 5000, 50000], [1.0, 2.0, np.nan, 4.0, 3.0])
+    results = resample_interpolated_means(ts, ["H", "D", "MS"])
+    for freq in ["H", "D", "MS"]:
+        pd.testing.assert_series_equal(results[freq], pandas_resample(ts, freq))
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("freq", ["H", "D"])
+def test_random_irregular_observations(seed, freq):
+    rs = np.random.RandomState(seed)
+    n = 300
+    steps = rs.choice([1, 20, 59, 60, 61, 120, 121, 122, 200, 1500], size=n)
+    values = rs.randn(n) * 10
+    values[rs.rand(n) < 0.2] = np.nan
+    assert_parity(series(np.cumsum(steps), values), freq)
+
+
+@pytest.mark.parametrize("freq", ["H", "D"])
+@pytest.mark.parametrize(
+    "usaf_id, year", [("722874", 2007), ("722874", 2006), ("994035", 2013)]
+)
+def test_isd_files(monkeypatch_noaa_ftp, usaf_id, year, freq):
+    ts = fetch_isd_raw_temp_data(usaf_id, year)
+    assert_parity(ts, freq)
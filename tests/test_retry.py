@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+   Copyright 2018-2023 OpenEEmeter contributors
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+import pytest
+
+from eeweather.exceptions import (
+    CircuitOpenError,
+    FetchNotFoundError,
+    FetchTransientError,
+)
+from eeweather.retry import RetryPolicy, get_retry_policy, set_retry_policy
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def _policy(clock, **kwargs):
+    return RetryPolicy(sleep=clock.sleep, clock=clock, **kwargs)
+
+
+class Fetch(object):
+    # fails with the given errors, then returns "data"
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if len(self.errors) > 0:
+            raise self.errors.pop(0)
+        return "data"
+
+
+def _transient():
+    return FetchTransientError("ftp://host/a.gz", "timed out")
+
+
+def test_retry_policy_retries_transient_errors(clock):
+    policy = _policy(clock, attempts=3, base_delay=1)
+    fetch = Fetch(_transient(), _transient())
+    assert policy.call("host", "ftp://host/a.gz", fetch) == "data"
+    assert fetch.calls == 3
+    # jittered exponential backoff
+    assert 0.5 <= clock.sleeps[0] <= 1
+    assert 1 <= clock.sleeps[1] <= 2
+
+    fetch = Fetch(_transient(), _transient(), _transient())
+    with pytest.raises(FetchTransientError):
+        policy.call("host", "ftp://host/a.gz", fetch)
+    assert fetch.calls == 3
+
+
+def test_retry_policy_does_not_retry_not_found(clock):
+    policy = _policy(clock)
+    fetch = Fetch(FetchNotFoundError("ftp://host/a.gz", "550"))
+    with pytest.raises(FetchNotFoundError):
+        policy.call("host", "ftp://host/a.gz", fetch)
+    assert fetch.calls == 1
+    assert clock.sleeps == []
+
+
+def test_retry_policy_backoff_is_bounded():
+    policy = RetryPolicy(base_delay=1, max_delay=30)
+    assert all(15 <= policy.backoff(10) <= 30 for _ in range(100))
+
+
+def test_retry_policy_timeouts():
+    policy = RetryPolicy(timeout=60, timeouts={"ftp.ncei.noaa.gov": 120})
+    assert policy.timeout("ftp.ncei.noaa.gov") == 120
+    assert policy.timeout("www.ncei.noaa.gov") == 60
+    with pytest.raises(ValueError):
+        RetryPolicy(attempts=0)
+
+
+def test_retry_policy_retry_budget(clock):
+    policy = _policy(
+        clock, attempts=2, retry_ratio=0.5, retry_reserve=2, failure_threshold=100
+    )
+    calls = []
+    for _ in range(4):
+        fetch = Fetch(_transient(), _transient())
+        with pytest.raises(FetchTransientError):
+            policy.call("host", "ftp://host/a.gz", fetch)
+        calls.append(fetch.calls)
+    # two retries in reserve, plus one for every two fetches
+    assert calls == [2, 2, 2, 1]
+    # budgets are per host
+    fetch = Fetch(_transient())
+    assert policy.call("other", "ftp://other/a.gz", fetch) == "data"
+
+
+def test_retry_policy_circuit_breaker(clock):
+    policy = _policy(clock, attempts=2, failure_threshold=3, reset_timeout=60)
+    with pytest.raises(FetchTransientError):
+        policy.call("host", "ftp://host/a.gz", Fetch(_transient(), _transient()))
+    with pytest.raises(FetchTransientError):
+        # opens after the third failure in a row, without waiting to retry
+        policy.call("host", "ftp://host/a.gz", Fetch(_transient(), _transient()))
+    assert len(clock.sleeps) == 1
+
+    # fails fast
+    fetch = Fetch()
+    with pytest.raises(CircuitOpenError) as excinfo:
+        policy.call("host", "ftp://host/b.gz", fetch)
+    assert fetch.calls == 0
+    assert excinfo.value.host == "host"
+    assert excinfo.value.url == "ftp://host/b.gz"
+    assert excinfo.value.retry_after == 60
+    # other hosts are not affected
+    assert policy.call("other", "ftp://other/a.gz", Fetch()) == "data"
+
+    # one attempt after the reset timeout, which reopens it if it fails
+    clock.now += 60
+    fetch = Fetch(_transient())
+    with pytest.raises(FetchTransientError):
+        policy.call("host", "ftp://host/a.gz", fetch)
+    assert fetch.calls == 1
+    with pytest.raises(CircuitOpenError):
+        policy.call("host", "ftp://host/a.gz", Fetch())
+
+    # and closes it if it succeeds
+    clock.now += 60
+    assert policy.call("host", "ftp://host/a.gz", Fetch()) == "data"
+    assert policy.call("host", "ftp://host/a.gz", Fetch(_transient())) == "data"
+
+    policy.reset()
+    assert policy._hosts == {}
+
+
+def test_retry_policy_circuit_breaker_not_found_closes(clock):
+    policy = _policy(clock, attempts=1, failure_threshold=2, reset_timeout=60)
+    for _ in range(2):
+        with pytest.raises(FetchTransientError):
+            policy.call("host", "ftp://host/a.gz", Fetch(_transient()))
+    clock.now += 60
+    # the host answers again
+    with pytest.raises(FetchNotFoundError):
+        policy.call(
+            "host", "ftp://host/a.gz", Fetch(FetchNotFoundError("ftp://host/a", "550"))
+        )
+    assert policy.call("host", "ftp://host/a.gz", Fetch()) == "data"
+
+
+def test_set_retry_policy(monkeypatch):
+    policy = RetryPolicy(timeouts={"ftp.ncei.noaa.gov": 120})
+    monkeypatch.setattr("eeweather.retry._retry_policy", get_retry_policy())
+    set_retry_policy(policy)
+    assert get_retry_policy() is policy
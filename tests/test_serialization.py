@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+
+   Copyright 2018-2023 OpenEEmeter contributors
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from eeweather.serialization import (
+    decode_observations,
+    decode_series,
+    decode_series_values,
+    encode_observations,
+    encode_series,
+    is_encoded,
+    uncompress,
+)
+
+
+@pytest.fixture
+def hourly_ts():
+    index = pd.date_range("2017-01-01", periods=8760, freq="H", tz="UTC")
+    values = np.round(np.sin(np.arange(8760) / 100.0) * 30, 4)
+    values[10:20] = np.nan
+    return pd.Series(values, index=index)
+
+
+def test_encode_series_float32(hourly_ts):
+    data = encode_series(hourly_ts, "H")
+    assert is_encoded(data)
+    assert len(data) < 8760 * 4
+    ts = decode_series(data)
+    # values keep 4 decimals exactly
+    pd.testing.assert_series_equal(ts, hourly_ts)
+    assert ts.index.freq == "H"
+
+
+def test_encode_series_int16(hourly_ts):
+    data = encode_series(hourly_ts, "H", dtype="int16", scale=100)
+    ts = decode_series(data)
+    pd.testing.assert_series_equal(ts, hourly_ts, atol=0.00501, check_exact=False)
+    assert ts.isnull().sum() == 10
+
+
+def test_encode_series_uncompressed(hourly_ts):
+    data = encode_series(hourly_ts, "H", compression=None)
+    assert len(data) > 8760 * 4
+    pd.testing.assert_series_equal(decode_series(data), hourly_ts)
+
+
+def test_uncompress(hourly_ts):
+    data = encode_series(hourly_ts, "H")
+    uncompressed = uncompress(data)
+    assert uncompressed == encode_series(hourly_ts, "H", compression=None)
+    assert uncompress(uncompressed) is uncompressed
+    pd.testing.assert_series_equal(decode_series(uncompressed), hourly_ts)
+
+    times = np.array(["2017-01-01T00:10"], dtype="datetime64[s]")
+    data = uncompress(encode_observations(times, np.array([1.5])))
+    assert decode_observations(data)[1][0] == 1.5
+
+
+def test_decode_series_values(hourly_ts):
+    seconds, values = decode_series_values(encode_series(hourly_ts, "H"))
+    assert seconds.dtype == np.int64
+    np.testing.assert_array_equal(seconds, hourly_ts.index.asi8 // 10**9)
+    np.testing.assert_array_equal(values, hourly_ts.values)
+
+    times = np.array(["2017-01-01T00:10"], dtype="datetime64[s]")
+    with pytest.raises(ValueError):
+        decode_series_values(encode_observations(times, np.array([1.5])))
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int16"])
+def test_decode_series_values_range(hourly_ts, dtype):
+    data = uncompress(encode_series(hourly_ts, "H", dtype=dtype))
+    all_seconds, all_values = decode_series_values(data)
+    first = int(all_seconds[0])
+
+    # from the first value at or after start to the last at or before end
+    seconds, values = decode_series_values(data, first + 5400, first + 10 * 3600)
+    np.testing.assert_array_equal(seconds, all_seconds[2:11])
+    np.testing.assert_array_equal(values, all_values[2:11])
+
+    # ranges reaching beyond the series
+    seconds, values = decode_series_values(data, first - 3600, first + 3600)
+    np.testing.assert_array_equal(seconds, all_seconds[:2])
+    seconds, values = decode_series_values(data, start=int(all_seconds[-1]))
+    np.testing.assert_array_equal(values, all_values[-1:])
+    seconds, values = decode_series_values(data, first - 7200, first - 3600)
+    assert len(seconds) == len(values) == 0
+    seconds, values = decode_series_values(data, first + 1800, first + 1800)
+    assert len(seconds) == len(values) == 0
+
+
+def test_encode_series_daily_with_gaps():
+    index = pd.to_datetime(["2017-01-01", "2017-01-02", "2017-01-05"], utc=True)
+    ts = decode_series(encode_series(pd.Series([1.5, 2.5, 3.5], index=index), "D"))
+    assert list(ts.index.day) == [1, 2, 3, 4, 5]
+    assert ts.isnull().sum() == 2
+    assert ts.iloc[-1] == 3.5
+
+
+def test_encode_series_empty():
+    ts = pd.Series([], index=pd.DatetimeIndex([], tz="UTC"), dtype=float)
+    assert len(decode_series(encode_series(ts, "H"))) == 0
+
+
+def test_encode_series_invalid(hourly_ts):
+    with pytest.raises(ValueError):
+        encode_series(hourly_ts, "M")
+    with pytest.raises(ValueError):
+        encode_series(hourly_ts, "H", dtype="float16")
+    with pytest.raises(ValueError):
+        encode_series(hourly_ts, "H", compression="lzma")
+    with pytest.raises(ValueError):
+        encode_series(hourly_ts * 1000, "H", dtype="int16")
+
+
+def test_decode_series_invalid(hourly_ts):
+    with pytest.raises(ValueError):
+        decode_series(b"NOPE" + encode_series(hourly_ts, "H")[4:])
+
+    # written by a newer version
+    data = bytearray(encode_series(hourly_ts, "H"))
+    data[4] = 99
+    with pytest.raises(ValueError):
+        decode_series(bytes(data))
+
+
+def test_is_encoded():
+    assert not is_encoded(None)
+    assert not is_encoded([["2017010100", 1.0]])
+    assert not is_encoded(b"abc")
+
+
+def test_encode_observations():
+    times = np.array(
+        ["2017-01-01T00:10", "2017-01-01T00:55", "2017-01-01T01:10"],
+        dtype="datetime64[m]",
+    )
+    temps = np.array([1.2, np.nan, -3.4])
+    data = encode_observations(times, temps)
+    assert is_encoded(data)
+    decoded_times, decoded_temps = decode_observations(data)
+    assert (decoded_times == times).all()
+    np.testing.assert_array_equal(decoded_temps, temps)
+
+    with pytest.raises(ValueError):
+        decode_observations(encode_series(pd.Series([1.0], index=times[:1]), "H"))
@@ -18,6 +18,11 @@
 
 """
 from datetime import datetime
+from io import BytesIO
+import json
+import os
+import pkg_resources
+import numpy as np
 import pandas as pd
 import pytest
 import pytz
@@ -29,20 +34,25 @@ from eeweather import (
     get_gsod_filenames,
     get_isd_file_metadata,
     fetch_isd_raw_temp_data,
+    fetch_isd_resampled_temp_data,
     fetch_isd_hourly_temp_data,
     fetch_isd_daily_temp_data,
     fetch_gsod_raw_temp_data,
+    fetch_gsod_raw_temp_fields,
     fetch_gsod_daily_temp_data,
     fetch_tmy3_hourly_temp_data,
     fetch_cz2010_hourly_temp_data,
+    get_isd_raw_temp_data_cache_key,
     get_isd_hourly_temp_data_cache_key,
     get_isd_daily_temp_data_cache_key,
     get_gsod_daily_temp_data_cache_key,
     get_tmy3_hourly_temp_data_cache_key,
     get_cz2010_hourly_temp_data_cache_key,
+    cached_isd_raw_temp_data_is_expired,
     cached_isd_hourly_temp_data_is_expired,
     cached_isd_daily_temp_data_is_expired,
     cached_gsod_daily_temp_data_is_expired,
+    validate_isd_raw_temp_data_cache,
     validate_isd_hourly_temp_data_cache,
     validate_isd_daily_temp_data_cache,
     validate_gsod_daily_temp_data_cache,
@@ -58,6 +68,7 @@ from eeweather import (
     deserialize_gsod_daily_temp_data,
     deserialize_tmy3_hourly_temp_data,
     deserialize_cz2010_hourly_temp_data,
+    read_isd_raw_temp_data_from_cache,
     read_isd_hourly_temp_data_from_cache,
     read_isd_daily_temp_data_from_cache,
     read_gsod_daily_temp_data_from_cache,
@@ -68,11 +79,13 @@ from eeweather import (
     write_gsod_daily_temp_data_to_cache,
     write_tmy3_hourly_temp_data_to_cache,
     write_cz2010_hourly_temp_data_to_cache,
+    destroy_cached_isd_raw_temp_data,
     destroy_cached_isd_hourly_temp_data,
     destroy_cached_isd_daily_temp_data,
     destroy_cached_gsod_daily_temp_data,
     destroy_cached_tmy3_hourly_temp_data,
     destroy_cached_cz2010_hourly_temp_data,
+    load_isd_raw_temp_data_cached_proxy,
     load_isd_hourly_temp_data_cached_proxy,
     load_isd_daily_temp_data_cached_proxy,
     load_gsod_daily_temp_data_cached_proxy,
@@ -88,21 +101,45 @@ from eeweather import (
     load_cached_gsod_daily_temp_data,
     load_cached_tmy3_hourly_temp_data,
     load_cached_cz2010_hourly_temp_data,
+    get_gsod_archive_filename,
+    ingest_gsod_archive,
+    build_normals_archive,
+    build_weather_cube,
+    read_tmy3_hourly_temp_data_from_normals_archive,
+    read_cz2010_hourly_temp_data_from_normals_archive,
 )
 from eeweather.exceptions import (
+    CircuitOpenError,
+    FetchTransientError,
     UnrecognizedUSAFIDError,
     ISDDataNotAvailableError,
     GSODDataNotAvailableError,
+    GSODArchiveNotAvailableError,
     TMY3DataNotAvailableError,
     CZ2010DataNotAvailableError,
     NonUTCTimezoneInfoError,
 )
+from eeweather.cache import KeyValueStore, MemoryCache
+from eeweather.cube import WeatherCube
+from eeweather.filestore import FileKeyValueStore
+from eeweather.connections import NormalsArchiveProxy
+from eeweather.normals import NormalsArchive
+from eeweather.retry import RetryPolicy
 from eeweather.testing import (
     MockNOAAFTPConnectionProxy,
     MockKeyValueStoreProxy,
     mock_request_text_tmy3,
     mock_request_text_cz2010,
+    write_isd_file,
+    write_gsod_archive_file,
 )
+from eeweather.stations import (
+    fetch_hourly_normalized_temp_data,
+    _GzipRecordStream,
+    _decode_gsod_records,
+    _decode_isd_records,
+)
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
 
@@ -123,6 +160,25 @@ def monkeypatch_cz2010_request(monkeypatch):
     monkeypatch.setattr("eeweather.mockable.request_text", mock_request_text_cz2010)
 
 
+@pytest.fixture
+def normals_csv_directory(tmp_path):
+    for filename in ["722880TYA.CSV", "722880_CZ2010.CSV"]:
+        with open(tmp_path / filename, "wb") as f:
+            f.write(pkg_resources.resource_string("eeweather.resources", filename))
+    return str(tmp_path)
+
+
+@pytest.fixture
+def monkeypatch_normals_archive(monkeypatch, normals_csv_directory):
+    path = os.path.join(normals_csv_directory, "normals.npy")
+    build_normals_archive(path, csv_directory=normals_csv_directory)
+    monkeypatch.setattr(
+        "eeweather.connections.normals_archive_proxy", NormalsArchiveProxy()
+    )
+    monkeypatch.setenv("EEWEATHER_NORMALS_ARCHIVE", path)
+    return path
+
+
 @pytest.fixture
 def monkeypatch_key_value_store(monkeypatch):
     key_value_store_proxy = MockKeyValueStoreProxy()
@@ -389,6 +445,48 @@ def test_fetch_gsod_raw_temp_data(monkeypatch_noaa_ftp):
     assert data.shape == (365,)
 
 
+def test_fetch_gsod_raw_temp_fields(monkeypatch_noaa_ftp):
+    data = fetch_gsod_raw_temp_fields("722874", 2007)
+    assert list(data.columns) == [
+        "temp_C",
+        "max_temp_C",
+        "min_temp_C",
+        "n_observations",
+    ]
+    assert data.shape == (365, 4)
+    assert data.temp_C.sum() == pytest.approx(6509.5, 0.00001)
+    assert (data.max_temp_C >= data.temp_C).all()
+    assert (data.min_temp_C <= data.temp_C).all()
+    assert data.n_observations.iloc[0] == 24
+    assert data.n_observations.dtype == np.int64
+    pd.testing.assert_series_equal(
+        data.temp_C,
+        fetch_gsod_raw_temp_data("722874", 2007),
+        check_names=False,
+    )
+
+
+def test_decode_gsod_records_extra_fields():
+    line = (
+        b"722874 93134  20070101    56.0 24    23.5 24  1018.2 24  1001.0 24"
+        b"    8.5 24    3.2 24    7.0  999.9    67.0* 9999.9   0.00I 999.9  000000"
+    )
+    # counts are right-aligned
+    other = line.replace(b"20070101", b"20070102").replace(b"56.0 24", b"56.0  8")
+    dates, temps, max_temps, min_temps, counts = _decode_gsod_records(
+        line + b"\n" + other, extra_fields=True
+    )
+    assert list(dates) == [np.datetime64("2007-01-01"), np.datetime64("2007-01-02")]
+    assert temps[0] == pytest.approx(13.333333)
+    assert max_temps[0] == pytest.approx(19.444444)
+    assert np.isnan(min_temps).all()
+    assert counts.dtype == np.int64
+    assert list(counts) == [24, 8]
+
+    dates, temps = _decode_gsod_records(line)
+    assert len(dates) == 1
+
+
 # station fetch raw
 def test_isd_station_fetch_isd_raw_temp_data(monkeypatch_noaa_ftp):
     station = ISDStation("722874")
@@ -404,6 +502,12 @@ def test_isd_station_fetch_gsod_raw_temp_data(monkeypatch_noaa_ftp):
     assert data.shape == (365,)
 
 
+def test_isd_station_fetch_gsod_raw_temp_fields(monkeypatch_noaa_ftp):
+    station = ISDStation("722874")
+    data = station.fetch_gsod_raw_temp_fields(2007)
+    assert data.shape == (365, 4)
+
+
 # fetch raw invalid station
 def test_fetch_isd_raw_temp_data_invalid_station():
     with pytest.raises(UnrecognizedUSAFIDError):
@@ -434,6 +538,49 @@ def test_isd_station_fetch_isd_raw_temp_data_all_nan(monkeypatch_noaa_ftp):
     assert data.shape == (8611,)
 
 
+# streaming decode
+def _isd_gzip_bytes():
+    gzipped = BytesIO()
+    write_isd_file(gzipped)
+    return gzipped.getvalue()
+
+
+def test_gzip_record_stream_small_chunks():
+    data = _isd_gzip_bytes()
+    stream = _GzipRecordStream(_decode_isd_records, block_size=1000)
+    for i in range(0, len(data), 100):
+        stream.write(data[i : i + 100])
+    times, temps = stream.finish()
+    assert times.shape == (11107,)
+    assert temps.shape == (11107,)
+    assert times.dtype == "datetime64[m]"
+
+
+def test_gzip_record_stream_multiple_members_and_skip_lines():
+    data = _isd_gzip_bytes()
+    stream = _GzipRecordStream(_decode_isd_records, skip_lines=1)
+    stream.write(data + data)
+    times, temps = stream.finish()
+    assert times.shape == (2 * 11107 - 1,)
+
+
+def test_gzip_record_stream_reset():
+    data = _isd_gzip_bytes()
+    stream = _GzipRecordStream(_decode_isd_records)
+    stream.write(data[:1000])
+    stream.reset()
+    stream.write(data)
+    times, temps = stream.finish()
+    assert times.shape == (11107,)
+
+
+def test_gzip_record_stream_empty():
+    stream = _GzipRecordStream(_decode_isd_records)
+    times, temps = stream.finish()
+    assert times.shape == (0,)
+    assert temps.shape == (0,)
+
+
 # fetch
 def test_fetch_isd_hourly_temp_data(monkeypatch_noaa_ftp):
     data = fetch_isd_hourly_temp_data("722874", 2007)
@@ -453,6 +600,15 @@ def test_fetch_gsod_daily_temp_data(monkeypatch_noaa_ftp):
     assert data.shape == (365,)
 
 
+def test_fetch_isd_resampled_temp_data(monkeypatch_noaa_ftp):
+    data = fetch_isd_resampled_temp_data("722874", 2007, freqs=("H", "D", "MS"))
+    assert data["H"].sum() == pytest.approx(156160.0355, 0.00001)
+    assert data["H"].shape == (8760,)
+    assert data["D"].sum() == pytest.approx(6510.002260821784, 0.00001)
+    assert data["D"].shape == (365,)
+    assert data["MS"].shape == (12,)
+
+
 def test_fetch_tmy3_hourly_temp_data(monkeypatch_tmy3_request):
     data = fetch_tmy3_hourly_temp_data("722880")
     assert data.sum() == pytest.approx(156194.3, 0.00001)
@@ -465,6 +621,39 @@ def test_fetch_cz2010_hourly_temp_data(monkeypatch_cz2010_request):
     assert data.shape == (8760,)
 
 
+def test_fetch_hourly_normalized_temp_data_utc_offset(monkeypatch):
+    fields = ["0"] * 71
+    rows = [
+        '722880,"STATION",CA,-8.0,34.200,-118.350,226',
+        ",".join("column {}".format(i) for i in range(71)),
+    ]
+    for date, time, temp in [
+        ("01/01/1999", "01:00", "8.0"),
+        ("01/01/1999", "02:00", "-12.5"),
+        ("12/31/1999", "24:00", "10.25"),
+    ]:
+        fields[:2], fields[31] = [date, time], temp
+        rows.append(",".join(fields))
+    monkeypatch.setattr(
+        "eeweather.mockable.request_text", lambda url: "\r\n".join(rows) + "\r\n"
+    )
+
+    data = fetch_hourly_normalized_temp_data("722880", "url", "TMY3")
+    assert data.shape == (8760,)
+    assert data.count() == 3
+    # hour ending 01:00 local standard time is 08:00 UTC
+    assert data["1900-01-01 08:00"] == 8.0
+    assert data["1900-01-01 09:00"] == -12.5
+    # the last hour of the year wraps around to the start of 1900
+    assert data["1900-01-01 07:00"] == 10.25
+
+    # hours of a half-hour zone don't fall on UTC hours
+    rows[0] = rows[0].replace("-8.0", "9.5")
+    with pytest.raises(ValueError) as excinfo:
+        fetch_hourly_normalized_temp_data("722880", "url", "TMY3")
+    assert "9.5" in str(excinfo.value)
+
+
 # station fetch
 def test_isd_station_fetch_isd_hourly_temp_data(monkeypatch_noaa_ftp):
     station = ISDStation("722874")
@@ -487,6 +676,14 @@ def test_isd_station_fetch_gsod_daily_temp_data(monkeypatch_noaa_ftp):
     assert data.shape == (365,)
 
 
+def test_isd_station_fetch_isd_resampled_temp_data(monkeypatch_noaa_ftp):
+    station = ISDStation("722874")
+    data = station.fetch_isd_resampled_temp_data(2007)
+    assert sorted(data.keys()) == ["D", "H"]
+    assert data["H"].shape == (8760,)
+    assert data["D"].shape == (365,)
+
+
 def test_tmy3_station_hourly_temp_data(monkeypatch_tmy3_request):
     station = ISDStation("722880")
     data = station.fetch_tmy3_hourly_temp_data()
@@ -544,6 +741,10 @@ def test_fetch_cz2010_hourly_temp_data_not_in_cz2010_list(monkeypatch_cz2010_req
 
 
 # get cache key
+def test_get_isd_raw_temp_data_cache_key():
+    assert get_isd_raw_temp_data_cache_key("722874", 2007) == "isd-raw-722874-2007"
+
+
 def test_get_isd_hourly_temp_data_cache_key():
     assert (
         get_isd_hourly_temp_data_cache_key("722874", 2007) == "isd-hourly-722874-2007"
@@ -820,6 +1021,123 @@ def test_validate_isd_daily_temp_data_cache_updated_recently(
     assert validate_isd_daily_temp_data_cache("722874", 2007) is True
 
 
+def test_load_isd_hourly_temp_data_cached_proxy_fills_daily_cache(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store
+):
+    load_isd_hourly_temp_data_cached_proxy("722874", 2007)
+    assert validate_isd_daily_temp_data_cache("722874", 2007) is True
+    ts = load_isd_daily_temp_data_cached_proxy("722874", 2007, fetch_from_web=False)
+    assert ts.shape == (365,)
+
+
+def test_load_isd_daily_temp_data_cached_proxy_fills_hourly_cache(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store
+):
+    load_isd_daily_temp_data_cached_proxy("722874", 2007)
+    assert validate_isd_hourly_temp_data_cache("722874", 2007) is True
+
+
+# raw observation cache
+class FailingNOAAFTPConnectionProxy:
+    def read_file_into(self, filename, stream):
+        raise AssertionError("Unexpected download of {}".format(filename))
+
+
+def test_validate_isd_raw_temp_data_cache_empty(monkeypatch_key_value_store):
+    assert validate_isd_raw_temp_data_cache("722874", 2007) is False
+
+
+def test_raise_on_missing_isd_raw_temp_data_cache_data_no_web_fetch(
+    monkeypatch_key_value_store,
+):
+    with pytest.raises(ISDDataNotAvailableError):
+        load_isd_raw_temp_data_cached_proxy("722874", 2007, fetch_from_web=False)
+
+
+def test_isd_raw_temp_data_cache_round_trip(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store
+):
+    fetched = load_isd_raw_temp_data_cached_proxy("722874", 2007)
+    assert validate_isd_raw_temp_data_cache("722874", 2007) is True
+    assert cached_isd_raw_temp_data_is_expired("722874", 2007) is False
+    cached = read_isd_raw_temp_data_from_cache("722874", 2007)
+    pd.testing.assert_series_equal(cached, fetched, check_exact=True)
+    pd.testing.assert_series_equal(
+        cached, fetch_isd_raw_temp_data("722874", 2007), check_exact=True
+    )
+    destroy_cached_isd_raw_temp_data("722874", 2007)
+    assert validate_isd_raw_temp_data_cache("722874", 2007) is False
+
+
+def test_isd_raw_temp_data_cache_all_nan(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store
+):
+    load_isd_raw_temp_data_cached_proxy("994035", 2013)
+    cached = read_isd_raw_temp_data_from_cache("994035", 2013)
+    assert cached.isnull().all()
+    assert cached.shape == (8611,)
+
+
+def test_rebuild_isd_hourly_temp_data_from_raw_cache(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store, monkeypatch
+):
+    expected = load_isd_hourly_temp_data_cached_proxy(
+        "722874", 2007, use_raw_cache=True
+    )
+    assert validate_isd_raw_temp_data_cache("722874", 2007) is True
+
+    monkeypatch.setattr(
+        "eeweather.connections.noaa_ftp_connection_proxy",
+        FailingNOAAFTPConnectionProxy(),
+    )
+    hourly = load_isd_hourly_temp_data_cached_proxy(
+        "722874", 2007, read_from_cache=False, use_raw_cache=True
+    )
+    pd.testing.assert_series_equal(hourly, expected)
+    daily = fetch_isd_daily_temp_data("722874", 2007, use_raw_cache=True)
+    assert daily.shape == (365,)
+
+
+def test_load_temp_data_rebuilds_from_raw_cache(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store, monkeypatch
+):
+    start = datetime(2007, 1, 3, tzinfo=pytz.UTC)
+    end = datetime(2007, 4, 3, tzinfo=pytz.UTC)
+    expected_hourly, _ = load_isd_hourly_temp_data(
+        "722874", start, end, use_raw_cache=True
+    )
+    expected_daily = load_isd_daily_temp_data("722874", start, end)
+    assert validate_isd_raw_temp_data_cache("722874", 2007) is True
+
+    monkeypatch.setattr(
+        "eeweather.connections.noaa_ftp_connection_proxy",
+        FailingNOAAFTPConnectionProxy(),
+    )
+    hourly, warnings = load_isd_hourly_temp_data(
+        "722874", start, end, read_from_cache=False, use_raw_cache=True
+    )
+    assert warnings == []
+    pd.testing.assert_series_equal(hourly, expected_hourly)
+    daily = ISDStation("722874").load_isd_daily_temp_data(
+        start, end, read_from_cache=False, use_raw_cache=True
+    )
+    pd.testing.assert_series_equal(daily, expected_daily)
+
+
+def test_isd_station_load_isd_raw_temp_data_cached_proxy(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store
+):
+    station = ISDStation("722874")
+    ts = station.load_isd_raw_temp_data_cached_proxy(2007)
+    assert ts.shape == (11094,)
+    assert station.get_isd_raw_temp_data_cache_key(2007) == "isd-raw-722874-2007"
+    assert station.validate_isd_raw_temp_data_cache(2007) is True
+    assert station.cached_isd_raw_temp_data_is_expired(2007) is False
+    assert station.read_isd_raw_temp_data_from_cache(2007).shape == (11094,)
+    station.destroy_cached_isd_raw_temp_data(2007)
+    assert station.validate_isd_raw_temp_data_cache(2007) is False
+
+
 def test_validate_gsod_daily_temp_data_cache_updated_recently(
     monkeypatch_noaa_ftp, monkeypatch_key_value_store
 ):
@@ -1290,6 +1608,31 @@ def test_load_cz2010_hourly_temp_data_cached_proxy(
     assert ts1.shape == ts2.shape
 
 
+def test_load_tmy3_hourly_temp_data_cached_proxy_normals_archive(
+    monkeypatch_normals_archive, monkeypatch_key_value_store
+):
+    # nothing cached and no web access, only the archive
+    ts = load_tmy3_hourly_temp_data_cached_proxy("722880", fetch_from_web=False)
+    assert ts.sum() == pytest.approx(156194.3, 0.00001)
+    assert ts.shape == (8760,)
+    assert not monkeypatch_key_value_store.key_exists("tmy3-hourly-722880")
+
+
+def test_load_cz2010_hourly_temp_data_cached_proxy_normals_archive(
+    monkeypatch_normals_archive, monkeypatch_key_value_store
+):
+    ts = load_cz2010_hourly_temp_data_cached_proxy("722880", fetch_from_web=False)
+    assert ts.sum() == pytest.approx(153430.9, 0.00001)
+    assert ts.shape == (8760,)
+
+
+def test_load_tmy3_hourly_temp_data_cached_proxy_not_in_normals_archive(
+    monkeypatch_normals_archive, monkeypatch_key_value_store
+):
+    with pytest.raises(TMY3DataNotAvailableError):
+        load_tmy3_hourly_temp_data_cached_proxy("722874", fetch_from_web=False)
+
+
 # station load cached proxy
 def test_isd_station_load_isd_hourly_temp_data_cached_proxy(
     monkeypatch_noaa_ftp, monkeypatch_key_value_store
@@ -1435,6 +1778,21 @@ def test_load_tmy3_hourly_temp_data(
     assert pd.notnull(ts[-1])
 
 
+def test_load_tmy3_hourly_temp_data_leap_year(
+    monkeypatch_tmy3_request, monkeypatch_key_value_store
+):
+    start = datetime(2015, 12, 31, tzinfo=pytz.UTC)
+    end = datetime(2016, 12, 31, 23, tzinfo=pytz.UTC)
+    ts = load_tmy3_hourly_temp_data("722880", start, end)
+    normal_year = fetch_tmy3_hourly_temp_data("722880")
+    assert ts.shape == (8808,)
+    # February 29 is not part of the normal year
+    assert ts["2016-02-29"].isnull().all()
+    assert ts["2016-03-01 00:00"] == normal_year["1900-03-01 00:00"]
+    assert ts["2015-12-31 23:00"] == normal_year["1900-12-31 23:00"]
+    assert ts["2016-12-31 23:00"] == normal_year["1900-12-31 23:00"]
+
+
 def test_load_cz2010_hourly_temp_data(
     monkeypatch_cz2010_request, monkeypatch_key_value_store
 ):
@@ -1826,3 +2184,680 @@ def test_isd_station_load_isd_hourly_temp_data_missing_years(
     assert pd.isnull(ts[0])
     assert ts.index[-1] == end
     assert pd.notnull(ts[-1])
+
+
+def test_get_gsod_archive_filename():
+    assert get_gsod_archive_filename(2007) == "/pub/data/gsod/2007/gsod_2007.tar"
+    assert get_gsod_archive_filename(2007, with_host=True) == (
+        "ftp://ftp.ncei.noaa.gov/pub/data/gsod/2007/gsod_2007.tar"
+    )
+
+
+def test_ingest_gsod_archive_from_ftp(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store
+):
+    store = monkeypatch_key_value_store
+    data = ingest_gsod_archive(2007)
+    assert sorted(data) == ["722874", "722880"]
+    pd.testing.assert_series_equal(
+        data["722874"], fetch_gsod_daily_temp_data("722874", 2007)
+    )
+
+    # both stations cached, and read back like a per-station fetch
+    assert store.key_exists("gsod-daily-722874-2007")
+    assert store.key_exists("gsod-daily-722880-2007")
+    ts = read_gsod_daily_temp_data_from_cache("722880", 2007)
+    assert ts.sum() == pytest.approx(6509.5, 0.00001)
+    assert ts.shape == (365,)
+
+
+def test_ingest_gsod_archive_from_path_filtered(monkeypatch_key_value_store, tmp_path):
+    store = monkeypatch_key_value_store
+    path = tmp_path / "gsod_2007.tar"
+    with open(path, "wb") as f:
+        write_gsod_archive_file(f)
+
+    data = ingest_gsod_archive(2007, source=str(path), usaf_ids=["722880"])
+    assert list(data) == ["722880"]
+    assert store.key_exists("gsod-daily-722880-2007")
+    assert not store.key_exists("gsod-daily-722874-2007")
+
+
+def test_ingest_gsod_archive_no_write_to_cache(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store
+):
+    store = monkeypatch_key_value_store
+    data = ingest_gsod_archive(2007, write_to_cache=False)
+    assert len(data) == 2
+    assert not store.key_exists("gsod-daily-722874-2007")
+
+
+def test_ingest_gsod_archive_not_available(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store
+):
+    with pytest.raises(GSODArchiveNotAvailableError) as excinfo:
+        ingest_gsod_archive(1800)
+    assert excinfo.value.year == 1800
+
+
+class FakeStreamedResponse(object):
+    def __init__(self, status_code, content=b""):
+        self.status_code = status_code
+        self.raw = BytesIO(content)
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+@pytest.fixture
+def fake_archive_server(monkeypatch):
+    monkeypatch.setattr("eeweather.retry._retry_policy", RetryPolicy(base_delay=0))
+    archive = BytesIO()
+    write_gsod_archive_file(archive)
+    server = type("FakeArchiveServer", (), {})()
+    server.statuses = []  # statuses to respond with before the archive
+    server.requests = []
+    server.responses = []
+
+    def get(url, stream=False, timeout=None):
+        server.requests.append((url, stream, timeout))
+        if server.statuses:
+            response = FakeStreamedResponse(server.statuses.pop(0))
+        else:
+            response = FakeStreamedResponse(200, archive.getvalue())
+        server.responses.append(response)
+        return response
+
+    monkeypatch.setattr("eeweather.stations.requests.get", get)
+    return server
+
+
+def test_ingest_gsod_archive_from_url_retries(
+    fake_archive_server, monkeypatch_key_value_store
+):
+    url = "https://example.com/gsod_2007.tar"
+    fake_archive_server.statuses = [503, 429]
+    data = ingest_gsod_archive(2007, source=url, usaf_ids=["722880"])
+    assert list(data) == ["722880"]
+    assert fake_archive_server.requests == [(url, True, 60)] * 3
+    assert all(response.closed for response in fake_archive_server.responses)
+
+
+def test_ingest_gsod_archive_from_url_not_found(
+    fake_archive_server, monkeypatch_key_value_store
+):
+    fake_archive_server.statuses = [404]
+    with pytest.raises(GSODArchiveNotAvailableError):
+        ingest_gsod_archive(2007, source="https://example.com/gsod_2007.tar")
+    assert len(fake_archive_server.requests) == 1
+
+
+def test_ingest_gsod_archive_from_url_unavailable(
+    fake_archive_server, monkeypatch_key_value_store
+):
+    fake_archive_server.statuses = [503] * 4
+    with pytest.raises(FetchTransientError) as excinfo:
+        ingest_gsod_archive(2007, source="https://example.com/gsod_2007.tar")
+    assert excinfo.value.reason == "HTTP 503"
+    assert len(fake_archive_server.requests) == 4
+
+
+def test_build_normals_archive_from_csv(
+    monkeypatch_tmy3_request, normals_csv_directory, tmp_path
+):
+    path = str(tmp_path / "normals.npy")
+    n = build_normals_archive(path, csv_directory=normals_csv_directory)
+    assert n == 2
+    archive = NormalsArchive(path)
+    pd.testing.assert_series_equal(
+        archive.get_temp_data("TMY3", "722880"),
+        fetch_tmy3_hourly_temp_data("722880"),
+        check_freq=False,
+    )
+
+
+def test_build_normals_archive_from_cache(
+    monkeypatch_tmy3_request, monkeypatch_key_value_store, tmp_path
+):
+    path = str(tmp_path / "normals.npy")
+    assert build_normals_archive(path, sources=["TMY3"], usaf_ids=["722880"]) == 0
+
+    load_tmy3_hourly_temp_data_cached_proxy("722880")
+    assert build_normals_archive(path, sources=["TMY3"], usaf_ids=["722880"]) == 1
+    assert NormalsArchive(path).keys() == [("TMY3", "722880")]
+
+
+def test_build_weather_cube(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store, tmp_path
+):
+    path = str(tmp_path / "cube")
+    with pytest.raises(ValueError):
+        build_weather_cube(path)
+
+    # not cached yet
+    n = build_weather_cube(path, 2006, 2007, ["722880", "722874"], fetch_from_web=False)
+    assert n == 0
+    cube = WeatherCube(path)
+    assert cube.usaf_ids == ["722874", "722880"]
+    assert not cube.has_year("722874", 2007)
+
+    # fetched, and written to the cache
+    assert build_weather_cube(path, usaf_ids=["722874"]) == 2
+    assert build_weather_cube(path) == 0  # nothing left to load
+    cube = WeatherCube(path)
+    assert cube.has_year("722874", 2006) and cube.has_year("722874", 2007)
+    assert cube.has_year("722880", 2006)  # no data, final since it was fetched
+
+    ts, _ = load_isd_hourly_temp_data(
+        "722874",
+        datetime(2006, 1, 1, tzinfo=pytz.UTC),
+        datetime(2007, 12, 31, 23, tzinfo=pytz.UTC),
+        fetch_from_web=False,
+    )
+    df = cube.query(["722874"], ts.index[0], ts.index[-1])
+    assert np.allclose(df["722874"], ts, atol=0.0001, equal_nan=True)
+    assert np.isnan(cube.values(["722880"])).all()
+
+
+def test_build_weather_cube_skips_failed_downloads(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store, tmp_path, monkeypatch
+):
+    read_file_into = MockNOAAFTPConnectionProxy.read_file_into
+
+    def flaky_read_file_into(self, filename, stream):
+        if "2006" in filename:
+            raise FetchTransientError("ftp://ftp.ncei.noaa.gov" + filename, "timed out")
+        return read_file_into(self, filename, stream)
+
+    monkeypatch.setattr(
+        MockNOAAFTPConnectionProxy, "read_file_into", flaky_read_file_into
+    )
+    path = str(tmp_path / "cube")
+    assert build_weather_cube(path, 2006, 2007, ["722874"]) == 1
+    cube = WeatherCube(path)
+    assert cube.has_year("722874", 2007)
+    # left to the next build
+    assert not cube.has_year("722874", 2006)
+
+    monkeypatch.setattr(MockNOAAFTPConnectionProxy, "read_file_into", read_file_into)
+    assert build_weather_cube(path) == 1
+    assert WeatherCube(path).has_year("722874", 2006)
+
+
+def test_build_weather_cube_unknown_station(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store, tmp_path, monkeypatch
+):
+    path = str(tmp_path / "cube")
+    WeatherCube.create(path, ["722874"], 2006, 2007).flush()
+
+    def read_file_into(self, filename, stream):
+        raise AssertionError("nothing should be fetched")
+
+    monkeypatch.setattr(MockNOAAFTPConnectionProxy, "read_file_into", read_file_into)
+    with pytest.raises(UnrecognizedUSAFIDError) as excinfo:
+        build_weather_cube(path, usaf_ids=["722874", "722880"])
+    assert excinfo.value.value == "722880"
+
+
+def test_build_weather_cube_keeps_progress_when_interrupted(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store, tmp_path, monkeypatch
+):
+    read_file_into = MockNOAAFTPConnectionProxy.read_file_into
+
+    def interrupted_read_file_into(self, filename, stream):
+        if "2007" in filename:
+            raise KeyboardInterrupt
+        return read_file_into(self, filename, stream)
+
+    monkeypatch.setattr(
+        MockNOAAFTPConnectionProxy, "read_file_into", interrupted_read_file_into
+    )
+    path = str(tmp_path / "cube")
+    with pytest.raises(KeyboardInterrupt):
+        build_weather_cube(path, 2006, 2007, ["722874"])
+    cube = WeatherCube(path)
+    assert cube.has_year("722874", 2006)
+    assert not cube.has_year("722874", 2007)
+
+
+def test_load_isd_hourly_temp_data_warns_about_failed_downloads(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store, monkeypatch
+):
+    read_file_into = MockNOAAFTPConnectionProxy.read_file_into
+
+    def flaky_read_file_into(self, filename, stream):
+        if "2006" in filename:
+            raise CircuitOpenError(
+                "ftp://ftp.ncei.noaa.gov" + filename, "ftp.ncei.noaa.gov", 60
+            )
+        return read_file_into(self, filename, stream)
+
+    monkeypatch.setattr(
+        MockNOAAFTPConnectionProxy, "read_file_into", flaky_read_file_into
+    )
+    start = datetime(2006, 1, 3, tzinfo=pytz.UTC)
+    end = datetime(2007, 4, 3, tzinfo=pytz.UTC)
+    ts, warnings = load_isd_hourly_temp_data("722874", start, end)
+    assert ts[:"2006"].isnull().all()
+    assert ts["2007"].notnull().any()
+    assert [w.qualified_name for w in warnings] == ["eeweather.isd_data_not_fetched"]
+    assert warnings[0].data["year"] == 2006
+    assert warnings[0].data["url"].endswith("2006.gz")
+    assert not monkeypatch_key_value_store.key_exists(
+        get_isd_hourly_temp_data_cache_key("722874", 2006)
+    )
+
+    with pytest.raises(CircuitOpenError):
+        load_isd_hourly_temp_data("722874", start, end, error_on_missing_years=True)
+
+
+def test_build_weather_cube_from_cache_in_one_query_per_station(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store, tmp_path
+):
+    store = monkeypatch_key_value_store
+    load_isd_hourly_temp_data_cached_proxy("722874", 2006)
+    load_isd_hourly_temp_data_cached_proxy("722874", 2007)
+
+    statements = []
+    event.listen(
+        store.eng,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    path = str(tmp_path / "cube")
+    assert build_weather_cube(path, 2006, 2007, ["722874"], fetch_from_web=False) == 2
+    assert len(statements) == 1
+
+
+def test_read_hourly_temp_data_from_normals_archive(monkeypatch_normals_archive):
+    ts = read_tmy3_hourly_temp_data_from_normals_archive("722880")
+    assert ts.shape == (8760,)
+    ts = read_cz2010_hourly_temp_data_from_normals_archive("722880")
+    assert ts.shape == (8760,)
+    assert read_tmy3_hourly_temp_data_from_normals_archive("722874") is None
+
+
+def test_read_hourly_temp_data_from_normals_archive_not_configured(monkeypatch):
+    monkeypatch.delenv("EEWEATHER_NORMALS_ARCHIVE", raising=False)
+    assert read_tmy3_hourly_temp_data_from_normals_archive("722880") is None
+
+
+def test_isd_station_read_hourly_temp_data_from_normals_archive(
+    monkeypatch_normals_archive,
+):
+    station = ISDStation("722880")
+    assert station.read_tmy3_hourly_temp_data_from_normals_archive().shape == (8760,)
+    assert station.read_cz2010_hourly_temp_data_from_normals_archive().shape == (8760,)
+
+
+def test_write_isd_hourly_temp_data_to_cache_binary(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store
+):
+    store = monkeypatch_key_value_store
+    ts = fetch_isd_hourly_temp_data("722874", 2007)
+    write_isd_hourly_temp_data_to_cache("722874", 2007, ts)
+    data = store.retrieve_bytes("isd-hourly-722874-2007")
+    assert data is not None
+    assert len(data) < len(json.dumps(serialize_isd_hourly_temp_data(ts))) / 5
+
+    cached = read_isd_hourly_temp_data_from_cache("722874", 2007)
+    pd.testing.assert_series_equal(cached, ts, atol=0.00005, check_exact=False)
+
+
+def test_read_temp_data_from_cache_legacy_json(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store
+):
+    store = monkeypatch_key_value_store
+    ts = fetch_isd_hourly_temp_data("722874", 2007)
+    store.save_json("isd-hourly-722874-2007", serialize_isd_hourly_temp_data(ts))
+    pd.testing.assert_series_equal(
+        read_isd_hourly_temp_data_from_cache("722874", 2007),
+        deserialize_isd_hourly_temp_data(serialize_isd_hourly_temp_data(ts)),
+    )
+
+    ts = fetch_gsod_daily_temp_data("722874", 2007)
+    store.save_json("gsod-daily-722874-2007", serialize_gsod_daily_temp_data(ts))
+    assert read_gsod_daily_temp_data_from_cache("722874", 2007).shape == (365,)
+
+
+def test_load_isd_hourly_temp_data_cached_proxy_single_query(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store
+):
+    store = monkeypatch_key_value_store
+    ts1 = load_isd_hourly_temp_data_cached_proxy("722874", 2007)
+
+    statements = []
+    event.listen(
+        store.eng,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    ts2 = load_isd_hourly_temp_data_cached_proxy("722874", 2007)
+    assert len(statements) == 1
+    assert ts1.shape == ts2.shape
+
+
+def test_load_isd_hourly_temp_data_cached_proxy_expired(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store
+):
+    store = monkeypatch_key_value_store
+    load_isd_hourly_temp_data_cached_proxy("722874", 2007)
+
+    # manually expire key value item
+    key = get_isd_hourly_temp_data_cache_key("722874", 2007)
+    s = (
+        store.items.update()
+        .where(store.items.c.key == key)
+        .values(updated=pytz.UTC.localize(datetime(2007, 3, 3)))
+    )
+    with Session(store.eng) as session:
+        session.execute(s)
+        session.commit()
+
+    # expired data is cleared rather than read
+    with pytest.raises(ISDDataNotAvailableError):
+        load_isd_hourly_temp_data_cached_proxy("722874", 2007, fetch_from_web=False)
+    assert store.key_exists(key) is False
+
+    # and refetched
+    ts = load_isd_hourly_temp_data_cached_proxy("722874", 2007)
+    assert ts.shape == (8760,)
+    assert store.key_exists(key) is True
+
+
+def test_load_isd_hourly_temp_data_reads_cached_years_in_one_query(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store
+):
+    store = monkeypatch_key_value_store
+    start = datetime(2006, 1, 3, tzinfo=pytz.UTC)
+    end = datetime(2007, 4, 3, tzinfo=pytz.UTC)
+    ts1, _ = load_isd_hourly_temp_data("722874", start, end)
+    assert store.key_exists(get_isd_daily_temp_data_cache_key("722874", 2006))
+
+    statements = []
+    event.listen(
+        store.eng,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    ts2, _ = load_isd_hourly_temp_data("722874", start, end)
+    assert len(statements) == 1
+    assert np.allclose(ts1, ts2, atol=0.00005, equal_nan=True)
+
+    # a daily load was filled by the hourly fetch, so it is a single query too
+    statements.clear()
+    load_isd_daily_temp_data("722874", start, end)
+    assert len(statements) == 1
+
+
+def test_load_isd_hourly_temp_data_does_not_read_expired_years(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store, monkeypatch
+):
+    store = monkeypatch_key_value_store
+    start = datetime(2006, 1, 3, tzinfo=pytz.UTC)
+    end = datetime(2007, 4, 3, tzinfo=pytz.UTC)
+    ts1, _ = load_isd_hourly_temp_data("722874", start, end)
+
+    # manually expire 2007
+    key = get_isd_hourly_temp_data_cache_key("722874", 2007)
+    with Session(store.eng) as session:
+        session.execute(
+            store.items.update()
+            .where(store.items.c.key == key)
+            .values(updated=pytz.UTC.localize(datetime(2007, 3, 3)))
+        )
+        session.commit()
+
+    retrieved = []
+    retrieve_many_with_updated = store.retrieve_many_with_updated
+
+    def spy(keys, stale=None):
+        found = retrieve_many_with_updated(keys, stale=stale)
+        retrieved.extend(key for key, (value, _) in found.items() if value is not None)
+        return found
+
+    monkeypatch.setattr(store, "retrieve_many_with_updated", spy)
+    ts2, _ = load_isd_hourly_temp_data("722874", start, end)
+    # the stale year was neither sent by the database nor used, but refetched
+    assert retrieved == [get_isd_hourly_temp_data_cache_key("722874", 2006)]
+    assert store.key_updated(key).year > 2007
+    assert np.allclose(ts1, ts2, atol=0.00005, equal_nan=True)
+
+
+@pytest.fixture
+def monkeypatch_observations_store(monkeypatch, tmp_path):
+    store = KeyValueStore(
+        "sqlite:///{}/cache.db".format(tmp_path), store_observations=True
+    )
+    key_value_store_proxy = MockKeyValueStoreProxy()
+    key_value_store_proxy.store = store
+    monkeypatch.setattr(
+        "eeweather.connections.key_value_store_proxy", key_value_store_proxy
+    )
+    return store
+
+
+def test_load_temp_data_reads_range_from_observations(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store, monkeypatch_observations_store
+):
+    start = datetime(2006, 12, 30, 12, 30, tzinfo=pytz.UTC)
+    end = datetime(2007, 1, 2, 6, tzinfo=pytz.UTC)
+    # the same data cached without observations
+    expected_hourly, _ = load_isd_hourly_temp_data(
+        "722874", start, end, read_from_cache=False
+    )
+    expected_daily = load_isd_daily_temp_data("722874", start, end)
+    expected_gsod = load_gsod_daily_temp_data("722874", start, end)
+
+    store = monkeypatch_observations_store
+    load_isd_hourly_temp_data("722874", start, end)
+    load_gsod_daily_temp_data("722874", start, end)
+
+    statements = []
+    event.listen(
+        store.eng,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    hourly, warnings = load_isd_hourly_temp_data("722874", start, end)
+    # a lookup of the station years and of the rows in range, no values
+    assert len(statements) == 2
+    assert all("items.data" not in statement for statement in statements)
+    assert warnings == []
+    pd.testing.assert_series_equal(hourly, expected_hourly, check_freq=False)
+
+    daily = load_isd_daily_temp_data("722874", start, end)
+    pd.testing.assert_series_equal(daily, expected_daily, check_freq=False)
+    gsod = load_gsod_daily_temp_data("722874", start, end)
+    pd.testing.assert_series_equal(gsod, expected_gsod, check_freq=False)
+
+
+def test_load_temp_data_reads_range_from_file_store(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store, monkeypatch, tmp_path
+):
+    start = datetime(2006, 12, 30, 12, 30, tzinfo=pytz.UTC)
+    end = datetime(2007, 1, 2, 6, tzinfo=pytz.UTC)
+    expected, _ = load_isd_hourly_temp_data("722874", start, end)
+
+    store = FileKeyValueStore("file://{}".format(tmp_path))
+    key_value_store_proxy = MockKeyValueStoreProxy()
+    key_value_store_proxy.store = store
+    monkeypatch.setattr(
+        "eeweather.connections.key_value_store_proxy", key_value_store_proxy
+    )
+    load_isd_hourly_temp_data("722874", start, end)
+
+    ranges = []
+    retrieve_observations = store.retrieve_observations
+
+    def spy_retrieve_observations(keys, start, end, stale=None):
+        ranges.append(list(keys))
+        return retrieve_observations(keys, start, end, stale=stale)
+
+    monkeypatch.setattr(store, "retrieve_observations", spy_retrieve_observations)
+    hourly, warnings = load_isd_hourly_temp_data("722874", start, end)
+    assert ranges == [["isd-hourly-722874-2006", "isd-hourly-722874-2007"]]
+    assert warnings == []
+    assert np.allclose(hourly, expected, atol=0.00005, equal_nan=True)
+    assert hourly.index.equals(expected.index)
+
+
+def test_load_temp_data_from_observations_falls_back_to_years(
+    monkeypatch_noaa_ftp, monkeypatch_observations_store
+):
+    store = monkeypatch_observations_store
+    start = datetime(2006, 1, 3, tzinfo=pytz.UTC)
+    end = datetime(2007, 4, 3, tzinfo=pytz.UTC)
+    ts1, _ = load_isd_hourly_temp_data("722874", start, end)
+
+    # 2007 saved before observations were stored
+    store.store_observations = False
+    load_isd_hourly_temp_data_cached_proxy("722874", 2007, read_from_cache=False)
+    store.store_observations = True
+    key = get_isd_hourly_temp_data_cache_key("722874", 2007)
+    assert store.retrieve_observations([key], start, end) is None
+
+    statements = []
+    event.listen(
+        store.eng,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    ts2, _ = load_isd_hourly_temp_data("722874", start, end)
+    # the range lookup and the single query of the cached years
+    assert len(statements) == 2
+    assert np.allclose(ts1, ts2, atol=0.00005, equal_nan=True)
+
+
+def test_load_temp_data_from_observations_does_not_read_expired_years(
+    monkeypatch_noaa_ftp, monkeypatch_observations_store
+):
+    store = monkeypatch_observations_store
+    start = datetime(2006, 1, 3, tzinfo=pytz.UTC)
+    end = datetime(2007, 4, 3, tzinfo=pytz.UTC)
+    ts1, _ = load_isd_hourly_temp_data("722874", start, end)
+
+    key = get_isd_hourly_temp_data_cache_key("722874", 2007)
+    with Session(store.eng) as session:
+        session.execute(
+            store.items.update()
+            .where(store.items.c.key == key)
+            .values(updated=pytz.UTC.localize(datetime(2007, 3, 3)))
+        )
+        session.commit()
+
+    # refetched rather than read from the observations of the expired year
+    ts2, _ = load_isd_hourly_temp_data("722874", start, end)
+    assert store.key_updated(key).year > 2007
+    assert np.allclose(ts1, ts2, atol=0.00005, equal_nan=True)
+
+
+def test_load_gsod_daily_temp_data_fetches_missing_years_only(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store
+):
+    start = datetime(2006, 1, 3, tzinfo=pytz.UTC)
+    end = datetime(2007, 4, 3, tzinfo=pytz.UTC)
+    load_gsod_daily_temp_data_cached_proxy("722874", 2007)
+    destroy_cached_gsod_daily_temp_data("722874", 2006)
+
+    with pytest.raises(GSODDataNotAvailableError):
+        load_gsod_daily_temp_data("722874", start, end, fetch_from_web=False)
+
+    ts1 = load_gsod_daily_temp_data("722874", start, end)
+    ts2 = load_gsod_daily_temp_data("722874", start, end, fetch_from_web=False)
+    assert np.allclose(ts1, ts2, atol=0.00005, equal_nan=True)
+
+
+def test_load_cached_isd_hourly_temp_data_single_query(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store
+):
+    store = monkeypatch_key_value_store
+    load_isd_hourly_temp_data_cached_proxy("722874", 2007)
+
+    statements = []
+    event.listen(
+        store.eng,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    ts = load_cached_isd_hourly_temp_data("722874")
+    assert len(statements) == 1
+    assert ts.shape == (8760,)
+
+
+def test_load_isd_hourly_temp_data_from_memory_cache(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store
+):
+    store = monkeypatch_key_value_store
+    store.memory_cache = MemoryCache(max_bytes=10**7)
+    start = datetime(2006, 1, 3, tzinfo=pytz.UTC)
+    end = datetime(2007, 4, 3, tzinfo=pytz.UTC)
+    ts1, _ = load_isd_hourly_temp_data("722874", start, end)
+    ts2, _ = load_isd_hourly_temp_data("722874", start, end)
+    assert store.memory_cache.hits == 0
+    assert len(store.memory_cache) == 2
+
+    statements = []
+    event.listen(
+        store.eng,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    ts3, _ = load_isd_hourly_temp_data("722874", start, end)
+    ts4 = load_isd_hourly_temp_data_cached_proxy("722874", 2007)
+    assert statements == []
+    assert store.memory_cache.hits == 3
+    assert ts2.equals(ts3)
+
+    # callers get their own copy
+    ts4[:] = 0
+    assert load_isd_hourly_temp_data_cached_proxy("722874", 2007).sum() != 0
+
+    # refetching invalidates the memory tier
+    load_isd_hourly_temp_data_cached_proxy("722874", 2007, read_from_cache=False)
+    key = get_isd_hourly_temp_data_cache_key("722874", 2007)
+    assert key not in store.memory_cache
+
+
+def test_load_isd_hourly_temp_data_cached_proxy_memory_cache_expired(
+    monkeypatch_noaa_ftp, monkeypatch_key_value_store
+):
+    store = monkeypatch_key_value_store
+    store.memory_cache = MemoryCache(max_bytes=10**7)
+    key = get_isd_hourly_temp_data_cache_key("722874", 2007)
+    load_isd_hourly_temp_data_cached_proxy("722874", 2007)
+    ts = load_isd_hourly_temp_data_cached_proxy("722874", 2007)
+    assert key in store.memory_cache
+
+    # an entry last updated before the end of its year is stale
+    store.clear(key)
+    store.memory_cache.put(key, (ts, pytz.UTC.localize(datetime(2007, 3, 3))))
+    with pytest.raises(ISDDataNotAvailableError):
+        load_isd_hourly_temp_data_cached_proxy("722874", 2007, fetch_from_web=False)
+    assert key not in store.memory_cache
+
+
+def test_load_isd_hourly_temp_data_cached_proxy_file_store(
+    monkeypatch_noaa_ftp, monkeypatch, tmp_path
+):
+    store = FileKeyValueStore("file://{}".format(tmp_path))
+    monkeypatch.setattr(
+        "eeweather.connections.key_value_store_proxy.get_store", lambda: store
+    )
+    ts1 = load_isd_hourly_temp_data_cached_proxy("722874", 2007)
+    assert os.path.exists(tmp_path / "isd" / "hourly" / "722874" / "2007.npy")
+    assert os.path.exists(tmp_path / "isd" / "daily" / "722874" / "2007.npy")
+    ts2 = load_isd_hourly_temp_data_cached_proxy("722874", 2007, fetch_from_web=False)
+    assert np.allclose(ts1, ts2, atol=0.00005, equal_nan=True)
+
+    start = datetime(2006, 1, 3, tzinfo=pytz.UTC)
+    end = datetime(2007, 4, 3, tzinfo=pytz.UTC)
+    ts = load_isd_daily_temp_data("722874", start, end)
+    assert ts.index[-1] == end